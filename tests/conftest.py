@@ -0,0 +1,45 @@
+"""
+Testler için ortak yardımcılar. Modüller depo kökünden içe aktarılır
+(paket kurulumu yoktur); küçük rastgele matrisler tohumla tekrarlanabilir.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+BUNDLED_MATRIX = os.path.join(REPO_ROOT, "Talas_Tekstil_Konteyner_240x240_Mesafe_Matrisi.csv")
+
+
+def euclidean_matrix(num_points, seed=0, area=10000):
+    """Kare alana dağılmış noktalar arasında simetrik tamsayı mesafe matrisi (metre)."""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, area, size=(num_points, 2))
+    diff = points[:, None, :] - points[None, :, :]
+    return np.rint(np.hypot(diff[..., 0], diff[..., 1])).astype(np.int64)
+
+
+@pytest.fixture
+def small_matrix():
+    return euclidean_matrix(12, seed=1)
+
+
+@pytest.fixture
+def isolated_metrics(tmp_path, monkeypatch):
+    """Ölçüm günlüğü ve Prometheus dosyası depodaki .tsp_cache yerine geçici dizine yazılır."""
+    from tsp_metrics import METRICS_LOG_ENV, PROMETHEUS_FILE_ENV
+    monkeypatch.setenv(METRICS_LOG_ENV, str(tmp_path / "metrics.jsonl"))
+    monkeypatch.setenv(PROMETHEUS_FILE_ENV, str(tmp_path / "tsp_metrics.prom"))
+    return tmp_path
+
+
+@pytest.fixture
+def route_cache_dir(tmp_path, monkeypatch):
+    """Rota önbelleği geçici dizine yönlendirilir; ortam değişkeni spawn ile açılan süreçlere de geçer."""
+    from tsp_backend import ROUTE_CACHE_ENV
+    monkeypatch.setenv(ROUTE_CACHE_ENV, str(tmp_path / "routes"))
+    return tmp_path / "routes"
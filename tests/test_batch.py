@@ -0,0 +1,51 @@
+import json
+
+import pandas as pd
+
+import tsp_batch
+from conftest import euclidean_matrix
+
+
+def _write_matrix_csv(path, distances):
+    labels = [f"Konum{i}" for i in range(len(distances))]
+    pd.DataFrame(distances, index=labels, columns=labels).to_csv(path)
+
+
+def test_batch_writes_one_jsonl_record_per_matrix(tmp_path, isolated_metrics, route_cache_dir):
+    distances = euclidean_matrix(10, seed=6)
+    matrix_path = tmp_path / "ornek.csv"
+    _write_matrix_csv(matrix_path, distances)
+    output_path = tmp_path / "sonuclar.jsonl"
+    route_dir = tmp_path / "rotalar"
+
+    exit_code = tsp_batch.main([
+        str(matrix_path), '--yakit-fiyati', '45', '--sure', '1', '--isci', '1',
+        '--cikti', str(output_path), '--cikti-dizini', str(route_dir), '--cikti-bicimleri', 'csv',
+    ])
+
+    assert exit_code == 0
+    records = [json.loads(line) for line in output_path.read_text(encoding='utf-8').splitlines()]
+    assert len(records) == 1
+    record = records[0]
+    assert record['status'] == 'ok', record['messages']
+    assert record['route'][0] == record['route'][-1] == 0
+    assert sorted(record['route'][:-1]) == list(range(len(distances)))
+    assert record['solver_stats']['route_cache'] == 'miss'
+    assert record['lower_bound_try'] <= record['total_cost_try']
+    # Ortam değişkeni spawn ile açılan işçi sürecine de geçer
+    assert len(list(route_cache_dir.glob("*.json"))) == 1
+    assert (route_dir / "ornek_rota_maliyet.csv").exists()
+    assert (isolated_metrics / "metrics.jsonl").exists()
+
+
+def test_batch_reports_unreadable_matrix(tmp_path, isolated_metrics, route_cache_dir):
+    matrix_path = tmp_path / "bozuk.csv"
+    matrix_path.write_text(",A,B\nA,0,1\n", encoding='utf-8')
+    output_path = tmp_path / "sonuclar.jsonl"
+
+    exit_code = tsp_batch.main([str(matrix_path), '--yakit-fiyati', '45', '--sure', '1', '--isci', '1', '--cikti', str(output_path)])
+
+    assert exit_code == 1
+    record = json.loads(output_path.read_text(encoding='utf-8'))
+    assert record['status'] == 'error'
+    assert any(msg.startswith("Hata:") for msg in record['messages'])
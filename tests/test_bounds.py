@@ -0,0 +1,46 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from conftest import euclidean_matrix
+from tsp_backend import COST_SCALING_FACTOR, build_fuel_cost_matrix
+from tsp_bounds import lower_bound, reduction_bound
+
+
+def _brute_force_optimum(costs):
+    """Depo (0) sabit tutularak tüm turlar denenir; 8 noktaya kadar anlıklıdır."""
+    best = None
+    for order in itertools.permutations(range(1, len(costs))):
+        tour = (0,) + order + (0,)
+        cost = sum(int(costs[a, b]) for a, b in zip(tour[:-1], tour[1:]))
+        best = cost if best is None else min(best, cost)
+    return best
+
+
+def _asymmetric_matrix(num_points, seed):
+    """Yol benzeri matris: Öklid mesafesine yöne bağlı %0-30 sapma eklenir."""
+    rng = np.random.default_rng(seed)
+    distances = euclidean_matrix(num_points, seed)
+    return np.rint(distances * rng.uniform(1.0, 1.3, size=distances.shape)).astype(np.int64)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_bound_never_exceeds_optimum_symmetric(seed):
+    costs = build_fuel_cost_matrix(euclidean_matrix(8, seed), 45.0, 8.0, COST_SCALING_FACTOR)
+    optimum = _brute_force_optimum(costs)
+    bound, stats = lower_bound(costs)
+    assert bound <= optimum
+    # Küçük Öklid örneklerinde Held-Karp sınırı optimuma çok yakındır
+    assert bound >= 0.9 * optimum
+    assert stats['symmetric']
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_bound_never_exceeds_optimum_asymmetric(seed):
+    costs = build_fuel_cost_matrix(_asymmetric_matrix(8, seed), 45.0, 8.0, COST_SCALING_FACTOR)
+    optimum = _brute_force_optimum(costs)
+    bound, stats = lower_bound(costs)
+    assert bound <= optimum
+    assert not stats['symmetric']
+    assert reduction_bound(costs) <= optimum
@@ -0,0 +1,35 @@
+import math
+
+import numpy as np
+
+from conftest import euclidean_matrix
+from tsp_backend import (
+    COST_MODE_CALLBACK, COST_MODE_MATRIX, COST_SCALING_FACTOR, build_fuel_cost_matrix, run_tsp_solver,
+)
+
+FUEL_PRICE = 45.37
+CONSUMPTION = 8.5
+
+
+def test_cost_matrix_matches_callback_formula():
+    distances = euclidean_matrix(30, seed=2)
+    costs = build_fuel_cost_matrix(distances, FUEL_PRICE, CONSUMPTION, COST_SCALING_FACTOR)
+    for i in range(len(distances)):
+        for j in range(len(distances)):
+            # fuel_cost_callback ile aynı işlem sırası: metre -> km -> litre -> TRY -> ölçek
+            expected = 0 if i == j else math.ceil(distances[i, j] / 1000.0 / 100.0 * CONSUMPTION * FUEL_PRICE * COST_SCALING_FACTOR)
+            assert costs[i, j] == expected
+
+
+def test_matrix_and_callback_modes_find_same_objective():
+    distances = euclidean_matrix(8, seed=3)
+    objectives = {}
+    for cost_mode in (COST_MODE_MATRIX, COST_MODE_CALLBACK):
+        solution, _, _, solver_stats, _ = run_tsp_solver(
+            distances, FUEL_PRICE, CONSUMPTION, 1, COST_SCALING_FACTOR, cost_mode,
+            use_route_cache=False, polish=False, use_lower_bound=False,
+        )
+        assert solution
+        objectives[cost_mode] = solution.ObjectiveValue()
+    assert objectives[COST_MODE_MATRIX] == objectives[COST_MODE_CALLBACK]
+    assert solver_stats['transit_callback_calls'] > 0
@@ -0,0 +1,36 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from tsp_export import EXPORT_FORMATS, PARQUET_AVAILABLE, RouteExport, read_route_table
+
+
+@pytest.fixture
+def route_export():
+    route_df = pd.DataFrame({
+        'Konum_Indeksi': [0, 3, 1, 2, 0],
+        'Konum_Etiketi': ["Depo", "007", "K-1", "K 2", "Depo"],
+        'Mesafe_m': [0, 120, 340, 95, 410],
+        'Yakit_Maliyeti_TRY': [0.0, 0.43, 1.22, 0.34, 1.47],
+    })
+    route_df.index = pd.RangeIndex(1, len(route_df) + 1, name='Adim')
+    return RouteExport(route_df, {'Toplam Yakıt Maliyeti (TRY)': '3.46', 'Konum Sayısı': 4})
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'excel', 'parquet', 'json'])
+def test_read_route_table_round_trips(route_export, export_format):
+    if export_format == 'parquet' and not PARQUET_AVAILABLE:
+        pytest.skip("pyarrow kurulu değil")
+    content = route_export.get(export_format)
+    table = read_route_table(BytesIO(content), route_export.file_name("rota", export_format))
+    assert table['Konum_Indeksi'].tolist() == [0, 3, 1, 2, 0]
+    # Sayı gibi görünen etiketler ("007") metin olarak kalmalı
+    assert table['Konum_Etiketi'].tolist() == ["Depo", "007", "K-1", "K 2", "Depo"]
+    assert table['Mesafe_m'].sum() == 965
+
+
+def test_export_formats_are_cached(route_export):
+    assert set(EXPORT_FORMATS) >= {'csv', 'excel', 'parquet', 'json'}
+    assert route_export.csv() is route_export.csv()
+    assert 'csv_export' in route_export.stages
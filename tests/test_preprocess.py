@@ -0,0 +1,49 @@
+import numpy as np
+
+from conftest import euclidean_matrix
+from tsp_preprocess import preprocess_matrix, shortest_path_closure
+
+
+def _clustered_matrix(seed=7):
+    """Birkaç metre arayla üst üste binen konteynerler içeren simetrik matris."""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, 5000, size=(8, 2))
+    points = np.repeat(centers, 4, axis=0) + rng.uniform(0, 10, size=(32, 2))
+    diff = points[:, None, :] - points[None, :, :]
+    return np.rint(np.hypot(diff[..., 0], diff[..., 1])).astype(np.int64)
+
+
+def test_merge_and_expand_keep_every_label():
+    distances = _clustered_matrix()
+    preprocessed = preprocess_matrix(distances, merge_threshold=20)
+    assert preprocessed.num_reduced < preprocessed.num_locations
+    assert preprocessed.groups[0][0] == 0
+
+    reduced_route = list(range(preprocessed.num_reduced)) + [0]
+    route = preprocessed.expand_route(reduced_route)
+    assert route[0] == route[-1] == 0
+    assert sorted(route[:-1]) == list(range(len(distances)))
+
+
+def test_group_diameter_stays_within_threshold():
+    # 40 m arayla dizilmiş noktalar: zincirleme birleşme hepsini tek gruba toplardı
+    positions = np.arange(20) * 40
+    distances = np.abs(positions[:, None] - positions[None, :])
+    preprocessed = preprocess_matrix(distances, merge_threshold=100)
+    for group in preprocessed.groups:
+        assert distances[np.ix_(group, group)].max() <= 100
+    assert sum(len(group) for group in preprocessed.groups) == len(distances)
+
+
+def test_no_threshold_keeps_matrix():
+    distances = euclidean_matrix(10, seed=8)
+    preprocessed = preprocess_matrix(distances)
+    assert preprocessed.reduced_matrix is distances
+    assert preprocessed.symmetric
+
+
+def test_shortest_path_closure_repairs_triangle_inequality():
+    distances = np.array([[0, 10, 50], [10, 0, 10], [50, 10, 0]])
+    closure, shortened = shortest_path_closure(distances)
+    assert closure[0, 2] == closure[2, 0] == 20
+    assert shortened == 2
@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import euclidean_matrix
+from tsp_backend import COST_SCALING_FACTOR, build_fuel_cost_matrix, process_and_save_results, run_tsp_solver
+
+
+def _solve(distances, fuel_price, time_limit=1):
+    return run_tsp_solver(distances, fuel_price, 8.0, time_limit, COST_SCALING_FACTOR, polish=False, use_lower_bound=False)
+
+
+def test_cache_hit_is_repriced_with_current_fuel_price(route_cache_dir):
+    distances = euclidean_matrix(15, seed=4)
+    first = _solve(distances, 40.0)
+    assert first[3]['route_cache'] == 'miss'
+    assert len(list(route_cache_dir.glob("*.json"))) == 1
+
+    solution, manager, routing, solver_stats, _ = _solve(distances, 80.0)
+    assert solver_stats['route_cache'] == 'hit'
+    summary, route_df, _, _ = process_and_save_results(
+        solution, manager, routing, distances, COST_SCALING_FACTOR, 80.0, 8.0, "test", solver_stats
+    )
+    route = route_df['Konum_Indeksi'].tolist()
+    costs = build_fuel_cost_matrix(distances, 80.0, 8.0, COST_SCALING_FACTOR)
+    expected = sum(costs[a, b] for a, b in zip(route[:-1], route[1:])) / COST_SCALING_FACTOR
+    assert float(summary['Toplam Yakıt Maliyeti (TRY)']) == pytest.approx(expected, abs=0.01)
+
+
+def test_longer_budget_warm_starts_from_cache(route_cache_dir):
+    distances = euclidean_matrix(15, seed=5)
+    _solve(distances, 40.0, time_limit=1)
+    solver_stats = _solve(distances, 40.0, time_limit=2)[3]
+    assert solver_stats['route_cache'] == 'warm_start'
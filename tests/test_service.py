@@ -0,0 +1,70 @@
+import base64
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import euclidean_matrix
+from tsp_service import ACTIVE_JOB_STATES, JOB_DONE, SolveService, result_tables, validate_job_params
+
+
+def _payload(distances, client="test", **params):
+    labels = [f"Konum{i}" for i in range(len(distances))]
+    buffer = io.StringIO()
+    pd.DataFrame(distances, index=labels, columns=labels).to_csv(buffer)
+    return {
+        'client': client,
+        'matrix': {'name': "ornek.csv", 'content': base64.b64encode(buffer.getvalue().encode('utf-8')).decode('ascii')},
+        'params': {'fuel_price': 45.0, 'time_limit': 1, 'use_route_cache': False, **params},
+    }
+
+
+@pytest.fixture
+def service():
+    service = SolveService(workers=1, write_metrics=False)
+    yield service
+    service.close()
+
+
+def test_submit_deduplicates_identical_payloads(service):
+    distances = euclidean_matrix(10, seed=9)
+    job, duplicate, _ = service.submit(_payload(distances))
+    assert job is not None and not duplicate
+
+    # İstemci adı içerik anahtarına girmez; aynı içerik aynı işe bağlanır
+    same_job, duplicate, messages = service.submit(_payload(distances, client="baska"))
+    assert same_job is job and duplicate
+    assert job.waiters == 2
+    assert any("mevcut işe bağlanıldı" in msg for msg in messages)
+
+    other_job, duplicate, _ = service.submit(_payload(distances, fuel_price=50.0))
+    assert other_job is not job and not duplicate
+
+
+def test_cancel_keeps_job_while_other_submitters_wait(service):
+    distances = euclidean_matrix(10, seed=10)
+    job, _, _ = service.submit(_payload(distances, time_limit=30))
+    service.submit(_payload(distances, time_limit=30))
+    service.cancel(job.id)
+    assert not job.cancel_requested
+    service.cancel(job.id)
+    assert job.cancel_requested
+
+
+def test_job_runs_to_completion(service):
+    distances = euclidean_matrix(10, seed=11)
+    job, _, _ = service.submit(_payload(distances))
+    status = service.status(job.id, include_result=False)
+    while status['state'] in ACTIVE_JOB_STATES:
+        status = service.wait_for_change(job.id, status['version'], timeout=30)
+    assert status['state'] == JOB_DONE, status['error']
+    _, route_df, _ = result_tables(job.result)
+    route = route_df['Konum_Indeksi'].tolist()
+    assert route[0] == route[-1] == 0
+    assert sorted(route[:-1]) == list(range(len(distances)))
+
+
+def test_validate_job_params_requires_fuel_price():
+    params, messages = validate_job_params({'time_limit': 5})
+    assert params is None
+    assert messages[0].startswith("Hata:")
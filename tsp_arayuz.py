@@ -1,249 +1,36 @@
 import streamlit as st
 import pandas as pd
-import requests
-import sys
-from ortools.constraint_solver import routing_enums_pb2
-from ortools.constraint_solver import pywrapcp
-import math
-import json
-from io import BytesIO # Excel/CSV içeriğini bellekte tutmak için
 import traceback # Hataları daha detaylı görmek için
-
-# --- Ayarlar ve Sabitler ---
-TARGET_CITY = "Kayseri"
-TARGET_CITY_CODE = 38 # Opet API'si için Kayseri il kodu
-TARGET_DISTRICTS = {"MELİKGAZİ", "KOCASİNAN", "TALAS"} # Hedef ilçeler
-COST_SCALING_FACTOR = 10000
+import threading
+import time
+import os
+import uuid
+
+from tsp_backend import (
+    TARGET_CITY, TARGET_CITY_CODE, TARGET_DISTRICTS,
+    COST_SCALING_FACTOR, COST_MODE_LABELS, PORTFOLIO_CONFIGS, STOP_REASON_LABELS,
+    LARGE_INSTANCE_THRESHOLD, DEFAULT_CLUSTER_SIZE, SolveMonitor, get_opet_fuel_prices, read_distance_matrix, run_tsp_solver, process_and_save_results,
+    read_location_labels, read_previous_route, reoptimize_route, routing_status_name,
+    DEFAULT_CANDIDATE_NEIGHBORS, read_candidate_graph,
+    DEFAULT_MERGE_THRESHOLD, TRIANGLE_REPAIR_MAX_NODES, preprocess_distance_matrix, finish_preprocessed_solve,
+)
+from tsp_export import PARQUET_AVAILABLE
+from tsp_metrics import RunMetrics, STAGE_LABELS
+from tsp_service import SERVICE_URL_ENV, JOB_QUEUED, SolveServiceClient, RemoteJob, result_tables
+
+PROGRESS_REFRESH_SECONDS = 0.5 # Canlı ilerleme grafiğinin yenilenme aralığı
+DOWNLOAD_LABELS = {
+    'csv': "⬇️ CSV Olarak İndir",
+    'excel': "⬇️ Excel Olarak İndir",
+    'parquet': "⬇️ Parquet Olarak İndir",
+    'json': "⬇️ JSON Olarak İndir",
+}
 
 # --- Backend Fonksiyonları ---
-# (Fonksiyonların döndürdüğü mesajlar zaten çoğunlukla Türkçe)
-
-@st.cache_data(ttl=3600) # Fiyatları 1 saat boyunca önbellekte tut
-def get_opet_fuel_prices(city_code, target_districts):
-    """
-    Opet API'sini kullanarak belirtilen il kodundaki HEDEF İLÇELER için
-    güncel yakıt fiyatlarını alır. Hata mesajı da döndürür.
-    """
-    api_url = "https://api.opet.com.tr/api/fuelprices/prices"
-    params = {"provinceCode": city_code}
-    headers = {
-        'Accept': 'application/json, text/plain, */*',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    target_districts_str = ", ".join(target_districts)
-    # Türkçe mesajlar
-    status_messages = [f"Opet API'sinden il kodu {city_code} ({TARGET_CITY}) için yakıt fiyatları alınıyor..."]
-    status_messages.append(f"(Sadece şu ilçeler dikkate alınacak: {target_districts_str})")
-
-    try:
-        response = requests.get(api_url, params=params, headers=headers, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-
-        if not isinstance(data, list) or not data:
-            return None, status_messages + [f"Hata: API yanıtı beklenen formatta değil (ilçe listesi bekleniyordu). Yanıt: {str(data)[:200]}..."]
-
-        prices = {}
-        found_benzin = False
-        found_motorin = False
-        data_found_in_district = None
-
-        for district_data in data:
-            if not isinstance(district_data, dict): continue
-            district_name_raw = district_data.get('districtName', '')
-            district_name_upper = district_name_raw.upper()
-
-            if district_name_upper not in target_districts: continue
-
-            status_messages.append(f"'{district_name_raw}' hedef ilçesi kontrol ediliyor...")
-            price_list = district_data.get('prices')
-            if not isinstance(price_list, list) or not price_list: continue
-
-            for fuel_item in price_list:
-                 if not isinstance(fuel_item, dict) or 'productName' not in fuel_item or 'amount' not in fuel_item: continue
-                 fuel_name = fuel_item['productName']
-                 try:
-                     price_float = float(fuel_item['amount'])
-                     # Türkçe Ürün İsimleri Kontrolü (API'den geldiği gibi)
-                     if not found_benzin and fuel_name == "Kurşunsuz Benzin 95":
-                         prices['benzin'] = price_float
-                         status_messages.append(f"  > Bulunan Benzin Fiyatı ({district_name_raw}): {price_float:.2f} TRY/L")
-                         found_benzin = True
-                         if data_found_in_district is None: data_found_in_district = district_name_raw
-                     elif not found_motorin and fuel_name == "Motorin EcoForce":
-                         prices['motorin'] = price_float
-                         status_messages.append(f"  > Bulunan Motorin Fiyatı ({district_name_raw}): {price_float:.2f} TRY/L ({fuel_name})")
-                         found_motorin = True
-                         if data_found_in_district is None: data_found_in_district = district_name_raw
-                     elif not found_motorin and fuel_name == "Motorin UltraForce":
-                         prices['motorin'] = price_float
-                         status_messages.append(f"  > Bulunan Motorin Fiyatı ({district_name_raw}): {price_float:.2f} TRY/L ({fuel_name})")
-                         found_motorin = True
-                         if data_found_in_district is None: data_found_in_district = district_name_raw
-                 except (ValueError, TypeError): pass
-
-            if found_benzin and found_motorin:
-                status_messages.append(f"'{data_found_in_district}' hedef ilçesinden gerekli fiyatlar başarıyla alındı.")
-                break
-
-        if not found_benzin or not found_motorin:
-            error_msg = f"Hata: Hedeflenen ilçelerde ({target_districts_str}) Benzin veya Motorin fiyatlarından biri veya ikisi de bulunamadı."
-            # Hata mesajına bulunanları da ekleyelim (varsa)
-            error_msg += f" Bulunanlar: {prices}"
-            return None, status_messages + [error_msg]
-
-        return prices, status_messages
-
-    except requests.exceptions.RequestException as e:
-        return None, status_messages + [f"Hata: Opet API'sine bağlanılamadı: {e}"]
-    except json.JSONDecodeError:
-        return None, status_messages + ["Hata: Opet API yanıtı JSON formatında değil."]
-    except Exception as e:
-        # Hata detayını ekle
-        exc_info = traceback.format_exc()
-        return None, status_messages + [f"Hata: Fiyatlar alınırken beklenmedik hata: {e}", exc_info]
-
-def read_distance_matrix(uploaded_file):
-    """Yüklenen dosyadan mesafe matrisini okur."""
-    if uploaded_file is None:
-        return None, ["Hata: Lütfen bir mesafe matrisi dosyası yükleyin."]
-    try:
-        df = pd.read_csv(uploaded_file, header=0, index_col=0)
-        distance_matrix = df.values.astype(int).tolist()
-        num_rows = len(distance_matrix)
-        if num_rows == 0 or not all(len(row) == num_rows for row in distance_matrix):
-             return None, ["Hata: Yüklenen dosya geçerli bir kare matris içermiyor."]
-
-        return distance_matrix, [f"Başarıyla okunan mesafe matrisi boyutu: {num_rows}x{num_rows}"]
-    except ValueError as e:
-         return None, [f"Hata: CSV dosyasındaki değerler tamsayıya dönüştürülemedi. Lütfen dosya içeriğini kontrol edin. ({e})"]
-    except Exception as e:
-        exc_info = traceback.format_exc()
-        return None, [f"Hata: CSV dosyası okunurken hata oluştu: {e}", exc_info]
-
-def run_tsp_solver(distance_matrix, fuel_price, consumption, time_limit, cost_scaling_factor):
-    """OR-Tools çözücüsünü çalıştırır ve sonucu döndürür."""
-    status_messages = []
-    if not distance_matrix:
-        return None, None, None, ["Hata: Geçersiz mesafe matrisi."]
-
-    num_locations = len(distance_matrix)
-    data = {}
-    data['distance_matrix'] = distance_matrix
-    data['num_vehicles'] = 1
-    data['depot'] = 0
-
-    manager = None
-    routing = None
-    try:
-        manager = pywrapcp.RoutingIndexManager(num_locations, data['num_vehicles'], data['depot'])
-        routing = pywrapcp.RoutingModel(manager)
-    except Exception as e:
-         # Manager veya Model oluşturulurken hata olursa
-         return None, None, None, [f"Hata: Rota modeli oluşturulamadı: {e}", traceback.format_exc()]
-
-
-    # Yakıt maliyeti fonksiyonu (içerik aynı)
-    def fuel_cost_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        if from_node == to_node: return 0
-        try:
-            dist_value = data['distance_matrix'][from_node][to_node]
-            if not isinstance(dist_value, (int, float)): return sys.maxsize
-            distance_meters = int(dist_value)
-        except IndexError: return sys.maxsize
-        except Exception: return sys.maxsize
-
-        distance_km = distance_meters / 1000.0
-        fuel_liters = (distance_km / 100.0) * consumption
-        cost_try = fuel_liters * fuel_price
-        integer_cost = math.ceil(cost_try * cost_scaling_factor)
-        return integer_cost
-
-    try:
-        transit_callback_index = routing.RegisterTransitCallback(fuel_cost_callback)
-        routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
-
-        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-        search_parameters.first_solution_strategy = (
-            routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
-        search_parameters.local_search_metaheuristic = (
-            routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
-        search_parameters.time_limit.seconds = time_limit
-        search_parameters.log_search = False
-
-        status_messages.append(f"Çözücü çalıştırılıyor (süre sınırı: {time_limit} saniye)...")
-        solution = routing.SolveWithParameters(search_parameters)
-        status_messages.append(f"Çözücü tamamlandı. Durum: {routing.status()}") # Durumu mesaja ekle
-        return solution, manager, routing, status_messages
-
-    except Exception as e:
-         return None, manager, routing, status_messages + [f"Hata: Çözücü çalıştırılırken hata oluştu: {e}", traceback.format_exc()]
-
-
-def process_and_save_results(solution, manager, routing, distance_matrix, cost_scaling_factor, fuel_price_used, consumption_used, output_base_filename):
-    """Sonuçları işler, özet oluşturur ve dosya içeriklerini döndürür."""
-    if not solution:
-        return None, None, None, None, ["Hata: Geçersiz çözüm nesnesi."]
-    if not manager or not routing:
-         return None, None, None, None, ["Hata: Geçersiz rota yöneticisi veya model nesnesi."]
-
-
-    try:
-        # Sonuçları al
-        total_cost_try = solution.ObjectiveValue() / cost_scaling_factor
-        route_indices = []
-        index = routing.Start(0)
-        while not routing.IsEnd(index):
-            route_indices.append(manager.IndexToNode(index))
-            index = solution.Value(routing.NextVar(index))
-        route_indices.append(manager.IndexToNode(index))
-
-        route_df = pd.DataFrame(route_indices, columns=['Konum_Indeksi'])
-        route_df.index.name = 'Adim' # Türkçe: Adım
-
-        # Özet Bilgileri Hesapla ve Türkçe Başlıklar
-        num_locations = len(distance_matrix)
-        start_node = manager.IndexToNode(routing.Start(0))
-        route_distance_meters = 0
-        for i in range(len(route_indices) - 1):
-            from_node = route_indices[i]
-            to_node = route_indices[i+1]
-            if 0 <= from_node < num_locations and 0 <= to_node < num_locations:
-                dist_value = distance_matrix[from_node][to_node]
-                if isinstance(dist_value, (int, float)):
-                    route_distance_meters += dist_value
-
-        summary_dict = {
-            'Toplam Yakıt Maliyeti (TRY)': f"{total_cost_try:.2f}",
-            'Toplam Mesafe (km)': f"{route_distance_meters / 1000.0:.2f}",
-            'Kullanılan Yakıt Fiyatı (TRY/L)': f"{fuel_price_used:.4f}",
-            'Araç Tüketimi (Litre/100km)': f"{consumption_used:.1f}", # Birimi netleştirdik
-            'Konum Sayısı': num_locations,
-            'Başlangıç/Bitiş Konum İndeksi': start_node, # Daha açıklayıcı
-            'Ziyaret Edilen Konum Sayısı (Depo Hariç)': len(route_indices) - 2 if len(route_indices) > 1 else 0 # Depo başlangıç ve bitişte var
-        }
-        # Özet DataFrame'i Türkçe sütunlarla
-        summary_df = pd.DataFrame(summary_dict.items(), columns=['Ölçüt', 'Değer'])
-
-
-        # Dosyaları Belleğe Yazdır
-        csv_buffer = BytesIO()
-        route_df.to_csv(csv_buffer, index=True, encoding='utf-8')
-        csv_content = csv_buffer.getvalue()
-
-        excel_buffer = BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            route_df.to_excel(writer, sheet_name='Rota Detayı', index=True) # Türkçe sayfa adı
-            summary_df.to_excel(writer, sheet_name='Özet Bilgiler', index=False) # Türkçe sayfa adı
-        excel_content = excel_buffer.getvalue()
-
-        return summary_dict, route_df, csv_content, excel_content, ["Sonuçlar başarıyla işlendi ve dosyalar hazırlandı."]
-
-    except Exception as e:
-         return None, None, None, None, [f"Hata: Sonuçlar işlenirken hata oluştu: {e}", traceback.format_exc()]
+# (Yakıt fiyatları, matris okuma, çözücü ve sonuç işleme tsp_backend modülündedir)
 
+# Fiyatlar tsp_prices modülündeki kalıcı depodan anında gelir; bayatsa arka planda yenilenir.
+# Bu yüzden burada ayrıca st.cache_data kullanılmaz (yenilenen fiyatlar hemen görünsün).
 
 # --- Streamlit Arayüzü (Tamamen Türkçe Metinler) ---
 
@@ -251,18 +38,34 @@ st.set_page_config(page_title="TSP Yakıt Optimizasyonu", layout="wide")
 
 st.title("🚚 Gezgin Satıcı Problemi (TSP) - Yakıt Maliyeti Optimizasyonu")
 st.write(f"""
-Bu araç, yüklenen `.csv` formatındaki mesafe matrisini kullanarak en uygun rotayı hesaplar.
+Bu araç, yüklenen `.csv` (veya `.npy`, `.npz`, `.bin`) formatındaki mesafe matrisini kullanarak en uygun rotayı hesaplar.
 Maliyet hesabı, **{TARGET_CITY}** ili için (**{', '.join(TARGET_DISTRICTS)}** ilçeleri) Opet'ten alınan güncel yakıt fiyatlarına
 ve sizin belirlediğiniz araç tüketimine göre yapılır. Amaç, toplam yakıt maliyetini minimize etmektir.
 """)
 
 # --- Dosya Yükleme ---
 uploaded_file = st.file_uploader(
-    "Mesafe Matrisi Yükleyin (.csv formatında, Örn: Talas_Tekstil_Konteyner_240x240_Mesafe_Matrisi.csv)",
-    type="csv",
-    help="İlk satır ve ilk sütun konum etiketlerini, geri kalan hücreler ise konumlar arası mesafeleri (metre cinsinden, tamsayı) içermelidir."
+    "Mesafe Matrisi Yükleyin (.csv, .npy, .npz veya .bin formatında, Örn: Talas_Tekstil_Konteyner_240x240_Mesafe_Matrisi.csv)",
+    type=["csv", "npy", "npz", "bin"],
+    help="CSV: İlk satır ve ilk sütun konum etiketlerini, geri kalan hücreler ise konumlar arası mesafeleri (metre cinsinden, tamsayı) içermelidir. "
+         ".npy/.npz: N×N tamsayı dizisi. .bin: satır öncelikli, little-endian int32 N×N ham veri. "
+         "Seyrek aday grafı modunda 'kaynak,hedef,mesafe' başlıklı CSV yol listesi (kısmen bilinen mesafeler) de yüklenebilir."
 )
 
+with st.expander("🔁 Artımlı Güncelleme (Önceki Rotadan)"):
+    previous_route_file = st.file_uploader(
+        "Önceki Rota Dosyası (.csv, .xlsx, .parquet veya .json)",
+        type=["csv", "xlsx", "parquet", "json"],
+        help="Bu uygulamanın daha önce dışa aktardığı rota dosyası. Noktalar 'Konum_Etiketi' sütunu ile yeni matrisin başlık etiketleri üzerinden eşleştirilir."
+    )
+    use_incremental = st.checkbox(
+        "Önceki rotayı güncelle (tam çözüm yerine)",
+        value=True,
+        disabled=previous_route_file is None,
+        help="Kaldırılan noktalar rotadan çıkarılır, yeni noktalar en ucuz konumlara eklenir ve yalnızca değişen bölgede kısa bir iyileştirme yapılır. "
+             "Tam çözümün çok küçük bir kesri kadar sürer."
+    )
+
 # --- Parametreler (Sidebar) ---
 st.sidebar.header("⚙️ Ayarlar")
 fuel_type = st.sidebar.radio(
@@ -284,6 +87,17 @@ vehicle_consumption = st.sidebar.number_input(
     help="Aracınızın 100 kilometrede ortalama kaç litre yakıt tükettiğini girin."
 )
 
+manual_fuel_price = st.sidebar.number_input(
+    "Elle Yakıt Fiyatı (TRY/L, 0 = otomatik):",
+    min_value=0.0,
+    max_value=500.0,
+    value=0.0, # Varsayılan: fiyat kaynağından al
+    step=0.5,
+    format="%.2f",
+    help="0'dan büyükse fiyat kaynağı hiç sorgulanmaz ve bu fiyat kullanılır. "
+         "Fiyat kaynağına ulaşılamadığında ve kayıtlı fiyat olmadığında da buradan devam edebilirsiniz."
+)
+
 time_limit = st.sidebar.slider(
     "Çözücü Süre Sınırı (saniye):",
     min_value=5,
@@ -293,10 +107,164 @@ time_limit = st.sidebar.slider(
     help="Çözücünün en iyi rotayı bulmak için harcayacağı maksimum süre. Süre dolduğunda o ana kadar bulunan en iyi sonuç gösterilir."
 )
 
+solve_method = st.sidebar.radio(
+    "Çözüm Yöntemi:",
+    ["OR-Tools (kapsamlı arama)", "Hızlı Mod (2-opt / Or-opt)"],
+    index=0,
+    captions=["Süre sınırı boyunca metasezgisel arama.", "En yakın komşu + yerel arama; orta boy matrislerde bir saniyenin altında."],
+    help="Hızlı mod, farklı tüketim/fiyat senaryolarını anında denemek içindir; en iyi sonuç için OR-Tools kullanın."
+)
+fast_mode = solve_method.startswith("Hızlı")
+polish_route = st.sidebar.checkbox(
+    "Sonucu 2-opt / Or-opt ile cilala",
+    value=True,
+    disabled=fast_mode,
+    help="Süre sınırı dolduğunda OR-Tools'un bulduğu rota birkaç saniyelik yerel aramayla iyileştirilir."
+)
+
+cost_mode_label = st.sidebar.radio(
+    "Maliyet Hesaplama Modu:",
+    list(COST_MODE_LABELS.values()),
+    index=0, # Varsayılan: maliyet matrisi
+    captions=["Maliyetler bir kez hesaplanır, çözücü Python'a geri dönmez.", "Her yay için Python fonksiyonu çağrılır (eski yöntem)."],
+    help="İki mod aynı rotayı hedefler; fark, çözücünün saniyede keşfedebildiği çözüm sayısındadır."
+)
+cost_mode = {label: mode for mode, label in COST_MODE_LABELS.items()}[cost_mode_label]
+
+use_route_cache = st.sidebar.checkbox(
+    "Rota önbelleğini kullan",
+    value=True,
+    help="Aynı matris daha önce çözüldüyse rota diskten alınır; yalnızca yakıt fiyatı veya tüketim değiştiğinde çözücü yeniden çalıştırılmaz. "
+         "Daha uzun bir süre sınırı seçilirse önceki rota başlangıç çözümü olarak kullanılır."
+)
+
+portfolio_size = st.sidebar.number_input(
+    "Paralel Çözücü Sayısı (Portföy):",
+    min_value=1,
+    max_value=len(PORTFOLIO_CONFIGS),
+    value=1, # Varsayılan: tek çözücü
+    step=1,
+    help="1'den büyükse farklı ilk çözüm stratejisi, metasezgisel ve tohum kombinasyonları ayrı CPU çekirdeklerinde "
+         "aynı süre sınırıyla çalıştırılır ve en düşük maliyetli rota seçilir. Çekirdek sayısından fazlası kullanılmaz."
+)
+
+st.sidebar.subheader("🧩 Büyük Örnek Modu")
+use_decomposition = st.sidebar.checkbox(
+    "Büyük matrislerde kümeleme modunu kullan",
+    value=True,
+    help="Nokta sayısı eşiği aşarsa konumlar kümelere ayrılır, her kümenin rotası paralel çözülür, "
+         "kümeler tek rotada birleştirilir ve küme geçişleri yeniden düzenlenir. Portföy ve rota önbelleği bu modda kullanılmaz. "
+         "4'ten az CPU çekirdeğinde eşiği aşan matrisler hızlı modla çözülür."
+)
+large_instance_threshold = st.sidebar.number_input(
+    "Kümeleme Eşiği (nokta):",
+    min_value=100,
+    max_value=100000,
+    value=LARGE_INSTANCE_THRESHOLD,
+    step=100,
+    disabled=not use_decomposition,
+)
+cluster_size = st.sidebar.number_input(
+    "Hedef Küme Büyüklüğü (nokta):",
+    min_value=50,
+    max_value=2000,
+    value=DEFAULT_CLUSTER_SIZE,
+    step=50,
+    disabled=not use_decomposition,
+    help="Küçük kümeler daha hızlı çözülür ama birleştirme noktası sayısı artar."
+)
+use_candidate_graph = st.sidebar.checkbox(
+    "Seyrek aday grafı kullan (yalnızca en yakın k komşu)",
+    value=False,
+    help="Matrisin tamamı yerine her konumdan en yakın k komşuya giden yollar saklanır; bellek ve hazırlık süresi nokta sayısıyla "
+         "doğrusal büyür. Rota yalnızca bu yollar üzerinde en yakın komşu + 2-opt/Or-opt ile aranır (OR-Tools, kümeleme ve artımlı mod kullanılmaz). "
+         "'kaynak,hedef,mesafe' başlıklı CSV yol listeleri yalnızca bu modda okunur."
+)
+candidate_neighbors = st.sidebar.number_input(
+    "Aday Komşu Sayısı (k):",
+    min_value=2,
+    max_value=100,
+    value=DEFAULT_CANDIDATE_NEIGHBORS,
+    step=1,
+    disabled=not use_candidate_graph,
+    help="Büyük k daha iyi rota, biraz daha fazla bellek ve daha uzun arama demektir."
+)
+
+st.sidebar.subheader("🧹 Ön İşleme")
+merge_co_located = st.sidebar.checkbox(
+    "Aynı konumdaki noktaları birleştir",
+    value=False, # Varsayılan: kapalı
+    disabled=use_candidate_graph,
+    help="Varsayılan olarak kapalıdır. Aralarındaki mesafe (her iki yönde) eşiğin altında olan noktalar tek nokta olarak çözülür, rota sonra "
+         "tüm noktalara genişletilir. Bir nokta gruba ancak grubun tüm noktalarına eşik içindeyse girer (grup çapı eşiği aşmaz). Eşik, matristeki aynı sahadaki "
+         "noktaların mesafesine göre seçilmelidir (ör. Talas matrisinde en yakın iki nokta 13 m arayla olduğu için 10 m hiçbir noktayı birleştirmez). "
+         "Artımlı modda ve seyrek aday grafında uygulanmaz."
+)
+merge_threshold = st.sidebar.number_input(
+    "Birleştirme Eşiği (m):",
+    min_value=0,
+    max_value=1000,
+    value=DEFAULT_MERGE_THRESHOLD,
+    step=5,
+    disabled=use_candidate_graph or not merge_co_located,
+)
+repair_triangle = st.sidebar.checkbox(
+    "Üçgen eşitsizliği ihlallerini onar",
+    value=False,
+    disabled=use_candidate_graph,
+    help="Bir noktadan diğerine başka bir nokta üzerinden gitmek daha kısaysa mesafe o yolun uzunluğuna indirilir (en kısa yol kapanışı). "
+         f"Süre nokta sayısının küpüyle arttığı için {TRIANGLE_REPAIR_MAX_NODES} noktaya kadar uygulanır."
+)
+
+st.sidebar.subheader("⏱️ Erken Durdurma")
+stall_seconds = st.sidebar.number_input(
+    "İyileşme Bekleme Süresi (saniye):",
+    min_value=0,
+    max_value=300,
+    value=0, # Varsayılan: kapalı
+    step=5,
+    help="0 ise kapalı. Bu süre boyunca en iyi rota (yeterince) iyileşmezse çözücü süre sınırını beklemeden durur."
+)
+min_improvement_pct = st.sidebar.number_input(
+    "Minimum İyileşme (%):",
+    min_value=0.0,
+    max_value=100.0,
+    value=0.0,
+    step=0.1,
+    format="%.2f",
+    help="Son bekleme süresi içindeki iyileşme bu yüzdenin altındaysa çözücü durur. 0 ise yalnızca hiç iyileşme olmadığında durur."
+)
+use_lower_bound = st.sidebar.checkbox(
+    "Alt sınır ve optimallik açığını hesapla",
+    value=True,
+    help="Aramadan önce yakıt maliyetinin alt sınırı (Held-Karp 1-ağaç) birkaç saniyeye kadar hesaplanır; bu süre süre sınırından düşülür. "
+         "Açık, rotanın optimumdan en fazla ne kadar pahalı olduğunu gösterir. Hızlı modda ve önbellekten alınan rotada hesaplanmaz."
+)
+target_gap_pct = st.sidebar.number_input(
+    "Hedef Optimallik Açığı (%):",
+    min_value=0.0,
+    max_value=100.0,
+    value=0.0, # Varsayılan: kapalı
+    step=0.5,
+    format="%.2f",
+    disabled=not use_lower_bound,
+    help="0 ise kapalı. En iyi rota alt sınıra bu yüzde kadar yaklaştığında çözücü süre sınırını beklemeden durur."
+)
+
+st.sidebar.subheader("🖥️ Çözüm Servisi")
+service_url = st.sidebar.text_input(
+    "Servis Adresi:",
+    value=os.environ.get(SERVICE_URL_ENV, ""),
+    placeholder="http://127.0.0.1:8765",
+    help="Boş bırakılırsa çözüm bu uygulamanın içinde çalışır. Verilirse dosya ve ayarlar yerel çözüm servisine "
+         "(python tsp_service.py) gönderilir; iş servisin kuyruğunda bekler ve sonuç buraya getirilir. "
+         f"Varsayılan değer {SERVICE_URL_ENV} ortam değişkeninden alınır."
+).strip()
+
 output_filename = st.sidebar.text_input(
     "Çıktı Dosya Adı (Uzantısız):",
     value="TSP_Rota_Sonucu", # Varsayılan değer güncellendi
-    help="İndirilecek CSV ve Excel dosyalarının temel adı."
+    help="İndirilecek rota dosyalarının temel adı."
 )
 
 # --- Çalıştırma Butonu ---
@@ -309,129 +277,386 @@ st.divider()
 # --- Sonuç Alanı ---
 results_placeholder = st.empty() # İlk başta boş
 
-if run_button:
-    results_placeholder.info("İşlem başlatılıyor...")
-
-    # 1. Mesafe Matrisini Oku
-    distance_matrix, matrix_msgs = read_distance_matrix(uploaded_file)
-    with st.expander("Dosya Okuma Detayları", expanded=(distance_matrix is None)):
-        for msg in matrix_msgs:
+def show_messages(title, messages, expanded=False):
+    """Durum mesajlarını bir genişletici (expander) içinde gösterir."""
+    with st.expander(title, expanded=expanded):
+        for msg in messages:
              if "Hata:" in msg: st.error(msg)
              else: st.info(msg)
 
-    if distance_matrix is None:
-        results_placeholder.error("❌ Mesafe matrisi okunamadı. Lütfen yukarıdaki detayları kontrol edin.")
-        st.stop()
+def render_progress(monitor, time_limit, container):
+    """Arka planda çalışan çözümün anlık durumunu ve yakınsama grafiğini çizer."""
+    history = monitor.history()
+    elapsed = monitor.elapsed()
+    with container.container():
+        if isinstance(monitor, RemoteJob) and monitor.state == JOB_QUEUED:
+            st.info(f"İş çözüm servisinin kuyruğunda bekliyor (sıra: {monitor.queue_position or '-'}).")
+            return
+        st.progress(min(elapsed / time_limit, 1.0), text=f"Geçen süre: {elapsed:.0f} / {time_limit} sn")
+        if history:
+            gap = monitor.gap_pct()
+            col_p, col_q, col_r = st.columns(3)
+            col_p.metric("En İyi Maliyet (Şu Ana Kadar)", f"{history[-1][1]:.2f} TRY")
+            col_q.metric("Son İyileşme", f"{history[-1][0]:.1f}. sn")
+            col_r.metric("Optimallik Açığı", f"%{gap:.2f}" if gap is not None else "-")
+            render_convergence_chart(history)
+        else:
+            st.info("İlk çözüm aranıyor...")
+
+def render_convergence_chart(history):
+    """İyileşen çözümlerin zamana göre maliyetini çizgi grafik olarak gösterir."""
+    convergence_df = pd.DataFrame(history, columns=['Süre (sn)', 'Yakıt Maliyeti (TRY)']).set_index('Süre (sn)')
+    st.line_chart(convergence_df)
+
+def save_run_metrics(job, solver_stats, summary_dict):
+    """Çalıştırmanın ölçümlerini JSONL günlüğüne ve Prometheus dosyasına yazar; durum mesajlarını döndürür."""
+    run_metrics = job['metrics']
+    run_metrics.add_solver_stats(solver_stats)
+    run_metrics.fields.update({
+        'num_locations': len(job['distance_matrix']),
+        'num_solved_locations': len(job['solve_matrix']),
+        'time_limit': job['time_limit'],
+        'objective_try': float(summary_dict['Toplam Yakıt Maliyeti (TRY)']) if summary_dict else None,
+        'optimality_gap_pct': float(summary_dict['Optimallik Açığı (%)']) if summary_dict and 'Optimallik Açığı (%)' in summary_dict else None,
+    })
+    try:
+        log_path = run_metrics.append_jsonl()
+        prometheus_path = run_metrics.write_prometheus()
+    except OSError as e:
+        return [f"Uyarı: Ölçümler yazılamadı: {e}"]
+    return [f"Ölçümler günlüğe eklendi: {log_path}", f"Prometheus dosyası güncellendi: {prometheus_path}"]
+
+def collect_remote_result(job):
+    """Servisteki biten işin sonucunu, yerel çözümdeki gibi iş sözlüğünün result/processed alanlarına yazar."""
+    remote_job = job['remote']
+    result, service_msgs = remote_job.fetch_result()
+    # Ölçümler servis tarafından günlüğe yazılır; burada yalnızca performans görünümü için aktarılır
+    job['metrics_msgs'] = [f"Ölçümler çözüm servisi tarafından günlüğe eklendi (iş: {remote_job.job_id})."]
+    if result is None:
+        job['result'] = (None, None, None, None, service_msgs)
+        return
+    messages = result['messages']
+    job['matrix_msgs'] = messages['matrix']
+    job['preprocess_msgs'] = messages['preprocess']
+    job['metrics'].stages.update(result['metrics']['stages'])
+    job['metrics'].solver.update(result['metrics']['solver'])
+    if result['status'] != 'ok':
+        job['result'] = (None, None, None, result['solver_stats'], service_msgs + messages['solver'] + messages['process'])
+        return
+    summary_dict, route_df, exports = result_tables(result)
+    job['result'] = (route_df['Konum_Indeksi'].tolist(), None, None, result['solver_stats'], service_msgs + messages['solver'])
+    job['processed'] = (summary_dict, route_df, exports, messages['process'])
+
+def render_performance(run_metrics, exports, messages):
+    """Aşama süreleri, tepe bellek ve çözücü sayaçlarını 'Performans' genişleticisinde gösterir."""
+    with st.expander("⏱️ Performans"):
+        # Dışa aktarım aşamaları yalnızca ilgili dosya indirildiyse görünür
+        stages = {**run_metrics.stages, **(exports.stages if exports is not None else {})}
+        stage_order = list(STAGE_LABELS)
+        stages = dict(sorted(stages.items(), key=lambda item: stage_order.index(item[0]) if item[0] in stage_order else len(stage_order)))
+        if stages:
+            stage_df = pd.DataFrame([
+                {'Aşama': STAGE_LABELS.get(name, name), 'Süre (sn)': stage['seconds'], 'Tepe RSS (MB)': stage['rss_peak_mb']}
+                for name, stage in stages.items()
+            ])
+            st.dataframe(stage_df, hide_index=True, use_container_width=True,
+                         column_config={'Süre (sn)': st.column_config.NumberColumn(format="%.3f"),
+                                        'Tepe RSS (MB)': st.column_config.NumberColumn(format="%.1f")})
+        solver = run_metrics.solver
+        callback_calls = solver.get('transit_callback_calls')
+        last_improvement = solver.get('last_improvement_seconds')
+        col_m1, col_m2, col_m3 = st.columns(3)
+        col_m1.metric("Geri Çağrı Sayısı", f"{callback_calls:,}" if callback_calls is not None else "Yerel matris")
+        col_m2.metric("Çözüm / Dal", f"{solver.get('solutions') or 0:,} / {solver.get('branches') or 0:,}")
+        col_m3.metric("Son İyileşme", f"{last_improvement:.1f}. sn" if last_improvement is not None else "-")
+        st.caption(f"Çözücü durumu: {solver.get('status') or '-'} · Durma nedeni: "
+                   f"{STOP_REASON_LABELS.get(solver.get('stop_reason'), solver.get('stop_reason') or '-')}")
+        for msg in messages:
+            st.caption(msg)
+
+if run_button:
+    # Önceki çözüm hâlâ çalışıyorsa durdur
+    previous_job = st.session_state.pop('solve_job', None)
+    if previous_job and previous_job['thread'].is_alive():
+        previous_job['monitor'].cancel()
+
+    results_placeholder.info("İşlem başlatılıyor...")
+    run_metrics = RunMetrics('arayuz')
+
+    if service_url:
+        # İnce istemci: dosyalar olduğu gibi servise gönderilir; okuma ve ön işleme serviste yapılır
+        if uploaded_file is None:
+            results_placeholder.error("❌ Lütfen bir mesafe matrisi dosyası yükleyin.")
+            st.stop()
+        distance_matrix = location_labels = previous_route_labels = preprocessed = None
+        matrix_msgs, preprocess_msgs = [], []
+    else:
+        # 1. Mesafe Matrisini Oku
+        with run_metrics.stage('matrix_read'):
+            if use_candidate_graph:
+                distance_matrix, matrix_msgs = read_candidate_graph(uploaded_file, candidate_neighbors)
+            else:
+                distance_matrix, matrix_msgs = read_distance_matrix(uploaded_file)
+        show_messages("Dosya Okuma Detayları", matrix_msgs, expanded=(distance_matrix is None))
+
+        if distance_matrix is None:
+            results_placeholder.error("❌ Mesafe matrisi okunamadı. Lütfen yukarıdaki detayları kontrol edin.")
+            st.stop()
+        if use_candidate_graph:
+            location_labels, label_msgs = distance_matrix.labels, []
+        else:
+            location_labels, label_msgs = read_location_labels(uploaded_file)
+        matrix_msgs = matrix_msgs + label_msgs
+
+        previous_route_labels = None
+        if previous_route_file is not None and use_incremental:
+            previous_route_labels, previous_route_msgs = read_previous_route(previous_route_file)
+            show_messages("Önceki Rota Okuma Detayları", previous_route_msgs, expanded=(previous_route_labels is None))
+            if previous_route_labels is None:
+                results_placeholder.error("❌ Önceki rota okunamadı.")
+                st.stop()
+
+        # Ön işleme: aynı konumdaki noktalar birleştirilir, simetri tespit edilir, istenirse üçgen eşitsizliği onarılır.
+        # Artımlı mod noktaları etiketle eşleştirdiği için orada birleştirme yapılmaz.
+        preprocessed = None
+        preprocess_msgs = []
+        if not use_candidate_graph:
+            with run_metrics.stage('preprocessing'):
+                preprocessed, preprocess_msgs = preprocess_distance_matrix(
+                    distance_matrix,
+                    merge_threshold if merge_co_located and previous_route_labels is None else None,
+                    repair_triangle
+                )
+            show_messages("Ön İşleme Detayları", preprocess_msgs)
 
     # 2. Yakıt Fiyatlarını Al
     fuel_prices = None
     selected_fuel_price = None
-    with st.spinner("⛽ Güncel yakıt fiyatları Opet API'sinden alınıyor..."):
-        fuel_prices, price_msgs = get_opet_fuel_prices(TARGET_CITY_CODE, TARGET_DISTRICTS)
-        with st.expander("Yakıt Fiyatı Alma Detayları", expanded=(fuel_prices is None)):
-             for msg in price_msgs:
-                  if "Hata:" in msg: st.error(msg)
-                  else: st.info(msg)
-
-    if fuel_prices is None:
-         results_placeholder.error("❌ Yakıt fiyatları alınamadı.")
-         st.stop()
-
-    selected_fuel_price = fuel_prices.get(fuel_type_internal) # Küçük harf ile kontrol et
-    if selected_fuel_price is None:
-         results_placeholder.error(f"❌ '{fuel_type}' tipi için hedeflenen ilçelerde fiyat bulunamadı.")
-         st.stop()
-
-    results_placeholder.success(f"✅ Hesaplamada kullanılacak {fuel_type} fiyatı: {selected_fuel_price:.4f} TRY/L")
-
-    # 3. TSP Çözücüsünü Çalıştır
-    solution = None
-    manager = None
-    routing = None
-    try:
-        with st.spinner(f"⏳ En düşük maliyetli rota aranıyor (En Fazla {time_limit} sn)... Lütfen bekleyin."):
-            solution, manager, routing, solver_msgs = run_tsp_solver(
-                distance_matrix,
-                selected_fuel_price,
-                vehicle_consumption,
-                time_limit,
-                COST_SCALING_FACTOR
+    if manual_fuel_price > 0:
+        selected_fuel_price = manual_fuel_price
+        price_msgs = [f"Elle girilen yakıt fiyatı kullanılıyor: {manual_fuel_price:.2f} TRY/L ({fuel_type})."]
+        show_messages("Yakıt Fiyatı Alma Detayları", price_msgs)
+    else:
+        with st.spinner("⛽ Güncel yakıt fiyatları alınıyor..."), run_metrics.stage('fuel_prices'):
+            fuel_prices, price_msgs = get_opet_fuel_prices(TARGET_CITY_CODE, TARGET_DISTRICTS)
+            show_messages("Yakıt Fiyatı Alma Detayları", price_msgs, expanded=(fuel_prices is None))
+
+        if fuel_prices is None:
+             results_placeholder.error("❌ Yakıt fiyatları alınamadı. Kenar çubuğundan elle yakıt fiyatı girerek devam edebilirsiniz.")
+             st.stop()
+
+        selected_fuel_price = fuel_prices.get(fuel_type_internal) # Küçük harf ile kontrol et
+        if selected_fuel_price is None:
+             results_placeholder.error(f"❌ '{fuel_type}' tipi için hedeflenen ilçelerde fiyat bulunamadı. Elle yakıt fiyatı girebilirsiniz.")
+             st.stop()
+
+    # 3. TSP Çözücüsünü Arka Planda (veya Çözüm Servisinde) Başlat
+    # Çözüm ayrı bir iş parçacığında çalışır; sayfa bu sürede ilerlemeyi gösterir ve iptal edilebilir.
+    # Servis adresi verilmişse iş servisin kuyruğuna gönderilir; RemoteJob hem izleyici hem de iş parçacığı yerine geçer.
+    remote_job = None
+    if service_url:
+        if 'service_client_id' not in st.session_state:
+            st.session_state['service_client_id'] = f"arayuz-{uuid.uuid4().hex[:8]}" # Servis kuyruğunda oturumlar arası adalet için
+        service_client = SolveServiceClient(service_url, st.session_state['service_client_id'])
+        service_params = {
+            'fuel_price': float(selected_fuel_price),
+            'consumption': float(vehicle_consumption),
+            'time_limit': int(time_limit),
+            'cost_mode': cost_mode,
+            'use_route_cache': use_route_cache,
+            'portfolio_size': int(portfolio_size),
+            'large_instance_threshold': int(large_instance_threshold) if use_decomposition else 0,
+            'cluster_size': int(cluster_size),
+            'polish': polish_route,
+            'fast_mode': fast_mode,
+            'candidate_neighbors': int(candidate_neighbors) if use_candidate_graph else 0,
+            'merge_threshold': int(merge_threshold) if merge_co_located else None,
+            'repair_triangle': repair_triangle,
+            'use_lower_bound': use_lower_bound,
+            'target_gap_pct': float(target_gap_pct),
+            'stall_seconds': int(stall_seconds),
+            'min_improvement_pct': float(min_improvement_pct),
+            'output_name': output_filename,
+        }
+        previous_route = None
+        if previous_route_file is not None and use_incremental:
+            previous_route = (previous_route_file.name, previous_route_file.getvalue())
+        with st.spinner("📤 İş çözüm servisine gönderiliyor..."):
+            submitted, service_msgs = service_client.submit(uploaded_file.name, uploaded_file.getvalue(), service_params, previous_route)
+        show_messages("Çözüm Servisi Detayları", service_msgs, expanded=(submitted is None))
+        if submitted is None:
+            results_placeholder.error("❌ İş çözüm servisine gönderilemedi. Servis adresini kontrol edin veya adresi silerek yerel çözüme dönün.")
+            st.stop()
+        remote_job = RemoteJob(service_client, submitted['job_id'])
+
+    # İş bilgisi oturum durumunda tutulur, böylece yeniden çalıştırmalarda (ör. indirme) sonuç kaybolmaz.
+    solve_job = {
+        'monitor': remote_job or SolveMonitor(stall_seconds, min_improvement_pct, COST_SCALING_FACTOR, target_gap_pct),
+        'distance_matrix': preprocessed.matrix if preprocessed else distance_matrix, # Rota maliyeti tüm noktalarla hesaplanır
+        'solve_matrix': preprocessed.reduced_matrix if preprocessed else distance_matrix,
+        'preprocessed': preprocessed,
+        'location_labels': location_labels,
+        'previous_route_labels': previous_route_labels,
+        'fuel_type': fuel_type,
+        'fuel_price': selected_fuel_price,
+        'consumption': vehicle_consumption,
+        'time_limit': time_limit,
+        'output_filename': output_filename,
+        'matrix_msgs': matrix_msgs,
+        'preprocess_msgs': preprocess_msgs,
+        'price_msgs': price_msgs,
+        'result': None,
+        'processed': None,
+        'metrics': run_metrics,
+        'metrics_msgs': None,
+        'remote': remote_job,
+    }
+
+    def solve_in_background(job=solve_job):
+        try:
+            if job['previous_route_labels'] is not None:
+                job['result'] = reoptimize_route(
+                    job['previous_route_labels'],
+                    job['distance_matrix'],
+                    job['location_labels'],
+                    job['fuel_price'],
+                    job['consumption'],
+                    job['time_limit'],
+                    COST_SCALING_FACTOR,
+                    job['monitor']
+                )
+                return
+            result = run_tsp_solver(
+                job['solve_matrix'],
+                job['fuel_price'],
+                job['consumption'],
+                job['time_limit'],
+                COST_SCALING_FACTOR,
+                cost_mode,
+                use_route_cache,
+                portfolio_size,
+                job['monitor'],
+                large_instance_threshold if use_decomposition else 0,
+                cluster_size,
+                polish_route,
+                fast_mode,
+                job['preprocessed'].symmetric if job['preprocessed'] else False,
+                use_lower_bound,
+                job['preprocessed'].matrix if job['preprocessed'] else None # Alt sınır tüm noktalarla hesaplanır
             )
-            with st.expander("Çözücü Çalışma Detayları"):
-                 for msg in solver_msgs:
-                      if "Hata:" in msg: st.error(msg)
-                      else: st.info(msg)
-    except Exception as e:
-        st.error(f"❌ Çözücü çalıştırılırken kritik bir hata oluştu: {e}")
-        st.code(traceback.format_exc())
-        st.stop()
+            # Birleştirilen noktalar rotaya geri eklenir
+            job['result'] = finish_preprocessed_solve(job['preprocessed'], result)
+        except Exception as e:
+            job['result'] = (None, None, None, None, [f"Hata: Çözücü çalıştırılırken kritik bir hata oluştu: {e}", traceback.format_exc()])
 
+    if remote_job is not None:
+        solve_job['thread'] = remote_job
+    else:
+        solve_job['thread'] = threading.Thread(target=solve_in_background, daemon=True)
+        solve_job['thread'].start()
+    st.session_state['solve_job'] = solve_job
+
+solve_job = st.session_state.get('solve_job')
+if solve_job:
+    if solve_job['remote'] is not None and solve_job['result'] is None and not solve_job['remote'].is_alive():
+        collect_remote_result(solve_job)
+    if not run_button:
+        # Yeniden çalıştırmada önceki adımların mesajlarını tekrar göster
+        show_messages("Dosya Okuma Detayları", solve_job['matrix_msgs'])
+        show_messages("Ön İşleme Detayları", solve_job['preprocess_msgs'])
+        show_messages("Yakıt Fiyatı Alma Detayları", solve_job['price_msgs'])
+    results_placeholder.success(f"✅ Hesaplamada kullanılacak {solve_job['fuel_type']} fiyatı: {solve_job['fuel_price']:.4f} TRY/L")
+
+    if solve_job['thread'].is_alive():
+        st.subheader("📈 Canlı İlerleme")
+        st.button("⏹️ Çözümü İptal Et", on_click=solve_job['monitor'].cancel, help="Arama durdurulur ve o ana kadar bulunan en iyi rota gösterilir.")
+        progress_placeholder = st.empty()
+        while solve_job['thread'].is_alive():
+            render_progress(solve_job['monitor'], solve_job['time_limit'], progress_placeholder)
+            time.sleep(PROGRESS_REFRESH_SECONDS)
+        st.rerun() # Çözüm bitti; sonuçları iptal düğmesi olmadan göster
+
+    solution, manager, routing, solver_stats, solver_msgs = solve_job['result']
+    show_messages("Çözücü Çalışma Detayları", solver_msgs)
 
     # 4. Sonuçları İşle ve Göster
+    exports = None
     if solution:
         results_placeholder.success("🎉 Çözüm başarıyla bulundu!")
-        with st.spinner("📊 Sonuçlar işleniyor ve dosyalar hazırlanıyor..."):
-            summary_dict, route_df, csv_content, excel_content, process_msgs = process_and_save_results(
-                solution, manager, routing, distance_matrix,
-                COST_SCALING_FACTOR, selected_fuel_price, vehicle_consumption,
-                output_filename
-            )
-            with st.expander("Sonuç İşleme Detayları"):
-                 for msg in process_msgs:
-                      if "Hata:" in msg: st.error(msg)
-                      else: st.info(msg)
-
-            if summary_dict and route_df is not None and csv_content and excel_content:
-                st.subheader("📊 Özet Bilgiler")
-                col_a, col_b, col_c = st.columns(3)
-                # Özet metrikler (anahtar kontrolü ekleyelim)
-                col_a.metric("Toplam Yakıt Maliyeti", f"{summary_dict.get('Toplam Yakıt Maliyeti (TRY)', 'N/A')} TRY")
-                col_b.metric("Toplam Mesafe", f"{summary_dict.get('Toplam Mesafe (km)', 'N/A')} km")
-                col_c.metric("Ziyaret Sayısı (Depo Hariç)", summary_dict.get('Ziyaret Edilen Konum Sayısı (Depo Hariç)', 'N/A'))
-
-                # Diğer özet bilgileri tablo olarak göster
-                summary_display_df = pd.DataFrame(summary_dict.items(), columns=['Ölçüt', 'Değer'])
-                st.dataframe(summary_display_df, hide_index=True, use_container_width=True)
-
-
-                st.subheader("📍 Hesaplanan Rota Adımları")
-                st.dataframe(route_df, use_container_width=True) # Sütunlar Türkçe ('Adim', 'Konum_Indeksi')
-
-                st.subheader("💾 Sonuçları İndir")
-                col_d, col_e = st.columns(2)
-                with col_d:
+        if solve_job['processed'] is None:
+            with st.spinner("📊 Sonuçlar işleniyor..."), solve_job['metrics'].stage('result_processing'):
+                solve_job['processed'] = process_and_save_results(
+                    solution, manager, routing, solve_job['distance_matrix'],
+                    COST_SCALING_FACTOR, solve_job['fuel_price'], solve_job['consumption'],
+                    solve_job['output_filename'], solver_stats, solve_job['location_labels']
+                )
+        summary_dict, route_df, exports, process_msgs = solve_job['processed']
+        show_messages("Sonuç İşleme Detayları", process_msgs)
+
+        if summary_dict and route_df is not None and exports is not None:
+            st.subheader("📊 Özet Bilgiler")
+            col_a, col_b, col_c = st.columns(3)
+            # Özet metrikler (anahtar kontrolü ekleyelim)
+            col_a.metric("Toplam Yakıt Maliyeti", f"{summary_dict.get('Toplam Yakıt Maliyeti (TRY)', 'N/A')} TRY")
+            if 'Optimallik Açığı (%)' in summary_dict:
+                col_a.caption(f"Alt sınır: {summary_dict['Alt Sınır (TRY)']} TRY · Optimallik açığı: %{summary_dict['Optimallik Açığı (%)']}")
+            col_b.metric("Toplam Mesafe", f"{summary_dict.get('Toplam Mesafe (km)', 'N/A')} km")
+            col_c.metric("Ziyaret Sayısı (Depo Hariç)", summary_dict.get('Ziyaret Edilen Konum Sayısı (Depo Hariç)', 'N/A'))
+
+            # Diğer özet bilgileri tablo olarak göster
+            summary_display_df = pd.DataFrame(summary_dict.items(), columns=['Ölçüt', 'Değer'])
+            st.dataframe(summary_display_df, hide_index=True, use_container_width=True)
+
+            if solver_stats and solver_stats.get('history'):
+                with st.expander("📈 Yakınsama Grafiği"):
+                    render_convergence_chart(solver_stats['history'])
+
+            if solver_stats and solver_stats.get('portfolio'):
+                with st.expander(f"🏁 Portföy Sonuçları (Kazanan: {solver_stats.get('portfolio_winner') or '-'})", expanded=True):
+                    portfolio_df = pd.DataFrame(solver_stats['portfolio']).rename(columns={
+                        'config': 'Yapılandırma', 'objective_try': 'Amaç Değeri (TRY)', 'solutions': 'Çözüm Sayısı',
+                        'solve_seconds': 'Süre (sn)', 'error': 'Hata',
+                    })
+                    st.dataframe(portfolio_df, hide_index=True, use_container_width=True)
+
+
+            st.subheader("📍 Hesaplanan Rota Adımları")
+            st.dataframe(route_df, use_container_width=True) # Sütunlar Türkçe ('Adim', 'Konum_Indeksi', 'Mesafe_m', 'Yakit_Maliyeti_TRY')
+
+            st.subheader("💾 Sonuçları İndir")
+            # Dosyalar yalnızca düğmeye basıldığında üretilir ve bu çözüm için saklanır
+            download_formats = [fmt for fmt in DOWNLOAD_LABELS if fmt != 'parquet' or PARQUET_AVAILABLE]
+            for column, export_format in zip(st.columns(len(download_formats)), download_formats):
+                with column:
                     st.download_button(
-                        label="⬇️ CSV Olarak İndir", # İkon eklendi
-                        data=csv_content,
-                        file_name=f"{output_filename}_rota_maliyet.csv",
-                        mime='text/csv',
+                        label=DOWNLOAD_LABELS[export_format],
+                        data=getattr(exports, export_format),
+                        file_name=exports.file_name(solve_job['output_filename'], export_format),
+                        mime=exports.mime(export_format),
+                        on_click='ignore', # İndirme sayfayı yeniden çalıştırmaz
                         use_container_width=True
                     )
-                with col_e:
-                    st.download_button(
-                        label="⬇️ Excel Olarak İndir", # İkon eklendi
-                        data=excel_content,
-                        file_name=f"{output_filename}_rota_maliyet.xlsx",
-                        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                        use_container_width=True
-                    )
-            else:
-                results_placeholder.error("❌ Sonuçlar işlenirken veya dosyalar hazırlanırken bir hata oluştu. Detayları kontrol edin.")
+        else:
+            results_placeholder.error("❌ Sonuçlar işlenirken bir hata oluştu. Detayları kontrol edin.")
 
     else:
-        status_name = 'Bilinmiyor'
         solver_status = 'UNKNOWN' # Varsayılan durum
         if routing:
              try:
-                  # OR-Tools durum kodlarını metne çevirelim (varsa)
-                  status_map = {
-                       0: 'ROUTING_NOT_SOLVED', 1: 'ROUTING_SUCCESS', 2: 'ROUTING_FAIL',
-                       3: 'ROUTING_FAIL_TIMEOUT', 4: 'ROUTING_INVALID'
-                  }
-                  solver_status = status_map.get(routing.status(), f'Bilinmeyen Durum ({routing.status()})')
+                  # OR-Tools durum kodunu metne çevirelim
+                  solver_status = routing_status_name(routing.status())
              except Exception: pass
-        results_placeholder.warning(f"⚠️ Çözüm bulunamadı! Çözücü durumu: {solver_status}")
-        st.info("Süre sınırını artırmayı veya girdi verilerini kontrol etmeyi deneyebilirsiniz.")
+        if solver_stats and solver_stats.get('stop_reason') == 'cancelled':
+            results_placeholder.warning("⚠️ Çözüm, ilk rota bulunamadan iptal edildi.")
+        else:
+            results_placeholder.warning(f"⚠️ Çözüm bulunamadı! Çözücü durumu: {solver_status}")
+            st.info("Süre sınırını artırmayı veya girdi verilerini kontrol etmeyi deneyebilirsiniz.")
+
+    # 5. Performans Ölçümleri (çalıştırma başına bir kez günlüğe yazılır)
+    if solve_job['metrics_msgs'] is None:
+        processed_summary = solve_job['processed'][0] if solve_job['processed'] else None
+        solve_job['metrics_msgs'] = save_run_metrics(solve_job, solver_stats, processed_summary)
+    render_performance(solve_job['metrics'], exports, solve_job['metrics_msgs'])
 
 
 # Streamlit uygulamasını çalıştırmak için talimat
@@ -0,0 +1,1894 @@
+"""
+TSP yakıt maliyeti optimizasyonunun arka uç (backend) fonksiyonları.
+Streamlit arayüzünden bağımsızdır (Streamlit'i içe aktarmaz); çözücü alt
+süreçleri ve komut satırı toplu çözümü (tsp_batch.py) bu modülü kullanır.
+"""
+import pandas as pd
+import numpy as np
+import sys
+from ortools.constraint_solver import routing_enums_pb2
+from ortools.constraint_solver import pywrapcp
+import math
+import json
+from io import BytesIO # Yüklenen dosya içeriğini bellekte okumak için
+import traceback # Hataları daha detaylı görmek için
+import time
+import os
+import hashlib
+import struct
+import zipfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+import queue
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from tsp_prices import get_fuel_prices
+from tsp_local_search import improve_tour, solve_fast, tour_length, cheapest_insertion, build_neighbor_lists
+from tsp_export import RouteExport, read_route_table
+from tsp_metrics import measure_stage
+from tsp_sparse import CandidateGraph, CANDIDATE_BLOCK_ROWS, DEFAULT_CANDIDATE_NEIGHBORS
+from tsp_preprocess import preprocess_matrix, DEFAULT_MERGE_THRESHOLD, TRIANGLE_REPAIR_MAX_NODES
+from tsp_bounds import lower_bound, LOWER_BOUND_MAX_NODES
+
+# --- Ayarlar ve Sabitler ---
+TARGET_CITY = "Kayseri"
+TARGET_CITY_CODE = 38 # Opet API'si için Kayseri il kodu
+TARGET_DISTRICTS = {"MELİKGAZİ", "KOCASİNAN", "TALAS"} # Hedef ilçeler
+COST_SCALING_FACTOR = 10000
+# Maliyet hesaplama modları
+COST_MODE_MATRIX = "matrix" # Maliyet matrisi NumPy ile bir kez hesaplanır, OR-Tools'a yerel matris olarak verilir
+COST_MODE_CALLBACK = "callback" # Eski yöntem: her yay için Python geri çağrısı (yedek mod)
+COST_MODE_LABELS = {
+    COST_MODE_MATRIX: "Maliyet Matrisi (Hızlı)",
+    COST_MODE_CALLBACK: "Python Geri Çağrısı (Yedek)",
+}
+# Matris dosyası ayrıştırma
+MATRIX_CACHE_MAX_ENTRIES = 8 # Bellekte tutulacak ayrıştırılmış matris sayısı
+INT32_MIN = np.iinfo(np.int32).min
+INT32_MAX = np.iinfo(np.int32).max
+NPY_MAGIC = b"\x93NUMPY"
+EDGE_LIST_COLUMNS = ('kaynak', 'hedef', 'mesafe') # Kısmen bilinen mesafeler: bu başlıklara sahip CSV yol listesi
+ZIP_MAGIC = b"PK\x03\x04"
+# Çözülmüş rota önbelleği (diskte, en az kullanılan kayıt silinir)
+ROUTE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tsp_cache", "routes")
+ROUTE_CACHE_ENV = "TSP_ROTA_ONBELLEGI" # Verilirse önbellek dizini (alt süreçler dahil) bu ortam değişkeninden okunur
+ROUTE_CACHE_MAX_ENTRIES = 64
+ROUTE_CACHE_LABELS = {
+    'hit': "Önbellekten alındı",
+    'warm_start': "Önbellekteki rotadan başlatıldı",
+    'miss': "Önbellekte yok (yeni çözüm)",
+    'off': "Kapalı",
+}
+# İlerleme izleme ve erken durdurma
+STOP_CHECK_INTERVAL = 0.25 # Çözücü içinden durdurma kurallarının kontrol aralığı (saniye)
+PROGRESS_POLL_INTERVAL = 0.2 # Portföy işçilerinden ilerleme toplama aralığı (saniye)
+STOP_REASON_LABELS = {
+    'time_limit': "Süre sınırı doldu",
+    'stalled': "İyileşme durdu (erken durdurma)",
+    'cancelled': "Kullanıcı tarafından iptal edildi",
+    'local_optimum': "Yerel optimuma ulaşıldı",
+    'target_gap': "Hedef optimallik açığına ulaşıldı",
+}
+# Çözücü yapılandırmaları (ilk çözüm stratejisi, metasezgisel, rastgelelik tohumu)
+LARGE_INSTANCE_THRESHOLD = 3000 # Bu kadar ve daha fazla noktada "önce kümele, sonra rotala" moduna geçilir (0: kapalı)
+DECOMPOSITION_MIN_CPUS = 4 # Daha az çekirdekte kümeleme modu hızlı moddan yavaş ve kötü; büyük örnekler hızlı modla çözülür
+DEFAULT_CLUSTER_SIZE = 300 # Kümeleme modunda hedeflenen küme büyüklüğü
+CLUSTER_MAX_SIZE_FACTOR = 1.5 # Hedefin bu katından büyük kümeler yeniden bölünür
+KMEDOIDS_ITERATIONS = 5
+MEDOID_SAMPLE_SIZE = 1000 # Medoid aranırken kümeden en fazla bu kadar aday denenir
+BOUNDARY_REPAIR_WINDOW = 25 # Sınır onarımında küme geçişinin her iki yanından yeniden sıralanan nokta sayısı
+CLUSTER_PHASE_SHARE = 0.75 # Süre bütçesinin küme alt turlarına ayrılan payı; kalanı sınır onarımına
+MIN_SUBPROBLEM_SECONDS = 0.05 # Alt problemde ilk çözümün bulunabilmesi için en kısa süre; onarım bunun altında atlanır
+CLUSTER_ORDER_TIME_LIMIT = 1.0 # Küme sıralaması için en uzun süre (saniye)
+CLUSTER_ORDER_SHARE = 0.1 # Küme sıralaması süre sınırının en fazla bu payını kullanır
+POLISH_TIME_SHARE = 0.2 # Cilalamaya süre sınırından ayrılan en büyük pay (POLISH_TIME_LIMIT ile sınırlı)
+
+INCREMENTAL_TIME_LIMIT = 5.0 # Artımlı modda yerel iyileştirme için en uzun süre (saniye)
+POLISH_TIME_LIMIT = 5.0 # OR-Tools sonrası 2-opt/Or-opt cilalama için en uzun süre (saniye)
+LOWER_BOUND_TIME_LIMIT = 2.0 # Alt sınır (Held-Karp) hesabı için en uzun süre (saniye)
+LOWER_BOUND_TIME_SHARE = 0.1 # Alt sınır hesabı çözücü süre sınırının en fazla bu payını kullanır
+
+DEFAULT_SOLVER_CONFIG = {'first_solution_strategy': 'PATH_CHEAPEST_ARC', 'local_search_metaheuristic': 'GUIDED_LOCAL_SEARCH', 'seed': 0}
+# Portföy modunda ilk N yapılandırma ayrı süreçlerde paralel çalışır; sıralama çeşitliliği önceliklendirir
+PORTFOLIO_CONFIGS = [
+    DEFAULT_SOLVER_CONFIG,
+    {'first_solution_strategy': 'SAVINGS', 'local_search_metaheuristic': 'GUIDED_LOCAL_SEARCH', 'seed': 0},
+    {'first_solution_strategy': 'CHRISTOFIDES', 'local_search_metaheuristic': 'SIMULATED_ANNEALING', 'seed': 0},
+    {'first_solution_strategy': 'PARALLEL_CHEAPEST_INSERTION', 'local_search_metaheuristic': 'TABU_SEARCH', 'seed': 0},
+    {'first_solution_strategy': 'PATH_CHEAPEST_ARC', 'local_search_metaheuristic': 'SIMULATED_ANNEALING', 'seed': 1},
+    {'first_solution_strategy': 'SAVINGS', 'local_search_metaheuristic': 'TABU_SEARCH', 'seed': 1},
+    {'first_solution_strategy': 'CHRISTOFIDES', 'local_search_metaheuristic': 'GUIDED_LOCAL_SEARCH', 'seed': 1},
+    {'first_solution_strategy': 'LOCAL_CHEAPEST_INSERTION', 'local_search_metaheuristic': 'GUIDED_LOCAL_SEARCH', 'seed': 1},
+    {'first_solution_strategy': 'GLOBAL_CHEAPEST_ARC', 'local_search_metaheuristic': 'SIMULATED_ANNEALING', 'seed': 2},
+    {'first_solution_strategy': 'PARALLEL_CHEAPEST_INSERTION', 'local_search_metaheuristic': 'GUIDED_LOCAL_SEARCH', 'seed': 2},
+    {'first_solution_strategy': 'PATH_CHEAPEST_ARC', 'local_search_metaheuristic': 'TABU_SEARCH', 'seed': 2},
+    {'first_solution_strategy': 'SAVINGS', 'local_search_metaheuristic': 'SIMULATED_ANNEALING', 'seed': 3},
+    {'first_solution_strategy': 'LOCAL_CHEAPEST_ARC', 'local_search_metaheuristic': 'GUIDED_LOCAL_SEARCH', 'seed': 3},
+    {'first_solution_strategy': 'CHRISTOFIDES', 'local_search_metaheuristic': 'TABU_SEARCH', 'seed': 3},
+    {'first_solution_strategy': 'PARALLEL_CHEAPEST_INSERTION', 'local_search_metaheuristic': 'SIMULATED_ANNEALING', 'seed': 4},
+    {'first_solution_strategy': 'PATH_CHEAPEST_ARC', 'local_search_metaheuristic': 'GUIDED_LOCAL_SEARCH', 'seed': 4},
+]
+
+# --- Backend Fonksiyonları ---
+# (Fonksiyonların döndürdüğü mesajlar zaten çoğunlukla Türkçe)
+
+def get_opet_fuel_prices(city_code, target_districts, provider=None):
+    """
+    Belirtilen il kodundaki HEDEF İLÇELER için yakıt fiyatlarını döndürür. Hata mesajı da döndürür.
+    Fiyatlar kalıcı fiyat deposundan hemen gelir ve gerekirse arka planda yenilenir
+    (bkz. tsp_prices); ağ yalnızca hiç kayıtlı fiyat yokken beklenir. provider
+    verilmezse TSP_FIYAT_KAYNAGI ortam değişkeni, o da yoksa Opet kullanılır.
+    """
+    target_districts_str = ", ".join(target_districts)
+    # Türkçe mesajlar
+    status_messages = [f"İl kodu {city_code} ({TARGET_CITY}) için yakıt fiyatları alınıyor..."]
+    status_messages.append(f"(Sadece şu ilçeler dikkate alınacak: {target_districts_str})")
+    try:
+        prices, price_messages = get_fuel_prices(city_code, target_districts, provider)
+        return prices, status_messages + price_messages
+    except Exception as e:
+        # Hata detayını ekle
+        exc_info = traceback.format_exc()
+        return None, status_messages + [f"Hata: Fiyatlar alınırken beklenmedik hata: {e}", exc_info]
+
+def _matrix_source(source):
+    """Dosya adını ve içeriğe kopyasız erişim sağlayan tampon belleği döndürür."""
+    if isinstance(source, (str, os.PathLike)):
+        file_name = os.fspath(source)
+        if os.path.getsize(file_name) == 0:
+            return file_name, memoryview(b"")
+        # Dosya belleğe eşlenir (memory-map); içerik ancak erişildikçe diskten okunur
+        return file_name, memoryview(np.memmap(file_name, dtype=np.uint8, mode='r'))
+    file_name = getattr(source, 'name', '') or ''
+    if hasattr(source, 'getbuffer'):
+        return file_name, source.getbuffer()
+    source.seek(0)
+    return file_name, memoryview(source.read())
+
+def _to_int32_matrix(array):
+    """Diziyi int32 matrise dönüştürür; zaten int32 ise kopyalamaz."""
+    if array.dtype == np.int32:
+        return array
+    if not (np.issubdtype(array.dtype, np.integer) or np.issubdtype(array.dtype, np.floating)):
+        raise ValueError(f"desteklenmeyen veri tipi: {array.dtype}")
+    if array.size and (array.min() < INT32_MIN or array.max() > INT32_MAX):
+        raise ValueError("değerler 32 bit tamsayı aralığının dışında")
+    return array.astype(np.int32)
+
+def _npy_from_buffer(buffer, offset=0):
+    """Bellekteki .npy içeriğini başlığını çözerek kopyalamadan ndarray olarak açar."""
+    major_version = buffer[offset + 6]
+    prefix_len, len_format = (10, '<H') if major_version == 1 else (12, '<I')
+    header_len = struct.unpack_from(len_format, buffer, offset + 8)[0]
+    header_stream = BytesIO(bytes(buffer[offset:offset + prefix_len + header_len]))
+    version = np.lib.format.read_magic(header_stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header_stream)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header_stream)
+    if dtype.hasobject:
+        raise ValueError("nesne (object) tipli diziler desteklenmiyor")
+    count = math.prod(shape)
+    array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset + prefix_len + header_len)
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+def _npz_from_source(source, buffer):
+    """
+    .npz arşivinden matrisi okur. Üye sıkıştırılmadan (ZIP_STORED) saklanmışsa
+    doğrudan tampon bellek üzerinden kopyasız açılır, aksi halde belleğe açılır.
+    """
+    zip_source = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        zip_source.seek(0)
+        with zipfile.ZipFile(zip_source) as archive:
+            members = [info for info in archive.infolist() if info.filename.endswith('.npy')]
+            if not members:
+                raise ValueError(".npz arşivinde dizi bulunamadı")
+            member = next((info for info in members if info.filename == 'distance_matrix.npy'), members[0])
+            if member.compress_type == zipfile.ZIP_STORED:
+                # Yerel dosya başlığı 30 bayt + dosya adı + ek alan uzunluğundadır
+                name_len, extra_len = struct.unpack_from('<HH', buffer, member.header_offset + 26)
+                data_offset = member.header_offset + 30 + name_len + extra_len
+                return _npy_from_buffer(buffer, data_offset), False
+            with archive.open(member) as member_file:
+                return np.load(member_file), True
+    finally:
+        if zip_source is not source:
+            zip_source.close()
+
+def _read_csv_matrix(source, buffer):
+    """CSV matrisini sütun tipleri int32 olarak sabitlenmiş hızlı yoldan okur."""
+    def csv_stream():
+        return source if isinstance(source, (str, os.PathLike)) else BytesIO(buffer)
+    header = pd.read_csv(csv_stream(), header=0, index_col=0, nrows=0)
+    column_dtypes = {column: np.int32 for column in header.columns}
+    try:
+        df = pd.read_csv(csv_stream(), header=0, index_col=0, dtype=column_dtypes)
+    except (ValueError, OverflowError):
+        # Ondalıklı değer içeren dosyalar için eski (yavaş) yol: tipler tahmin edilip tamsayıya çevrilir
+        df = pd.read_csv(csv_stream(), header=0, index_col=0)
+        return _to_int32_matrix(df.to_numpy().astype(int))
+    return df.to_numpy(dtype=np.int32)
+
+# Ayrıştırılmış matrisler içerik özetine göre süreç belleğinde tutulur (LRU).
+# Bu modül Streamlit yeniden çalıştırmaları arasında yeniden yüklenmediği için önbellek korunur.
+_matrix_cache = OrderedDict()
+_matrix_cache_lock = threading.Lock()
+
+def _parse_matrix_content(file_name, source, buffer):
+    """Matris dosyasını biçimine göre ayrıştırır."""
+    extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+    format_note = ""
+    try:
+        if extension == 'npy' or bytes(buffer[:6]) == NPY_MAGIC:
+            matrix = _npy_from_buffer(buffer)
+            format_note = "NumPy .npy (kopyasız)"
+        elif extension == 'npz' or bytes(buffer[:4]) == ZIP_MAGIC:
+            matrix, copied = _npz_from_source(source, buffer)
+            format_note = "NumPy .npz (sıkıştırılmış, belleğe açıldı)" if copied else "NumPy .npz (kopyasız)"
+        elif extension == 'bin':
+            if len(buffer) % 4 != 0:
+                return None, ["Hata: Ham int32 dosyasının boyutu 4 baytın katı değil."]
+            num_rows = math.isqrt(len(buffer) // 4)
+            if num_rows * num_rows * 4 != len(buffer):
+                return None, ["Hata: Ham int32 dosyası kare bir matris içermiyor."]
+            matrix = np.frombuffer(buffer, dtype='<i4').reshape(num_rows, num_rows)
+            format_note = "ham little-endian int32 (kopyasız)"
+        else:
+            matrix = _read_csv_matrix(source, buffer)
+            format_note = "CSV"
+        if matrix.dtype != np.int32:
+            format_note += f", {matrix.dtype} -> int32 dönüştürüldü"
+        matrix = _to_int32_matrix(matrix)
+    except ValueError as e:
+         return None, [f"Hata: Dosyadaki değerler tamsayıya dönüştürülemedi. Lütfen dosya içeriğini kontrol edin. ({e})"]
+
+    if matrix.ndim != 2 or matrix.shape[0] == 0 or matrix.shape[0] != matrix.shape[1]:
+         return None, ["Hata: Yüklenen dosya geçerli bir kare matris içermiyor."]
+    # Önbellekteki dizi tüm yeniden çalıştırmalarda paylaşılır; yanlışlıkla değiştirilmesin
+    matrix.flags.writeable = False
+    num_rows = matrix.shape[0]
+    return matrix, [f"Başarıyla okunan mesafe matrisi boyutu: {num_rows}x{num_rows} ({format_note}, {matrix.nbytes / 1e6:.1f} MB)"]
+
+def clear_matrix_cache():
+    """Ayrıştırılmış matris önbelleğini boşaltır (ör. ölçümlerde ayrıştırmayı her seferinde yeniden yapmak için)."""
+    with _matrix_cache_lock:
+        _matrix_cache.clear()
+
+def _read_cached(uploaded_file, variant, parse):
+    """
+    Dosyayı içerik özetine (ve variant'a) göre önbellekten döndürür ya da
+    parse(file_name, source, buffer) ile ayrıştırıp önbelleğe ekler.
+    """
+    if uploaded_file is None:
+        return None, ["Hata: Lütfen bir mesafe matrisi dosyası yükleyin."]
+    try:
+        file_name, buffer = _matrix_source(uploaded_file)
+        if len(buffer) == 0:
+            return None, ["Hata: Yüklenen dosya boş."]
+        cache_key = (hashlib.sha256(buffer).hexdigest(), variant)
+        with _matrix_cache_lock:
+            cached_result = _matrix_cache.get(cache_key)
+            if cached_result is not None:
+                _matrix_cache.move_to_end(cache_key)
+                return cached_result
+
+        result = parse(file_name, uploaded_file, buffer)
+        if result[0] is not None:
+            with _matrix_cache_lock:
+                _matrix_cache[cache_key] = result
+                while len(_matrix_cache) > MATRIX_CACHE_MAX_ENTRIES:
+                    _matrix_cache.popitem(last=False)
+        return result
+    except Exception as e:
+        exc_info = traceback.format_exc()
+        return None, [f"Hata: Matris dosyası okunurken hata oluştu: {e}", exc_info]
+
+def read_distance_matrix(uploaded_file):
+    """
+    Yüklenen dosyadan (veya dosya yolundan) mesafe matrisini int32 NumPy dizisi
+    olarak okur. CSV, .npy, .npz ve ham int32 (.bin) biçimleri desteklenir.
+    """
+    return _read_cached(uploaded_file, 'matrix', _parse_matrix_content)
+
+def _is_edge_list(header_columns):
+    """CSV başlığı kaynak/hedef/mesafe yol listesine mi ait?"""
+    return set(EDGE_LIST_COLUMNS) <= {str(column).strip().lower() for column in header_columns}
+
+def _dense_row_blocks(file_name, source, buffer):
+    """
+    Yoğun matris kaynağını satır blokları halinde okuyan üreteci hazırlar:
+    (konum sayısı, etiketler, row_blocks, biçim notu). İkili biçimler kopyasız
+    açılır; CSV her taramada CANDIDATE_BLOCK_ROWS satırlık parçalar halinde yeniden okunur.
+    """
+    extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+    if extension in ('npy', 'npz', 'bin') or bytes(buffer[:6]) == NPY_MAGIC or bytes(buffer[:4]) == ZIP_MAGIC:
+        if extension == 'npy' or bytes(buffer[:6]) == NPY_MAGIC:
+            matrix, format_note = _npy_from_buffer(buffer), "NumPy .npy"
+        elif extension == 'npz' or bytes(buffer[:4]) == ZIP_MAGIC:
+            matrix, copied = _npz_from_source(source, buffer)
+            format_note = "NumPy .npz (sıkıştırılmış, belleğe açıldı)" if copied else "NumPy .npz"
+        else:
+            num_rows = math.isqrt(len(buffer) // 4)
+            if len(buffer) % 4 != 0 or num_rows * num_rows * 4 != len(buffer):
+                raise ValueError("ham int32 dosyası kare bir matris içermiyor")
+            matrix, format_note = np.frombuffer(buffer, dtype='<i4').reshape(num_rows, num_rows), "ham int32"
+        if matrix.ndim != 2 or matrix.shape[0] == 0 or matrix.shape[0] != matrix.shape[1]:
+            raise ValueError("dosya geçerli bir kare matris içermiyor")
+
+        def row_blocks():
+            for start in range(0, len(matrix), CANDIDATE_BLOCK_ROWS):
+                yield start, _to_int32_matrix(np.asarray(matrix[start:start + CANDIDATE_BLOCK_ROWS]))
+        return len(matrix), None, row_blocks, format_note
+
+    def csv_stream():
+        return source if isinstance(source, (str, os.PathLike)) else BytesIO(buffer)
+    header = pd.read_csv(csv_stream(), header=0, index_col=0, nrows=0)
+
+    def row_blocks():
+        start = 0
+        with pd.read_csv(csv_stream(), header=0, index_col=0, chunksize=CANDIDATE_BLOCK_ROWS) as reader:
+            for chunk in reader:
+                block = chunk.to_numpy()
+                if not np.issubdtype(block.dtype, np.integer):
+                    block = block.astype(int) # Ondalıklı değerler tam matris okumasındaki gibi tamsayıya çevrilir
+                yield start, _to_int32_matrix(block)
+                start += len(block)
+    return len(header.columns), [str(label) for label in header.columns], row_blocks, "CSV"
+
+def _read_edge_list(source, buffer, num_neighbors):
+    """kaynak,hedef,mesafe sütunlu CSV'den aday grafı kurar; depo ilk satırın kaynağıdır."""
+    stream = source if isinstance(source, (str, os.PathLike)) else BytesIO(buffer)
+    edges = pd.read_csv(stream, dtype=str)
+    edges.columns = [str(column).strip().lower() for column in edges.columns]
+    source_column, target_column, distance_column = EDGE_LIST_COLUMNS
+    distances = pd.to_numeric(edges[distance_column], errors='raise').to_numpy(dtype=np.float64)
+    if np.isnan(distances).any() or (distances < 0).any():
+        raise ValueError("mesafe sütununda boş veya negatif değer var")
+    node_codes, labels = pd.factorize(np.concatenate((edges[source_column].to_numpy(), edges[target_column].to_numpy())))
+    num_edges = len(edges)
+    graph = CandidateGraph.from_edges(
+        len(labels), node_codes[:num_edges], node_codes[num_edges:], _to_int32_matrix(distances.astype(int)),
+        num_neighbors, [str(label) for label in labels]
+    )
+    return graph, f"yol listesi CSV ({num_edges} bilinen mesafe)"
+
+def _parse_candidate_graph(file_name, source, buffer, num_neighbors):
+    """Dosyadan seyrek aday grafı kurar: yol listesi CSV'si ya da yoğun matris (blok blok)."""
+    try:
+        extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+        is_binary = extension in ('npy', 'npz', 'bin') or bytes(buffer[:6]) == NPY_MAGIC or bytes(buffer[:4]) == ZIP_MAGIC
+        header_columns = [] if is_binary else pd.read_csv(
+            source if isinstance(source, (str, os.PathLike)) else BytesIO(buffer), nrows=0
+        ).columns
+        if _is_edge_list(header_columns):
+            graph, format_note = _read_edge_list(source, buffer, num_neighbors)
+        else:
+            num_nodes, labels, row_blocks, format_note = _dense_row_blocks(file_name, source, buffer)
+            graph = CandidateGraph.from_row_blocks(num_nodes, row_blocks, num_neighbors, labels)
+    except (ValueError, KeyError) as e:
+        return None, [f"Hata: Aday grafı kurulamadı. Lütfen dosya içeriğini kontrol edin. ({e})"]
+    num_nodes = len(graph)
+    return graph, [
+        f"Seyrek aday grafı: {num_nodes} konum, {graph.num_arcs} yol (k={graph.num_neighbors}, {format_note}, "
+        f"{graph.nbytes / 1e6:.1f} MB; yoğun int32 matris {num_nodes * num_nodes * 4 / 1e6:.1f} MB olurdu)"
+    ]
+
+def read_candidate_graph(uploaded_file, num_neighbors=DEFAULT_CANDIDATE_NEIGHBORS):
+    """
+    Dosyadan yalnızca her konumun en yakın num_neighbors komşusunu içeren
+    seyrek aday grafını (CandidateGraph) okur. Yoğun matrisler (CSV, .npy, .npz,
+    .bin) satır blokları halinde taranır; kaynak/hedef/mesafe başlıklı CSV yol
+    listeleri (kısmen bilinen mesafeler) doğrudan okunur.
+    """
+    return _read_cached(
+        uploaded_file, ('aday', int(num_neighbors)),
+        lambda file_name, source, buffer: _parse_candidate_graph(file_name, source, buffer, num_neighbors)
+    )
+
+def read_location_labels(uploaded_file):
+    """
+    CSV matrisinin başlık satırındaki konum etiketlerini okur (yalnızca ilk satır
+    ayrıştırılır). İkili biçimlerde etiket bulunmadığından None döndürür.
+    """
+    if uploaded_file is None:
+        return None, []
+    try:
+        file_name, buffer = _matrix_source(uploaded_file)
+        extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+        if extension in ('npy', 'npz', 'bin') or bytes(buffer[:6]) == NPY_MAGIC or bytes(buffer[:4]) == ZIP_MAGIC:
+            return None, ["Uyarı: İkili matris biçimlerinde konum etiketi yok; konumlar sıra numarasıyla gösterilir."]
+        stream = uploaded_file if isinstance(uploaded_file, (str, os.PathLike)) else BytesIO(buffer)
+        header = pd.read_csv(stream, header=0, index_col=0, nrows=0)
+        return [str(label) for label in header.columns], []
+    except Exception as e:
+        return None, [f"Uyarı: Konum etiketleri okunamadı: {e}"]
+
+def read_previous_route(uploaded_file):
+    """
+    Daha önce dışa aktarılmış rota dosyasından (CSV, Parquet, JSON veya Excel
+    'Rota Detayı' sayfası) ziyaret sırasını konum etiketleri listesi olarak okur.
+    """
+    if uploaded_file is None:
+        return None, ["Hata: Lütfen önceki rota dosyasını yükleyin."]
+    try:
+        file_name, buffer = _matrix_source(uploaded_file)
+        stream = uploaded_file if isinstance(uploaded_file, (str, os.PathLike)) else BytesIO(buffer)
+        route_df = read_route_table(stream, file_name)
+        if 'Konum_Etiketi' not in route_df.columns:
+            return None, [
+                "Hata: Önceki rota dosyasında 'Konum_Etiketi' sütunu yok. Noktalar sıra numarasıyla değil etiketle "
+                "eşleştirildiği için rotayı etiketli bir CSV matrisiyle yeniden dışa aktarın."
+            ]
+        labels = [str(label) for label in route_df['Konum_Etiketi']]
+        if len(labels) < 2:
+            return None, ["Hata: Önceki rota en az iki adım içermelidir."]
+        return labels, [f"Önceki rota okundu: {len(labels)} adım."]
+    except Exception as e:
+        return None, [f"Hata: Önceki rota okunurken hata oluştu: {e}", traceback.format_exc()]
+
+def preprocess_distance_matrix(distance_matrix, merge_threshold=None, repair_triangle=False):
+    """
+    Çözücüden önce matrisi ön işler (tsp_preprocess): merge_threshold verilirse
+    aynı konumdaki noktaları birleştirir, simetriyi tespit eder ve istenirse üçgen eşitsizliği ihlallerini
+    onarır. (PreprocessedMatrix, mesajlar) döndürür; ön işleme yapılamazsa
+    PreprocessedMatrix None'dır ve matris olduğu gibi çözülür.
+    """
+    if distance_matrix is None or len(distance_matrix) == 0:
+        return None, ["Hata: Geçersiz mesafe matrisi."]
+    if isinstance(distance_matrix, CandidateGraph):
+        return None, ["Uyarı: Ön işleme seyrek aday grafında uygulanmaz; graf olduğu gibi çözülüyor."]
+    try:
+        preprocessed = preprocess_matrix(distance_matrix, merge_threshold, repair_triangle)
+    except Exception as e:
+        return None, [f"Uyarı: Ön işleme yapılamadı, matris olduğu gibi çözülüyor: {e}", traceback.format_exc()]
+
+    stats = preprocessed.stats
+    messages = []
+    if stats['repair_skipped']:
+        messages.append(
+            f"Uyarı: Üçgen eşitsizliği onarımı {TRIANGLE_REPAIR_MAX_NODES} noktaya kadar uygulanır "
+            f"({stats['num_locations']} nokta); matris onarılmadan kullanılıyor."
+        )
+    elif stats['repaired_pairs'] is not None:
+        messages.append(f"Üçgen eşitsizliği onarımı: {stats['repaired_pairs']} konum çiftinin mesafesi ara nokta üzerinden kısaltıldı.")
+    if merge_threshold is not None:
+        messages.append(
+            f"Ön işleme: {stats['num_locations']} konum → {stats['num_reduced']} çözülen konum "
+            f"(%{_shrink_percent(stats):.1f} küçüldü; {merge_threshold} m eşiğiyle {stats['merged_locations']} nokta birleştirildi)."
+        )
+    if stats['symmetric']:
+        messages.append("Matris simetrik: yerel arama ters yön maliyetlerini ayrıca hesaplamıyor.")
+    else:
+        messages.append(
+            f"Matris asimetrik ({stats['asymmetric_pairs']} çift, en büyük fark {stats['max_asymmetry']} m)."
+        )
+    return preprocessed, messages
+
+def _shrink_percent(preprocessing_stats):
+    """Ön işlemeyle çözülen konum sayısındaki azalma yüzdesi."""
+    return 100.0 * preprocessing_stats['merged_locations'] / max(preprocessing_stats['num_locations'], 1)
+
+def expand_preprocessed_solution(preprocessed, solution, manager, routing):
+    """
+    Küçültülmüş matris için bulunan çözümü (OR-Tools çözümü veya rota listesi)
+    tüm noktaları içeren rota listesine genişletir. Sonuç process_and_save_results'a
+    preprocessed.matrix ile birlikte verilir.
+    """
+    if isinstance(solution, list):
+        reduced_route = solution
+    else:
+        reduced_route = _extract_route(solution, manager, routing)
+    return preprocessed.expand_route(reduced_route)
+
+def finish_preprocessed_solve(preprocessed, solver_result):
+    """
+    Küçültülmüş matris için run_tsp_solver sonucunu tüm noktalara döndürür:
+    ön işleme istatistiklerini solver_stats'a ekler ve birleştirilen noktalar
+    varsa rotayı genişletir. Alt sınırın tüm noktalarla hesaplanması için
+    run_tsp_solver'a bound_matrix=preprocessed.matrix verilmelidir. Sonuç
+    run_tsp_solver ile aynı biçimdedir ve preprocessed.matrix ile işlenir.
+    """
+    solution, manager, routing, solver_stats, status_messages = solver_result
+    if preprocessed is None or not solution or solver_stats is None:
+        return solver_result
+    solver_stats['preprocessing'] = preprocessed.stats
+    if preprocessed.num_reduced == preprocessed.num_locations:
+        return solver_result
+
+    solution = expand_preprocessed_solution(preprocessed, solution, manager, routing)
+    return solution, None, None, solver_stats, status_messages
+
+def build_fuel_cost_matrix(distance_matrix, fuel_price, consumption, cost_scaling_factor):
+    """
+    Mesafe matrisinden (metre) ölçeklenmiş tamsayı yakıt maliyeti matrisini
+    tek seferde, vektörel olarak hesaplar. İşlem sırası fuel_cost_callback ile
+    aynıdır (metre -> km -> litre -> TRY -> ölçek), böylece sonuçlar birebir eşleşir.
+    """
+    integer_cost_matrix = _fuel_cost_values(distance_matrix, fuel_price, consumption, cost_scaling_factor)
+    np.fill_diagonal(integer_cost_matrix, 0)
+    return integer_cost_matrix
+
+def _fuel_cost_values(distances, fuel_price, consumption, cost_scaling_factor):
+    """Herhangi bir mesafe dizisini (metre) ölçeklenmiş tamsayı yakıt maliyetine çevirir."""
+    # Ara sonuçlar yerinde (in-place) hesaplanır; büyük matrislerde ek kopya oluşmaz
+    costs = np.array(distances, dtype=np.float64)
+    costs /= 1000.0 # km
+    costs /= 100.0
+    costs *= consumption # litre
+    costs *= fuel_price # TRY
+    costs *= cost_scaling_factor
+    np.ceil(costs, out=costs)
+    return costs.astype(np.int64)
+
+def _arc_distances(distance_matrix, from_nodes, to_nodes):
+    """Yolların mesafeleri (metre); seyrek aday grafında eksik çiftler en kısa yolla tamamlanır."""
+    if isinstance(distance_matrix, CandidateGraph):
+        return distance_matrix.arc_distances(from_nodes, to_nodes)
+    return np.asarray(distance_matrix)[from_nodes, to_nodes]
+
+def _route_fuel_cost(distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor):
+    """Rotanın ölçeklenmiş yakıt maliyetini OR-Tools amaç değeriyle aynı kurallarla, vektörel hesaplar."""
+    route = np.asarray(route_indices, dtype=np.intp)
+    from_nodes, to_nodes = route[:-1], route[1:]
+    arc_costs = _fuel_cost_values(_arc_distances(distance_matrix, from_nodes, to_nodes), fuel_price, consumption, cost_scaling_factor)
+    arc_costs[from_nodes == to_nodes] = 0
+    return int(arc_costs.sum())
+
+def compute_matrix_hash(distance_matrix):
+    """Mesafe matrisinin içeriğinden (boyut + int32 değerler) SHA-256 özeti üretir."""
+    matrix = np.ascontiguousarray(distance_matrix, dtype=np.int32)
+    digest = hashlib.sha256()
+    digest.update(str(matrix.shape).encode('ascii'))
+    digest.update(matrix.tobytes())
+    return digest.hexdigest()
+
+def _route_cache_key(matrix_hash, solver_settings):
+    """Matris özeti ve çözücü ayarlarından önbellek anahtarı üretir (yakıt fiyatı ve tüketim dahil değildir)."""
+    settings_str = json.dumps(solver_settings, sort_keys=True)
+    return hashlib.sha256(f"{matrix_hash}|{settings_str}".encode('utf-8')).hexdigest()
+
+def load_cached_route(cache_key, cache_dir=None):
+    """Önbellekteki rota kaydını okur. Kayıt yoksa veya okunamazsa None döndürür."""
+    cache_dir = cache_dir or os.environ.get(ROUTE_CACHE_ENV) or ROUTE_CACHE_DIR
+    entry_path = os.path.join(cache_dir, f"{cache_key}.json")
+    try:
+        with open(entry_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        os.utime(entry_path) # LRU için son erişim zamanını güncelle
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or not isinstance(entry.get('route'), list):
+        return None
+    return entry
+
+def save_cached_route(cache_key, route_indices, distance_meters, time_limit, cache_dir=None, max_entries=ROUTE_CACHE_MAX_ENTRIES):
+    """
+    Rotayı önbelleğe yazar. Mevcut kayıt daha kısa bir rota içeriyorsa o korunur;
+    harcanan süre bütçesi her durumda büyük olanla güncellenir.
+    """
+    cache_dir = cache_dir or os.environ.get(ROUTE_CACHE_ENV) or ROUTE_CACHE_DIR
+    existing = load_cached_route(cache_key, cache_dir)
+    entry = {
+        'route': [int(node) for node in route_indices],
+        'distance_meters': int(distance_meters),
+        'time_limit': time_limit,
+        'created': time.time(),
+    }
+    if existing and existing.get('distance_meters', float('inf')) <= entry['distance_meters']:
+        entry = existing
+    entry['time_limit'] = max(time_limit, existing.get('time_limit', 0) if existing else 0)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_path = os.path.join(cache_dir, f"{cache_key}.json")
+    tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, entry_path) # Yarım yazılmış kayıt okunmasın
+
+    # LRU: en uzun süredir erişilmeyen kayıtları sil
+    cache_files = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith('.json')]
+    if len(cache_files) > max_entries:
+        cache_files.sort(key=os.path.getmtime)
+        for old_path in cache_files[:len(cache_files) - max_entries]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+def _extract_route(solution, manager, routing):
+    """Çözümden araç rotasını konum indeksleri listesi olarak çıkarır (depo başta ve sonda)."""
+    route_indices = []
+    index = routing.Start(0)
+    while not routing.IsEnd(index):
+        route_indices.append(manager.IndexToNode(index))
+        index = solution.Value(routing.NextVar(index))
+    route_indices.append(manager.IndexToNode(index))
+    return route_indices
+
+def _route_distance(distance_matrix, route_indices):
+    """Rotanın toplam mesafesini (metre) vektörel hesaplar."""
+    return tour_length(distance_matrix, route_indices)
+
+def _polish_route(distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor, time_limit, stop_requested=None, symmetric=False):
+    """
+    Rotayı mesafe matrisi üzerinde 2-opt/Or-opt ile cilalar. Mesafe ve maliyet
+    arasındaki yuvarlama farkı nedeniyle sonuç yalnızca yakıt maliyeti gerçekten
+    düştüyse kabul edilir. (rota, maliyet, istatistikler) döndürür.
+    """
+    route_cost = _route_fuel_cost(distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor)
+    polished_route, polish_stats = improve_tour(distance_matrix, route_indices, time_limit=time_limit, stop_requested=stop_requested, symmetric=symmetric)
+    polished_cost = _route_fuel_cost(distance_matrix, polished_route, fuel_price, consumption, cost_scaling_factor)
+    polish_stats['gain_try'] = max(route_cost - polished_cost, 0) / cost_scaling_factor
+    if polished_cost < route_cost:
+        return polished_route, polished_cost, polish_stats
+    return list(route_indices), route_cost, polish_stats
+
+def _describe_polish(polish_stats):
+    """Cilalama sonucunu durum mesajına çevirir."""
+    return (
+        f"Yerel iyileştirme (2-opt/Or-opt): {polish_stats['two_opt_moves']} + {polish_stats['or_opt_moves']} hamle, "
+        f"{polish_stats['gain_try']:.2f} TRY kazanç ({polish_stats['seconds']:.2f} sn)."
+    )
+
+class SolveMonitor:
+    """
+    Çözümün ilerlemesini izler: iyileşen çözümlerin (geçen süre, TRY) geçmişi,
+    erken durdurma kuralları ve iptal isteği. Çözücü arka planda çalışırken
+    arayüz iş parçacığından güvenle okunabilir.
+
+    stall_seconds > 0 ise son stall_seconds saniyedeki iyileşme
+    min_improvement_pct yüzdesinin altında kaldığında (0 ise hiç iyileşme
+    olmadığında) arama durdurulur. target_gap_pct > 0 ise ve alt sınır
+    (set_lower_bound) biliniyorsa en iyi çözümün optimallik açığı bu yüzdeye
+    indiğinde arama durdurulur.
+    """
+
+    def __init__(self, stall_seconds=0, min_improvement_pct=0.0, cost_scaling_factor=COST_SCALING_FACTOR, target_gap_pct=0.0):
+        self.stall_seconds = stall_seconds
+        self.min_improvement_pct = min_improvement_pct
+        self.cost_scaling_factor = cost_scaling_factor
+        self.target_gap_pct = target_gap_pct
+        self.lower_bound_try = None
+        self.stop_reason = None
+        self._history = [] # (geçen süre sn, amaç değeri TRY)
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._start_time = time.monotonic()
+
+    def start(self):
+        """Süre ölçümünü başlatır (çözücü aramaya başlamadan hemen önce çağrılır)."""
+        self._start_time = time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self._start_time
+
+    def cancel(self):
+        """Çalışan çözümün en kısa sürede durdurulmasını ister."""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def record(self, objective_value):
+        """Bulunan çözümün ölçeklenmiş amaç değerini kaydeder; yalnızca iyileşmeler geçmişe eklenir."""
+        objective_try = objective_value / self.cost_scaling_factor
+        with self._lock:
+            if self._history and objective_try >= self._history[-1][1]:
+                return
+            self._history.append((self.elapsed(), objective_try))
+
+    def history(self):
+        """İyileşme geçmişinin bir kopyasını döndürür."""
+        with self._lock:
+            return list(self._history)
+
+    def set_lower_bound(self, bound_value):
+        """Çözülen matrisin ölçeklenmiş amaç değeri cinsinden alt sınırını kaydeder."""
+        self.lower_bound_try = bound_value / self.cost_scaling_factor
+
+    def gap_pct(self):
+        """En iyi çözümün alt sınıra göre optimallik açığı (%); çözüm veya sınır yoksa None."""
+        with self._lock:
+            if not self._history or self.lower_bound_try is None:
+                return None
+            best = self._history[-1][1]
+        return optimality_gap_pct(best, self.lower_bound_try)
+
+    def should_stop(self):
+        """İptal istendiyse veya erken durdurma kuralı sağlandıysa True döndürür."""
+        if self._cancel_event.is_set():
+            self.stop_reason = 'cancelled'
+            return True
+        if self.target_gap_pct > 0:
+            gap = self.gap_pct()
+            if gap is not None and gap <= self.target_gap_pct:
+                self.stop_reason = 'target_gap'
+                return True
+        if not self.stall_seconds:
+            return False
+        with self._lock:
+            if not self._history:
+                return False
+            window_start = self.elapsed() - self.stall_seconds
+            if self._history[0][0] > window_start:
+                return False # İlk çözümden bu yana pencere henüz dolmadı
+            best_before = next(objective for found_at, objective in reversed(self._history) if found_at <= window_start)
+            best_now = self._history[-1][1]
+        improvement_pct = (best_before - best_now) / best_before * 100.0 if best_before > 0 else 0.0
+        if improvement_pct <= 0.0 or improvement_pct < self.min_improvement_pct:
+            self.stop_reason = 'stalled'
+            return True
+        return False
+
+def optimality_gap_pct(objective, bound):
+    """(amaç - alt sınır) / amaç yüzdesi; amaç ve sınır aynı birimde olmalıdır."""
+    if objective <= 0:
+        return 0.0
+    return max(objective - bound, 0) / objective * 100.0
+
+def compute_lower_bound(distance_matrix, fuel_price, consumption, cost_scaling_factor, time_limit=LOWER_BOUND_TIME_LIMIT, stop_requested=None):
+    """
+    Yakıt maliyeti matrisi için alt sınırı (tsp_bounds: Held-Karp 1-ağaç,
+    asimetrik matrislerde atama gevşetmesi) hesaplar. (sınır istatistikleri,
+    mesajlar) döndürür; istatistiklerdeki 'bound' amaç değeriyle aynı
+    ölçektedir. Seyrek aday grafında ve çok büyük matrislerde sınır None'dır.
+    """
+    if isinstance(distance_matrix, CandidateGraph):
+        return None, []
+    if len(distance_matrix) > LOWER_BOUND_MAX_NODES:
+        return None, [f"Alt sınır {LOWER_BOUND_MAX_NODES} noktaya kadar hesaplanır; optimallik açığı gösterilmeyecek."]
+    try:
+        cost_matrix = build_fuel_cost_matrix(distance_matrix, fuel_price, consumption, cost_scaling_factor)
+        bound, bound_stats = lower_bound(cost_matrix, time_limit=time_limit, stop_requested=stop_requested)
+    except Exception as e:
+        return None, [f"Uyarı: Alt sınır hesaplanamadı: {e}"]
+    bound_stats.update({
+        'bound_try': bound / cost_scaling_factor,
+        'num_locations': len(distance_matrix),
+    })
+    method = "Held-Karp 1-ağaç" if bound_stats['method'] == 'held_karp' else "atama gevşetmesi"
+    return bound_stats, [
+        f"Alt sınır ({method}, {bound_stats['iterations']} yineleme, {bound_stats['seconds']:.2f} sn): "
+        f"{bound_stats['bound_try']:.2f} TRY."
+    ]
+
+def _attach_search_hooks(routing, on_solution, stop_requested):
+    """
+    Çözücüye her çözümde çağrılan bir geri çağrı ve dışarıdan durdurma kontrolü ekler.
+    Durdurma kontrolü arama döngüsünde çok sık çağrıldığı için STOP_CHECK_INTERVAL
+    aralıklarla değerlendirilir.
+    """
+    routing.AddAtSolutionCallback(lambda: on_solution(routing.CostVar().Value()))
+    next_check = [0.0]
+
+    def search_limit_reached():
+        now = time.monotonic()
+        if now < next_check[0]:
+            return False
+        next_check[0] = now + STOP_CHECK_INTERVAL
+        return stop_requested()
+
+    routing.AddSearchMonitor(routing.solver().CustomLimit(search_limit_reached))
+
+def describe_solver_config(config):
+    """Çözücü yapılandırmasını kısa, okunabilir bir etikete çevirir."""
+    return f"{config['first_solution_strategy']} + {config['local_search_metaheuristic']} (tohum {config['seed']})"
+
+def routing_status_name(status):
+    """OR-Tools arama durum kodunu adına çevirir (ör. 1 -> 'ROUTING_SUCCESS')."""
+    if status is None:
+        return None
+    try:
+        return routing_enums_pb2.RoutingSearchStatus.Value.Name(int(status))
+    except ValueError:
+        return f"UNKNOWN_{status}"
+
+def _create_routing_model(distance_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode, start=0, end=0, transit_calls=None):
+    """
+    Rota yöneticisini ve modelini oluşturur, yakıt maliyetini yay maliyeti olarak kaydeder.
+    start ve end farklıysa model kapalı tur yerine start'tan end'e açık bir yol arar.
+    transit_calls (tek elemanlı liste) verilirse geri çağrı modunda çağrı sayısı ona eklenir.
+    """
+    data = {}
+    data['distance_matrix'] = distance_matrix
+    data['num_vehicles'] = 1
+    data['depot'] = 0
+
+    manager = pywrapcp.RoutingIndexManager(len(distance_matrix), data['num_vehicles'], [start], [end])
+    routing = pywrapcp.RoutingModel(manager)
+
+    # Yakıt maliyeti fonksiyonu (yedek mod: her yay için Python'a geri dönülür)
+    def fuel_cost_callback(from_index, to_index):
+        if transit_calls is not None: transit_calls[0] += 1
+        from_node = manager.IndexToNode(from_index)
+        to_node = manager.IndexToNode(to_index)
+        if from_node == to_node: return 0
+        try:
+            dist_value = data['distance_matrix'][from_node][to_node]
+            if not isinstance(dist_value, (int, float, np.integer, np.floating)): return sys.maxsize
+            distance_meters = int(dist_value)
+        except IndexError: return sys.maxsize
+        except Exception: return sys.maxsize
+
+        distance_km = distance_meters / 1000.0
+        fuel_liters = (distance_km / 100.0) * consumption
+        cost_try = fuel_liters * fuel_price
+        integer_cost = math.ceil(cost_try * cost_scaling_factor)
+        return integer_cost
+
+    if cost_mode == COST_MODE_MATRIX:
+        # Tüm yay maliyetleri bir kez hesaplanır; çözücü arama sırasında Python'a geri dönmez
+        cost_matrix = build_fuel_cost_matrix(data['distance_matrix'], fuel_price, consumption, cost_scaling_factor)
+        transit_callback_index = routing.RegisterTransitMatrix(cost_matrix.tolist())
+    elif cost_mode == COST_MODE_CALLBACK:
+        transit_callback_index = routing.RegisterTransitCallback(fuel_cost_callback)
+    else:
+        raise ValueError(f"Bilinmeyen maliyet modu: {cost_mode}")
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+    return manager, routing
+
+def _create_search_parameters(config, time_limit):
+    """Yapılandırmadaki ilk çözüm stratejisi ve metasezgisel ile arama parametrelerini oluşturur."""
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy, config['first_solution_strategy'])
+    search_parameters.local_search_metaheuristic = getattr(
+        routing_enums_pb2.LocalSearchMetaheuristic, config['local_search_metaheuristic'])
+    search_parameters.time_limit.FromMilliseconds(int(time_limit * 1000)) # Alt problemler için kesirli saniye olabilir
+    search_parameters.log_search = False
+    return search_parameters
+
+def _route_to_assignment(manager, routing, route_indices):
+    """
+    Konum indeksleri listesini (depo başta ve sonda) OR-Tools çözüm nesnesine çevirir.
+    Model önceden CloseModelWithParameters ile kapatılmış olmalıdır.
+    """
+    route = [manager.NodeToIndex(node) for node in route_indices[1:-1]]
+    return routing.ReadAssignmentFromRoutes([route], True)
+
+def _portfolio_worker(distance_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode, config, time_limit, initial_route, progress_queue, stop_event, deadline=None):
+    """
+    Portföydeki tek bir yapılandırmayı ayrı bir süreçte çözer; rota ve istatistikleri döndürür.
+    Bulunan çözümler progress_queue ile ana sürece bildirilir, stop_event ayarlanınca arama durur.
+    deadline (time.time() zamanı) verilirse arama süresi, süreç başlatma ve model
+    kurma bittikten sonra kalan süreye indirilir.
+    """
+    transit_calls = [0] if cost_mode == COST_MODE_CALLBACK else None
+    manager, routing = _create_routing_model(distance_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode, transit_calls=transit_calls)
+    if deadline is not None:
+        time_limit = max(min(time_limit, deadline - time.time()), MIN_SUBPROBLEM_SECONDS)
+    search_parameters = _create_search_parameters(config, time_limit)
+    routing.CloseModelWithParameters(search_parameters)
+    routing.solver().ReSeed(config['seed'])
+    _attach_search_hooks(routing, progress_queue.put, stop_event.is_set)
+
+    solve_start = time.perf_counter()
+    initial_solution = _route_to_assignment(manager, routing, initial_route) if initial_route else None
+    if initial_solution is not None:
+        solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
+    else:
+        solution = routing.SolveWithParameters(search_parameters)
+    solve_seconds = time.perf_counter() - solve_start
+
+    return {
+        'config': config,
+        'objective': solution.ObjectiveValue() if solution else None,
+        'route': _extract_route(solution, manager, routing) if solution else None,
+        'solutions': routing.solver().Solutions(),
+        'branches': routing.solver().Branches(),
+        'transit_callback_calls': transit_calls[0] if transit_calls is not None else None,
+        'solve_seconds': solve_seconds,
+        'status': int(routing.status()),
+        'error': None,
+    }
+
+def _drain_progress_queue(progress_queue, monitor):
+    """İşçilerden gelen amaç değerlerini izleyiciye aktarır."""
+    while True:
+        try:
+            monitor.record(progress_queue.get_nowait())
+        except queue.Empty:
+            return
+
+def _sum_transit_calls(results):
+    """İşçi sonuçlarındaki geri çağrı sayılarını toplar; hiçbiri saymadıysa (maliyet matrisi) None."""
+    counts = [result.get('transit_callback_calls') for result in results if result]
+    counts = [count for count in counts if count is not None]
+    return sum(counts) if counts else None
+
+def _run_portfolio(distance_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode, configs, time_limit, monitor, initial_route=None):
+    """
+    Yapılandırmaları bir süreç havuzunda aynı anda, aynı süre sınırıyla çalıştırır.
+    Süre sınırı duvar saatidir: havuzun başlatılması işçilerin arama süresinden düşülür.
+    Önbellekte rota varsa yalnızca ilk yapılandırma ondan başlar; diğerleri
+    çeşitlilik için kendi ilk çözüm stratejileriyle başlar. İşçilerin bulduğu
+    çözümler tek bir izleyicide birleştirilir; iptal veya erken durdurma tüm
+    işçileri durdurur.
+    """
+    results = []
+    deadline = time.time() + time_limit
+    # Streamlit iş parçacıkları içinden güvenli olması için 'spawn' kullanılır
+    mp_context = multiprocessing.get_context('spawn')
+    with mp_context.Manager() as sync_manager, \
+            ProcessPoolExecutor(max_workers=len(configs), mp_context=mp_context) as executor:
+        progress_queue = sync_manager.Queue()
+        stop_event = sync_manager.Event()
+        futures = {}
+        for worker_no, config in enumerate(configs):
+            worker_initial_route = initial_route if worker_no == 0 else None
+            future = executor.submit(
+                _portfolio_worker, distance_matrix, fuel_price, consumption, cost_scaling_factor,
+                cost_mode, config, time_limit, worker_initial_route, progress_queue, stop_event, deadline
+            )
+            futures[future] = config
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=PROGRESS_POLL_INTERVAL)
+            for future in done:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({
+                        'config': futures[future], 'objective': None, 'route': None, 'solutions': 0,
+                        'branches': 0, 'transit_callback_calls': None, 'solve_seconds': 0.0, 'status': None, 'error': str(e),
+                    })
+            _drain_progress_queue(progress_queue, monitor)
+            if not stop_event.is_set() and monitor.should_stop():
+                stop_event.set()
+        _drain_progress_queue(progress_queue, monitor)
+    # Sonuçlar yapılandırma sırasıyla raporlansın
+    results.sort(key=lambda result: configs.index(result['config']))
+    return results
+
+def solver_parallelism(distance_matrix, portfolio_size=1, large_instance_threshold=LARGE_INSTANCE_THRESHOLD, fast_mode=False):
+    """
+    run_tsp_solver'ın bu ayarlarla aynı anda çalıştıracağı en fazla çözücü
+    süreci (portföy yapılandırmaları veya kümeleme işçileri). Sonuç çözücünün
+    kendi seçimini izler; servis iş başına CPU sınırını buna göre ölçekler.
+    """
+    cpu_count = os.cpu_count() or 1
+    if fast_mode or isinstance(distance_matrix, CandidateGraph):
+        return 1
+    if large_instance_threshold and len(distance_matrix) >= large_instance_threshold:
+        return cpu_count if cpu_count >= DECOMPOSITION_MIN_CPUS else 1
+    return min(max(portfolio_size, 1), len(PORTFOLIO_CONFIGS), cpu_count)
+
+def run_tsp_solver(distance_matrix, fuel_price, consumption, time_limit, cost_scaling_factor, cost_mode=COST_MODE_MATRIX, use_route_cache=True, portfolio_size=1, monitor=None, large_instance_threshold=LARGE_INSTANCE_THRESHOLD, cluster_size=DEFAULT_CLUSTER_SIZE, polish=True, fast_mode=False, symmetric=False, use_lower_bound=True, bound_matrix=None):
+    """
+    OR-Tools çözücüsünü çalıştırır ve sonucu döndürür.
+    Rota önbelleği açıksa aynı matris için daha önce en az bu süre bütçesiyle
+    bulunmuş rota doğrudan kullanılır; daha kısa bütçeyle bulunmuşsa başlangıç
+    çözümü olarak verilir. Maliyet her zaman güncel fiyat ve tüketimle hesaplanır.
+    portfolio_size > 1 ise PORTFOLIO_CONFIGS içinden o kadar yapılandırma ayrı
+    süreçlerde paralel çalıştırılır ve en düşük maliyetli rota seçilir.
+    monitor (SolveMonitor) verilirse iyileşen çözümler ona bildirilir; iptal ve
+    erken durdurma kuralları onun üzerinden uygulanır.
+    Nokta sayısı large_instance_threshold'a ulaşırsa (0: kapalı) çözüm
+    run_decomposed_solver'a (DECOMPOSITION_MIN_CPUS'tan az çekirdekte
+    run_fast_solver'a), fast_mode ise run_fast_solver'a devredilir; bu
+    durumlarda çözüm bir rota listesidir. polish açıksa bulunan rota son olarak
+    2-opt/Or-opt ile cilalanır. Seyrek aday grafı (CandidateGraph) verilirse
+    OR-Tools modeli kurulmaz; rota run_fast_solver ile yalnızca graftaki
+    yollar üzerinde aranır. symmetric (ön işlemede matris simetrik bulunduysa)
+    yerel aramanın simetrik matrislere özgü kısayollarını açar.
+    use_lower_bound açıksa aramadan önce yakıt maliyeti matrisinin alt sınırı
+    hesaplanır (en fazla LOWER_BOUND_TIME_LIMIT saniye); sınır monitor'a verilir
+    (hedef açık kuralı) ve solver_stats['lower_bound'] olarak döner. Sınırın
+    süresi arama bütçesinden düşülür; rota önbellekten alınırsa ve fast_mode'da
+    sınır hesaplanmaz. bound_matrix verilirse (ön işlemede noktalar
+    birleştirildiyse tüm noktaları içeren matris) sınır onun üzerinden
+    hesaplanır; böylece sınır genişletilmiş rotanın maliyetiyle karşılaştırılabilir.
+    """
+    if monitor is None:
+        monitor = SolveMonitor(cost_scaling_factor=cost_scaling_factor)
+    if distance_matrix is None or len(distance_matrix) == 0:
+        return None, None, None, None, ["Hata: Geçersiz mesafe matrisi."]
+
+    bound = {'stats': None, 'messages': [], 'stages': {}}
+
+    def compute_bound():
+        """Alt sınırı hesaplayıp monitor'a verir; harcanan süreyi (saniye) döndürür."""
+        with measure_stage(bound['stages'], 'lower_bound'):
+            bound['stats'], bound['messages'] = compute_lower_bound(
+                distance_matrix if bound_matrix is None else bound_matrix, fuel_price, consumption, cost_scaling_factor,
+                min(LOWER_BOUND_TIME_LIMIT, LOWER_BOUND_TIME_SHARE * time_limit), lambda: monitor.cancelled
+            )
+        if bound['stats'] is not None:
+            monitor.set_lower_bound(bound['stats']['bound'])
+        return bound['stages']['lower_bound']['seconds']
+
+    # Hızlı modun amacı en kısa sürede rota vermektir; alt sınır hesaplanmaz
+    bound_step = compute_bound if use_lower_bound and not fast_mode else None
+    solution, manager, routing, solver_stats, status_messages = _run_solver(
+        distance_matrix, fuel_price, consumption, time_limit, cost_scaling_factor, cost_mode, use_route_cache,
+        portfolio_size, monitor, large_instance_threshold, cluster_size, polish, fast_mode, symmetric, bound_step
+    )
+    if solver_stats is not None and bound['stats'] is not None:
+        solver_stats['lower_bound'] = bound['stats']
+        solver_stats['stages'] = {**bound['stages'], **solver_stats['stages']}
+    return solution, manager, routing, solver_stats, bound['messages'] + status_messages
+
+def _search_budget(time_limit, bound_step):
+    """Alt sınır hesabını (bound_step) çalıştırır ve kalan arama süresini döndürür."""
+    if bound_step is None:
+        return time_limit
+    return max(time_limit - bound_step(), MIN_SUBPROBLEM_SECONDS)
+
+def _run_solver(distance_matrix, fuel_price, consumption, time_limit, cost_scaling_factor, cost_mode, use_route_cache, portfolio_size, monitor, large_instance_threshold, cluster_size, polish, fast_mode, symmetric, bound_step=None):
+    """
+    run_tsp_solver'ın çözücü seçimi ve OR-Tools araması. bound_step verilirse
+    alt sınır önbellek kontrolünden sonra hesaplanır ve süresi aramadan düşülür.
+    """
+    status_messages = []
+
+    if fast_mode or isinstance(distance_matrix, CandidateGraph):
+        # OR-Tools her yol için Python geri çağrısı gerektirirdi; aday graf yerel arama motoruyla çözülür
+        return run_fast_solver(distance_matrix, fuel_price, consumption, _search_budget(time_limit, bound_step), cost_scaling_factor, monitor, symmetric)
+    if large_instance_threshold and len(distance_matrix) >= large_instance_threshold:
+        # Tek model bu boyutta süre sınırına sığmaz; portföy ve rota önbelleği kullanılmaz
+        cpu_count = os.cpu_count() or 1
+        if cpu_count < DECOMPOSITION_MIN_CPUS:
+            # Küme alt problemleri paralel çözülemeyince en yakın komşu + 2-opt/Or-opt daha iyi rotayı daha kısa sürede bulur
+            solution, manager, routing, solver_stats, fast_msgs = run_fast_solver(
+                distance_matrix, fuel_price, consumption, _search_budget(time_limit, bound_step), cost_scaling_factor, monitor, symmetric
+            )
+            return solution, manager, routing, solver_stats, [
+                f"Kümeleme modu yerine hızlı mod kullanılıyor ({cpu_count} CPU çekirdeği; kümeleme en az {DECOMPOSITION_MIN_CPUS} çekirdek ister)."
+            ] + fast_msgs
+        return run_decomposed_solver(
+            distance_matrix, fuel_price, consumption, _search_budget(time_limit, bound_step), cost_scaling_factor,
+            cost_mode, cluster_size, monitor, polish=polish, symmetric=symmetric
+        )
+
+    manager = None
+    routing = None
+    stages = {} # Aşama bazında süre ve tepe bellek (tsp_metrics)
+    transit_calls = [0] if cost_mode == COST_MODE_CALLBACK else None
+    try:
+        with measure_stage(stages, 'model_build'):
+            manager, routing = _create_routing_model(distance_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode, transit_calls=transit_calls)
+    except ValueError as e:
+        return None, manager, routing, None, [f"Hata: {e}"]
+    except Exception as e:
+         # Manager veya Model oluşturulurken hata olursa
+         return None, None, None, None, [f"Hata: Rota modeli oluşturulamadı: {e}", traceback.format_exc()]
+    if cost_mode == COST_MODE_MATRIX:
+        status_messages.append("Maliyet modu: Önceden hesaplanmış maliyet matrisi (yerel OR-Tools matrisi).")
+    else:
+        status_messages.append("Maliyet modu: Python geri çağrısı (yay başına hesaplama).")
+
+    # Portföy, aynı süre sınırına sığması için çekirdek sayısıyla sınırlanır
+    configs = [DEFAULT_SOLVER_CONFIG]
+    if portfolio_size > 1:
+        cpu_count = os.cpu_count() or 1
+        configs = PORTFOLIO_CONFIGS[:min(portfolio_size, len(PORTFOLIO_CONFIGS), cpu_count)]
+        if len(configs) < portfolio_size:
+            status_messages.append(f"Uyarı: Portföy {len(configs)} yapılandırmayla sınırlandı ({cpu_count} CPU çekirdeği).")
+    use_portfolio = len(configs) > 1
+
+    try:
+        with measure_stage(stages, 'model_build'):
+            search_parameters = _create_search_parameters(configs[0], time_limit)
+            routing.CloseModelWithParameters(search_parameters)
+
+        # Rota yalnızca mesafe matrisine bağlıdır; fiyat ve tüketim anahtara girmez
+        cache_key = None
+        cached_entry = None
+        initial_solution = None
+        if use_route_cache:
+            solver_settings = {
+                'configs': configs,
+                'num_vehicles': 1,
+                'depot': 0,
+            }
+            cache_key = _route_cache_key(compute_matrix_hash(distance_matrix), solver_settings)
+            cached_entry = load_cached_route(cache_key)
+            if cached_entry:
+                initial_solution = _route_to_assignment(manager, routing, cached_entry['route'])
+                if initial_solution is None:
+                    status_messages.append("Uyarı: Önbellekteki rota bu matrisle uyumlu değil, yok sayılıyor.")
+                    cached_entry = None
+
+        if initial_solution is not None and cached_entry.get('time_limit', 0) >= time_limit:
+            status_messages.append(
+                f"Rota önbellekten alındı ({cached_entry['time_limit']:.1f} sn bütçeyle bulunmuştu). "
+                "Maliyet güncel fiyat ve tüketimle yeniden hesaplandı."
+            )
+            solver_stats = {
+                'method': 'ortools',
+                'cost_mode': cost_mode,
+                'route_cache': 'hit',
+                'solve_seconds': 0.0,
+                'solutions': 0,
+                'branches': 0,
+                'solutions_per_second': 0.0,
+                'status': 'ROUTE_CACHE_HIT',
+                'transit_callback_calls': transit_calls[0] if transit_calls is not None else None,
+                'stages': stages,
+            }
+            return initial_solution, manager, routing, solver_stats, status_messages
+
+        # Önbellek anahtarı ve mesajlar istenen bütçeyle kalır; arama alt sınırdan ve
+        # cilalama payından arta kalan süreyle yapılır
+        search_seconds = _search_budget(time_limit, bound_step)
+        polish_seconds = min(POLISH_TIME_LIMIT, POLISH_TIME_SHARE * time_limit) if polish else 0.0
+        search_seconds = max(search_seconds - polish_seconds, MIN_SUBPROBLEM_SECONDS)
+        if search_seconds != time_limit:
+            search_parameters.time_limit.FromMilliseconds(int(search_seconds * 1000))
+
+        if use_portfolio:
+            status_messages.append(
+                f"Çözücü portföyü çalıştırılıyor ({len(configs)} paralel yapılandırma, süre sınırı: {time_limit} saniye)..."
+            )
+        else:
+            status_messages.append(f"Çözücü çalıştırılıyor (süre sınırı: {time_limit} saniye)...")
+        if initial_solution is not None:
+            status_messages.append(
+                f"Önbellekteki rota ({cached_entry['time_limit']:.1f} sn bütçeyle bulunmuş) başlangıç çözümü olarak kullanılıyor."
+            )
+
+        solve_start = time.perf_counter()
+        deadline = solve_start + search_seconds + polish_seconds
+        monitor.start()
+        portfolio_results = None
+        with measure_stage(stages, 'search'):
+            if use_portfolio:
+                initial_route = cached_entry['route'] if initial_solution is not None else None
+                portfolio_results = _run_portfolio(
+                    distance_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode,
+                    configs, search_seconds, monitor, initial_route
+                )
+                # Havuzun başlatılması arama sayılmaz; işçilerin gerçekten aradığı süre raporlanır
+                solve_seconds = max((result['solve_seconds'] for result in portfolio_results), default=0.0)
+                finished = [result for result in portfolio_results if result['objective'] is not None]
+                for result in portfolio_results:
+                    if result['error']:
+                        status_messages.append(f"Uyarı: Portföy yapılandırması başarısız ({describe_solver_config(result['config'])}): {result['error']}")
+                solution = None
+                winner = None
+                if finished:
+                    winner = min(finished, key=lambda result: result['objective'])
+                    solution = _route_to_assignment(manager, routing, winner['route'])
+                    status_messages.append(f"Kazanan yapılandırma: {describe_solver_config(winner['config'])}")
+                num_solutions = sum(result['solutions'] for result in portfolio_results)
+                num_branches = sum(result['branches'] for result in portfolio_results)
+                search_status = routing_status_name(winner['status']) if winner else 'ROUTING_FAIL'
+                callback_calls = _sum_transit_calls(portfolio_results)
+            else:
+                _attach_search_hooks(routing, monitor.record, monitor.should_stop)
+                if initial_solution is not None:
+                    solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
+                else:
+                    solution = routing.SolveWithParameters(search_parameters)
+                solve_seconds = time.perf_counter() - solve_start
+                num_solutions = routing.solver().Solutions()
+                num_branches = routing.solver().Branches()
+                search_status = routing_status_name(routing.status())
+                callback_calls = transit_calls[0] if transit_calls is not None else None
+
+        # Süre dolduğunda OR-Tools'un bıraktığı rota yerel aramayla cilalanır; arama
+        # erken bittiyse artan süre de kullanılır
+        polish_stats = None
+        polish_seconds = min(POLISH_TIME_LIMIT, deadline - time.perf_counter())
+        if solution and polish and polish_seconds > 0 and not monitor.cancelled:
+            with measure_stage(stages, 'polish'):
+                polished_route, _, polish_stats = _polish_route(
+                    distance_matrix, _extract_route(solution, manager, routing), fuel_price, consumption,
+                    cost_scaling_factor, polish_seconds, lambda: monitor.cancelled, symmetric
+                )
+            polished_solution = _route_to_assignment(manager, routing, polished_route) if polish_stats['gain_try'] > 0 else None
+            if polished_solution is not None:
+                solution = polished_solution
+                monitor.record(solution.ObjectiveValue())
+            status_messages.append(_describe_polish(polish_stats))
+
+        # Mod karşılaştırması için arama istatistikleri
+        history = monitor.history()
+        solver_stats = {
+            'method': 'portfolio' if use_portfolio else 'ortools',
+            'cost_mode': cost_mode,
+            'route_cache': ('warm_start' if initial_solution is not None else 'miss') if use_route_cache else 'off',
+            'solve_seconds': solve_seconds,
+            'solutions': num_solutions,
+            'branches': num_branches,
+            'solutions_per_second': num_solutions / solve_seconds if solve_seconds > 0 else 0.0,
+            'stop_reason': monitor.stop_reason or 'time_limit',
+            'status': search_status,
+            'transit_callback_calls': callback_calls,
+            'last_improvement_seconds': history[-1][0] if history else None,
+            'history': history,
+            'stages': stages,
+        }
+        if polish_stats:
+            solver_stats['polish'] = polish_stats
+        if monitor.stop_reason:
+            status_messages.append(f"Arama erken sonlandı: {STOP_REASON_LABELS[monitor.stop_reason]} ({solve_seconds:.1f} sn).")
+        if use_portfolio:
+            solver_stats['portfolio'] = [
+                {
+                    'config': describe_solver_config(result['config']),
+                    'objective_try': result['objective'] / cost_scaling_factor if result['objective'] is not None else None,
+                    'solutions': result['solutions'],
+                    'solve_seconds': result['solve_seconds'],
+                    'error': result['error'],
+                }
+                for result in portfolio_results
+            ]
+            solver_stats['portfolio_winner'] = describe_solver_config(winner['config']) if winner else None
+            status_messages.append("Çözücü portföyü tamamlandı.")
+        else:
+            status_messages.append(f"Çözücü tamamlandı. Durum: {routing.status()}") # Durumu mesaja ekle
+        status_messages.append(
+            f"Keşfedilen çözüm sayısı: {num_solutions} ({solver_stats['solutions_per_second']:.1f} çözüm/sn, "
+            f"{solve_seconds:.2f} sn)"
+        )
+
+        if solution and cache_key:
+            # Önbellekteki rotadan başlanmışsa toplam arama bütçesi birikir; erken duran
+            # (iptal, durgunluk, hedef açık) aramada yalnızca gerçekten harcanan süre sayılır
+            # (kesirli saniye; 0,9 sn'lik arama 0 sn sayılmasın)
+            searched_seconds = time_limit if monitor.stop_reason is None else float(solve_seconds)
+            spent_time_limit = searched_seconds + (cached_entry.get('time_limit', 0) if initial_solution is not None else 0)
+            try:
+                route_indices = _extract_route(solution, manager, routing)
+                save_cached_route(cache_key, route_indices, _route_distance(distance_matrix, route_indices), spent_time_limit)
+            except OSError as e:
+                status_messages.append(f"Uyarı: Rota önbelleğe yazılamadı: {e}")
+        return solution, manager, routing, solver_stats, status_messages
+
+    except Exception as e:
+         return None, manager, routing, None, status_messages + [f"Hata: Çözücü çalıştırılırken hata oluştu: {e}", traceback.format_exc()]
+
+
+# --- Büyük Örnekler: Önce Kümele, Sonra Rotala ---
+
+def _pair_distances(distance_matrix, rows, cols):
+    """rows x cols gidiş-dönüş ortalama mesafeleri; asimetrik matrislerde kümeleme için simetrik ölçü."""
+    rows = np.asarray(rows, dtype=np.intp)
+    cols = np.asarray(cols, dtype=np.intp)
+    forward = np.asarray(distance_matrix[np.ix_(rows, cols)], dtype=np.float64)
+    forward += distance_matrix[np.ix_(cols, rows)].T
+    forward /= 2.0
+    return forward
+
+def _medoid(distance_matrix, members, rng):
+    """Kümedeki diğer noktalara toplam mesafesi en küçük olan noktayı (medoid) bulur."""
+    candidates = members if len(members) <= MEDOID_SAMPLE_SIZE else rng.choice(members, MEDOID_SAMPLE_SIZE, replace=False)
+    return candidates[int(np.argmin(_pair_distances(distance_matrix, candidates, members).sum(axis=1)))]
+
+def _kmedoids(distance_matrix, nodes, num_clusters, rng):
+    """Düğümleri en uzak nokta başlangıçlı k-medoids ile num_clusters kümeye ayırır."""
+    medoids = [nodes[0]]
+    min_distance = _pair_distances(distance_matrix, medoids, nodes)[0]
+    for _ in range(1, num_clusters):
+        medoids.append(nodes[int(np.argmax(min_distance))])
+        np.minimum(min_distance, _pair_distances(distance_matrix, medoids[-1:], nodes)[0], out=min_distance)
+    medoids = np.array(medoids)
+
+    for _ in range(KMEDOIDS_ITERATIONS):
+        labels = np.argmin(_pair_distances(distance_matrix, medoids, nodes), axis=0)
+        new_medoids = np.array([
+            _medoid(distance_matrix, nodes[labels == cluster], rng) if np.any(labels == cluster) else medoids[cluster]
+            for cluster in range(len(medoids))
+        ])
+        if np.array_equal(new_medoids, medoids):
+            break
+        medoids = new_medoids
+    labels = np.argmin(_pair_distances(distance_matrix, medoids, nodes), axis=0)
+    return [nodes[labels == cluster] for cluster in range(len(medoids)) if np.any(labels == cluster)]
+
+def partition_locations(distance_matrix, cluster_size=DEFAULT_CLUSTER_SIZE, seed=0):
+    """
+    Konumları yalnızca mesafe matrisini kullanarak uzamsal olarak tutarlı kümelere
+    ayırır (k-medoids). Hedefin CLUSTER_MAX_SIZE_FACTOR katından büyük kalan
+    kümeler aynı yöntemle yeniden bölünür. Küme üyelerinin dizilerini döndürür.
+    """
+    rng = np.random.default_rng(seed)
+    max_size = max(2, int(cluster_size * CLUSTER_MAX_SIZE_FACTOR))
+    pending = [np.arange(len(distance_matrix))]
+    clusters = []
+    while pending:
+        nodes = pending.pop()
+        if len(nodes) <= max_size:
+            clusters.append(nodes)
+            continue
+        parts = _kmedoids(distance_matrix, nodes, math.ceil(len(nodes) / cluster_size), rng)
+        if len(parts) < 2:
+            parts = np.array_split(nodes, 2) # Tüm mesafeler eşitse uzamsal bölme yapılamaz
+        pending.extend(parts)
+    return clusters
+
+def _solve_path_worker(distance_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode, start, end, time_limit, stop_requested=None, deadline=None):
+    """
+    Bir alt problemi (küme, küme sıralaması veya onarım penceresi) start'tan end'e
+    yol olarak çözer; start == end ise kapalı tur arar. deadline (time.time()
+    zamanı) verilirse süre, alt problemin gerçekten başladığı anda kalan süreye
+    indirilir (kuyrukta bekleyen turlar ve süreç açılışı bütçeyi aşmasın).
+    Yerel indekslerle yolu ve arama istatistiklerini döndürür.
+    """
+    if len(distance_matrix) == 1:
+        return {'route': [start], 'solutions': 0, 'branches': 0, 'transit_callback_calls': None}
+    transit_calls = [0] if cost_mode == COST_MODE_CALLBACK else None
+    manager, routing = _create_routing_model(distance_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode, start, end, transit_calls)
+    if deadline is not None:
+        time_limit = max(min(time_limit, deadline - time.time()), MIN_SUBPROBLEM_SECONDS)
+    search_parameters = _create_search_parameters(DEFAULT_SOLVER_CONFIG, time_limit)
+    routing.CloseModelWithParameters(search_parameters)
+    if stop_requested is not None:
+        _attach_search_hooks(routing, lambda objective_value: None, stop_requested)
+    solution = routing.SolveWithParameters(search_parameters)
+    return {
+        'route': _extract_route(solution, manager, routing) if solution else None,
+        'solutions': routing.solver().Solutions(),
+        'branches': routing.solver().Branches(),
+        'transit_callback_calls': transit_calls[0] if transit_calls is not None else None,
+    }
+
+def _run_subproblems(jobs, fuel_price, consumption, cost_scaling_factor, cost_mode, monitor, max_workers, deadline=None):
+    """
+    (alt matris, başlangıç, bitiş, süre) işlerini çözer. Tek işçide süreç açmadan
+    sırayla, aksi halde 'spawn' süreç havuzunda paralel çalıştırır. İptal veya erken
+    durdurma kalan aramaları kısa keser; deadline (time.time() zamanı) aşamanın
+    bitmesi gereken andır. Sonuçlar iş sırasıyla döner.
+    """
+    if max_workers <= 1 or len(jobs) <= 1:
+        return [
+            _solve_path_worker(sub_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode, start, end, time_limit, monitor.should_stop, deadline)
+            for sub_matrix, start, end, time_limit in jobs
+        ]
+
+    results = [None] * len(jobs)
+    mp_context = multiprocessing.get_context('spawn')
+    with mp_context.Manager() as sync_manager, \
+            ProcessPoolExecutor(max_workers=min(max_workers, len(jobs)), mp_context=mp_context) as executor:
+        stop_event = sync_manager.Event()
+        futures = {
+            executor.submit(
+                _solve_path_worker, sub_matrix, fuel_price, consumption, cost_scaling_factor,
+                cost_mode, start, end, time_limit, stop_event.is_set, deadline
+            ): job_no
+            for job_no, (sub_matrix, start, end, time_limit) in enumerate(jobs)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=PROGRESS_POLL_INTERVAL)
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = {'route': None, 'solutions': 0, 'branches': 0, 'transit_callback_calls': None, 'error': str(e)}
+            if not stop_event.is_set() and monitor.should_stop():
+                stop_event.set()
+    return results
+
+def _fallback_path(num_nodes, start, end):
+    """Alt problem çözülemezse kullanılan yol: start, diğer düğümler sırayla, end."""
+    middle = [node for node in range(num_nodes) if node not in (start, end)]
+    return [start] + middle + ([end] if end != start else [])
+
+def _order_clusters(distance_matrix, clusters, depot, fuel_price, consumption, cost_scaling_factor, cost_mode, monitor, time_limit=CLUSTER_ORDER_TIME_LIMIT):
+    """
+    Kümeleri tek bir tur olacak şekilde sıralar. Her küme medoidiyle (depo kümesi
+    depoyla) temsil edilir; temsilciler arası küçük TSP en fazla time_limit
+    saniyede çözülür. Depo kümesi ilk sıradadır.
+    """
+    rng = np.random.default_rng(0)
+    depot_cluster = next(index for index, members in enumerate(clusters) if depot in members)
+    representatives = np.array([
+        depot if index == depot_cluster else _medoid(distance_matrix, members, rng)
+        for index, members in enumerate(clusters)
+    ])
+    cluster_matrix = np.asarray(distance_matrix[np.ix_(representatives, representatives)])
+    result = _solve_path_worker(
+        cluster_matrix, fuel_price, consumption, cost_scaling_factor, cost_mode,
+        depot_cluster, depot_cluster, max(time_limit, MIN_SUBPROBLEM_SECONDS), monitor.should_stop
+    )
+    if result['route'] is None:
+        return [depot_cluster] + [index for index in range(len(clusters)) if index != depot_cluster]
+    return result['route'][:-1]
+
+def _choose_cluster_endpoints(distance_matrix, ordered_clusters, depot):
+    """
+    Ardışık kümeler arasındaki en kısa geçiş yayını seçerek her kümenin giriş ve
+    çıkış noktasını belirler. Son kümenin çıkışı depoya en yakın noktadır.
+    """
+    entries, exits = [], []
+    entry = depot
+    for position, members in enumerate(ordered_clusters):
+        entries.append(entry)
+        candidates = members[members != entry] if len(members) > 1 else members
+        if position + 1 < len(ordered_clusters):
+            next_members = ordered_clusters[position + 1]
+            block = distance_matrix[np.ix_(candidates, next_members)]
+            from_pos, to_pos = np.unravel_index(int(np.argmin(block)), block.shape)
+            exits.append(int(candidates[from_pos]))
+            entry = int(next_members[to_pos])
+        else:
+            exits.append(int(candidates[int(np.argmin(distance_matrix[candidates, depot]))]))
+    return entries, exits
+
+def _boundary_windows(cluster_bounds, route_length, window):
+    """Küme geçişlerinin çevresindeki, birbiriyle örtüşmeyen [başlangıç, bitiş] konum aralıkları."""
+    windows = []
+    last_end = 0
+    for boundary in cluster_bounds:
+        window_start = max(boundary - window, last_end, 0)
+        window_end = min(boundary + window, route_length - 1)
+        if window_end - window_start >= 3: # Uçlar sabit; arada en az iki nokta olmalı
+            windows.append((window_start, window_end))
+            last_end = window_end
+    return windows
+
+def run_decomposed_solver(distance_matrix, fuel_price, consumption, time_limit, cost_scaling_factor, cost_mode=COST_MODE_MATRIX, cluster_size=DEFAULT_CLUSTER_SIZE, monitor=None, max_workers=None, polish=True, symmetric=False):
+    """
+    Binlerce noktalı örnekler için "önce kümele, sonra rotala" çözücüsü:
+    1. Konumlar mesafe matrisiyle kümelere ayrılır (partition_locations).
+    2. Kümeler bir tur olacak şekilde sıralanır, ardışık kümeler arası geçiş noktaları seçilir.
+    3. Her kümenin giriş-çıkış yolu paralel çözülür ve yollar tek tura birleştirilir.
+    4. Küme geçişleri çevresindeki pencereler yeniden sıralanır (sınır onarımı).
+    5. polish açıksa tüm rota 2-opt/Or-opt ile cilalanır.
+    Tüm aşamalar time_limit içinde kalır: sıralama ve cilalama payları ayrıldıktan
+    sonra kalan süre, işçi sayısına göre ceil(iş / işçi) tur halinde çalışan alt
+    problemlere bölünür; her aşama saatte kalan süreye göre planlanır.
+    Çözüm olarak run_tsp_solver ile aynı biçimde, OR-Tools çözüm nesnesi yerine
+    konum indeksleri listesi (depo başta ve sonda) döndürür; manager ve routing None'dır.
+    """
+    status_messages = []
+    if monitor is None:
+        monitor = SolveMonitor(cost_scaling_factor=cost_scaling_factor)
+    max_workers = max_workers or os.cpu_count() or 1
+    depot = 0
+    stages = {}
+    try:
+        monitor.start()
+        solve_start = time.perf_counter()
+        deadline = solve_start + time_limit
+        # Cilalama payı baştan ayrılır; sıralama ve kümeleme süresi saatten düşülür
+        polish_seconds = min(POLISH_TIME_LIMIT, POLISH_TIME_SHARE * time_limit) if polish else 0.0
+        with measure_stage(stages, 'clustering'):
+            clusters = partition_locations(distance_matrix, cluster_size)
+            cluster_sizes = [len(members) for members in clusters]
+            status_messages.append(
+                f"Kümeleme modu: {len(distance_matrix)} nokta {len(clusters)} kümeye ayrıldı "
+                f"(en küçük {min(cluster_sizes)}, en büyük {max(cluster_sizes)} nokta, {time.perf_counter() - solve_start:.1f} sn)."
+            )
+
+            order = _order_clusters(
+                distance_matrix, clusters, depot, fuel_price, consumption, cost_scaling_factor, cost_mode, monitor,
+                min(CLUSTER_ORDER_TIME_LIMIT, CLUSTER_ORDER_SHARE * time_limit)
+            )
+            ordered_clusters = [clusters[index] for index in order]
+            entries, exits = _choose_cluster_endpoints(distance_matrix, ordered_clusters, depot)
+
+        # Küme alt turları: her küme kendi giriş noktasından çıkış noktasına. İşçiden fazla küme
+        # varsa alt problemler ceil(K / W) tur halinde çalışır; aşama bütçesi tur sayısına bölünür.
+        cluster_rounds = math.ceil(len(clusters) / max_workers)
+        time_left = deadline - time.perf_counter() - polish_seconds
+        cluster_seconds = max(time_left * CLUSTER_PHASE_SHARE / cluster_rounds, MIN_SUBPROBLEM_SECONDS)
+        jobs = []
+        for members, entry, exit_node in zip(ordered_clusters, entries, exits):
+            local_index = {int(node): position for position, node in enumerate(members)}
+            jobs.append((np.asarray(distance_matrix[np.ix_(members, members)]), local_index[entry], local_index[exit_node], cluster_seconds))
+        status_messages.append(f"{len(jobs)} küme alt turu çözülüyor ({min(max_workers, len(jobs))} işçi, {cluster_rounds} tur, küme başına {cluster_seconds:.2f} sn)...")
+        phase_start = time.perf_counter()
+        with measure_stage(stages, 'search'):
+            cluster_results = _run_subproblems(
+                jobs, fuel_price, consumption, cost_scaling_factor, cost_mode, monitor, max_workers,
+                time.time() + time_left * CLUSTER_PHASE_SHARE
+            )
+        # Süreç havuzunun açılış maliyeti onarım aşamasında da ödeneceği için onun bütçesinden düşülür
+        pool_overhead = max(time.perf_counter() - phase_start - cluster_seconds * cluster_rounds, 0.0) if max_workers > 1 and len(jobs) > 1 else 0.0
+        transit_call_results = list(cluster_results)
+
+        route_indices = []
+        cluster_bounds = []
+        num_solutions = num_branches = failed_clusters = 0
+        for members, (sub_matrix, start, end, _), result in zip(ordered_clusters, jobs, cluster_results):
+            local_route = result['route']
+            if local_route is None:
+                failed_clusters += 1
+                local_route = _fallback_path(len(members), start, end)
+            if route_indices:
+                cluster_bounds.append(len(route_indices))
+            route_indices.extend(int(members[node]) for node in local_route)
+            num_solutions += result['solutions']
+            num_branches += result['branches']
+        route_indices.append(depot)
+        if failed_clusters:
+            status_messages.append(f"Uyarı: {failed_clusters} küme zamanında çözülemedi; bu kümelerde basit sıralama kullanıldı.")
+
+        stitched_cost = _route_fuel_cost(distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor)
+        monitor.record(stitched_cost)
+        status_messages.append(f"Küme turları birleştirildi: {stitched_cost / cost_scaling_factor:.2f} TRY.")
+
+        # Sınır onarımı: geçiş çevresindeki pencere uçları sabit tutularak yeniden sıralanır
+        windows = _boundary_windows(cluster_bounds, len(route_indices), BOUNDARY_REPAIR_WINDOW)
+        improved_windows = 0
+        repair_rounds = math.ceil(len(windows) / max_workers)
+        repair_overhead = pool_overhead if max_workers > 1 and len(windows) > 1 else 0.0
+        repair_seconds = (deadline - time.perf_counter() - polish_seconds - repair_overhead) / max(repair_rounds, 1)
+        repair_skipped = monitor.should_stop()
+        out_of_time = bool(windows) and not repair_skipped and repair_seconds < MIN_SUBPROBLEM_SECONDS
+        if windows and not repair_skipped and not out_of_time:
+            repair_jobs = []
+            for window_start, window_end in windows:
+                window_nodes = route_indices[window_start:window_end + 1]
+                repair_jobs.append((np.asarray(distance_matrix[np.ix_(window_nodes, window_nodes)]), 0, len(window_nodes) - 1, repair_seconds))
+            with measure_stage(stages, 'search'):
+                repair_results = _run_subproblems(
+                    repair_jobs, fuel_price, consumption, cost_scaling_factor, cost_mode, monitor, max_workers,
+                    time.time() + deadline - time.perf_counter() - polish_seconds
+                )
+            transit_call_results += repair_results
+            for (window_start, window_end), result in zip(windows, repair_results):
+                num_solutions += result['solutions']
+                num_branches += result['branches']
+                if result['route'] is None:
+                    continue
+                window_nodes = route_indices[window_start:window_end + 1]
+                repaired_nodes = [window_nodes[node] for node in result['route']]
+                if (_route_fuel_cost(distance_matrix, repaired_nodes, fuel_price, consumption, cost_scaling_factor)
+                        < _route_fuel_cost(distance_matrix, window_nodes, fuel_price, consumption, cost_scaling_factor)):
+                    route_indices[window_start:window_end + 1] = repaired_nodes
+                    improved_windows += 1
+        final_cost = _route_fuel_cost(distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor)
+        repaired_cost = final_cost
+        monitor.record(final_cost)
+
+        polish_stats = None
+        polish_seconds = min(POLISH_TIME_LIMIT, deadline - time.perf_counter()) # Önceki aşamalardan artan süre de kullanılır
+        if polish and not monitor.cancelled and polish_seconds > 0:
+            with measure_stage(stages, 'polish'):
+                route_indices, final_cost, polish_stats = _polish_route(
+                    distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor,
+                    polish_seconds, lambda: monitor.cancelled, symmetric
+                )
+            monitor.record(final_cost)
+        solve_seconds = time.perf_counter() - solve_start
+        if repair_skipped:
+            status_messages.append("Sınır onarımı atlandı (arama durduruldu).")
+        elif out_of_time:
+            status_messages.append("Sınır onarımı atlandı (süre sınırında onarım için süre kalmadı).")
+        else:
+            status_messages.append(
+                f"Sınır onarımı: {len(windows)} pencereden {improved_windows} tanesi iyileşti "
+                f"({(stitched_cost - repaired_cost) / cost_scaling_factor:.2f} TRY kazanç)."
+            )
+        if polish_stats:
+            status_messages.append(_describe_polish(polish_stats))
+        if monitor.stop_reason:
+            status_messages.append(f"Arama erken sonlandı: {STOP_REASON_LABELS[monitor.stop_reason]} ({solve_seconds:.1f} sn).")
+
+        history = monitor.history()
+        solver_stats = {
+            'method': 'decomposition',
+            'cost_mode': cost_mode,
+            'route_cache': 'off',
+            'solve_seconds': solve_seconds,
+            'solutions': num_solutions,
+            'branches': num_branches,
+            'solutions_per_second': num_solutions / solve_seconds if solve_seconds > 0 else 0.0,
+            'stop_reason': monitor.stop_reason or 'time_limit',
+            'status': 'ROUTE_FOUND',
+            'transit_callback_calls': _sum_transit_calls(transit_call_results),
+            'last_improvement_seconds': history[-1][0] if history else None,
+            'history': history,
+            'stages': stages,
+            'decomposition': {
+                'clusters': len(clusters),
+                'cluster_sizes': cluster_sizes,
+                'repair_windows': len(windows),
+                'repaired_windows': improved_windows,
+                'stitched_objective_try': stitched_cost / cost_scaling_factor,
+                'repair_gain_try': (stitched_cost - repaired_cost) / cost_scaling_factor,
+            },
+        }
+        if polish_stats:
+            solver_stats['polish'] = polish_stats
+        status_messages.append(f"Kümeleme modu tamamlandı ({solve_seconds:.1f} sn).")
+        return route_indices, None, None, solver_stats, status_messages
+
+    except Exception as e:
+        return None, None, None, None, status_messages + [f"Hata: Kümeleme modunda hata oluştu: {e}", traceback.format_exc()]
+
+
+def run_fast_solver(distance_matrix, fuel_price, consumption, time_limit, cost_scaling_factor, monitor=None, symmetric=False):
+    """
+    Hızlı mod: OR-Tools yerine en yakın komşu rotası ve 2-opt/Or-opt yerel araması.
+    Orta boy matrislerde bir saniyenin altında sonuç verir; "ya şöyle olsaydı"
+    denemeleri için uygundur. Yerel optimuma ulaşınca veya süre dolunca durur.
+    Çözüm rota listesi olarak döner; manager ve routing None'dır. Seyrek aday
+    grafında rota ve hamleler graftaki yollarla sınırlıdır.
+    """
+    if monitor is None:
+        monitor = SolveMonitor(cost_scaling_factor=cost_scaling_factor)
+    sparse = isinstance(distance_matrix, CandidateGraph)
+    if sparse:
+        status_messages = [f"Seyrek aday grafı: en yakın {distance_matrix.num_neighbors} komşu yolları üzerinde en yakın komşu rotası + 2-opt/Or-opt."]
+    else:
+        status_messages = ["Hızlı mod: en yakın komşu rotası + 2-opt/Or-opt yerel araması."]
+    stages = {}
+    try:
+        monitor.start()
+        with measure_stage(stages, 'search'):
+            route_indices, search_stats = solve_fast(distance_matrix, 0, time_limit, lambda: monitor.cancelled, symmetric)
+        route_cost = _route_fuel_cost(distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor)
+        monitor.record(route_cost)
+        solve_seconds = search_stats['seconds']
+        num_moves = search_stats['two_opt_moves'] + search_stats['or_opt_moves']
+        if monitor.cancelled:
+            stop_reason = 'cancelled'
+        else:
+            stop_reason = 'local_optimum' if search_stats['local_optimum'] else 'time_limit'
+        history = monitor.history()
+        solver_stats = {
+            'method': 'sparse' if sparse else 'fast',
+            'cost_mode': COST_MODE_MATRIX,
+            'route_cache': 'off',
+            'solve_seconds': solve_seconds,
+            'solutions': num_moves,
+            'branches': 0,
+            'solutions_per_second': num_moves / solve_seconds if solve_seconds > 0 else 0.0,
+            'stop_reason': stop_reason,
+            'status': 'ROUTE_FOUND',
+            'transit_callback_calls': None,
+            'last_improvement_seconds': history[-1][0] if history else None,
+            'history': history,
+            'stages': stages,
+            'fast_mode': search_stats,
+        }
+        if sparse:
+            solver_stats['sparse'] = {
+                'neighbors': distance_matrix.num_neighbors,
+                'arcs': distance_matrix.num_arcs,
+                'memory_mb': distance_matrix.nbytes / 1e6,
+                'jump_arcs': search_stats.get('jump_arcs', 0),
+            }
+            status_messages.append(
+                f"Aday grafında tıkanan {solver_stats['sparse']['jump_arcs']} adımda en kısa yolla en yakın ziyaret edilmemiş konuma geçildi."
+            )
+        status_messages.append(
+            f"Hızlı mod tamamlandı: {search_stats['two_opt_moves']} 2-opt + {search_stats['or_opt_moves']} Or-opt hamlesi, "
+            f"{solve_seconds:.2f} sn ({STOP_REASON_LABELS[stop_reason]})."
+        )
+        return route_indices, None, None, solver_stats, status_messages
+    except ValueError as e:
+        # Aday grafında ulaşılamayan konumlar (ör. eksik mesafeler) beklenen bir veri hatasıdır
+        return None, None, None, None, status_messages + [f"Hata: {e}."]
+    except Exception as e:
+        return None, None, None, None, status_messages + [f"Hata: Hızlı modda hata oluştu: {e}", traceback.format_exc()]
+
+
+def reoptimize_route(previous_route_labels, distance_matrix, location_labels, fuel_price, consumption, time_limit, cost_scaling_factor, monitor=None):
+    """
+    Artımlı mod: önceki rotayı (konum etiketleri sırası) güncel matrise uyarlar.
+    Noktalar etiketle eşleştirilir; matriste artık olmayanlar rotadan çıkarılır,
+    yeni noktalar en ucuz konumlara eklenir ve yalnızca değişen noktaların
+    çevresinde kısa bir 2-opt/Or-opt iyileştirmesi yapılır. Rota her zaman
+    güncel matrisin ilk konumundan (depo) başlar. Çözüm rota listesi olarak döner.
+    """
+    if monitor is None:
+        monitor = SolveMonitor(cost_scaling_factor=cost_scaling_factor)
+    status_messages = []
+    if isinstance(distance_matrix, CandidateGraph):
+        return None, None, None, None, ["Hata: Artımlı mod seyrek aday grafıyla kullanılamaz; tam mesafe matrisiyle çalıştırın."]
+    if not location_labels or len(location_labels) != len(distance_matrix):
+        return None, None, None, None, ["Hata: Artımlı mod için etiketli (CSV) bir mesafe matrisi gerekir."]
+    label_to_index = {label: index for index, label in enumerate(location_labels)}
+    if len(label_to_index) != len(location_labels):
+        return None, None, None, None, ["Hata: Mesafe matrisinde aynı etiket birden fazla kez geçiyor; noktalar eşleştirilemez."]
+
+    stages = {}
+    try:
+        monitor.start()
+        solve_start = time.perf_counter()
+        with measure_stage(stages, 'search'):
+            depot = 0
+            # Kapanış adımı (depoya dönüş) tekrar sayılmaz
+            previous_sequence = list(dict.fromkeys(previous_route_labels))
+            kept = [label_to_index[label] for label in previous_sequence if label in label_to_index]
+            dropped_labels = [label for label in previous_sequence if label not in label_to_index]
+            kept_set = set(kept)
+            added = [index for index in range(len(distance_matrix)) if index not in kept_set]
+            if previous_sequence[0] != location_labels[depot]:
+                status_messages.append(
+                    f"Uyarı: Önceki rotanın başlangıcı ('{previous_sequence[0]}') yeni depo ('{location_labels[depot]}') değil; "
+                    "rota yeni depodan başlayacak şekilde döndürüldü."
+                )
+            if not kept:
+                status_messages.append("Uyarı: Önceki rotayla ortak nokta yok; rota sıfırdan (hızlı mod) kuruluyor.")
+                route_indices, _ = solve_fast(distance_matrix, depot, time_limit, lambda: monitor.cancelled)
+            else:
+                if depot in kept_set:
+                    depot_position = kept.index(depot)
+                    kept = kept[depot_position:] + kept[:depot_position]
+                    route_indices = cheapest_insertion(distance_matrix, kept + [depot], added)
+                else:
+                    # Depo yeni bir noktaysa önce o eklenir, ardından rota depodan başlatılır
+                    route_indices = cheapest_insertion(distance_matrix, kept + [kept[0]], [depot])[:-1]
+                    depot_position = route_indices.index(depot)
+                    route_indices = route_indices[depot_position:] + route_indices[:depot_position] + [depot]
+                    route_indices = cheapest_insertion(distance_matrix, route_indices, [index for index in added if index != depot])
+            status_messages.append(
+                f"Eşleştirme: {len(kept)} nokta korundu, {len(dropped_labels)} nokta çıkarıldı, {len(added)} yeni nokta eklendi."
+            )
+            repaired_cost = _route_fuel_cost(distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor)
+            monitor.record(repaired_cost)
+
+            # Yalnızca değişikliğin dokunduğu noktalar (eklenenler ve çıkarılanların eski komşuları) ile
+            # onların en yakın komşularından başlanır; iyileşme oldukça arama kendiliğinden yayılır
+            neighbors = build_neighbor_lists(distance_matrix)
+            affected = set(added)
+            previous_positions = {label: position for position, label in enumerate(previous_sequence)}
+            for label in dropped_labels:
+                position = previous_positions[label]
+                for neighbor_label in (previous_sequence[position - 1], previous_sequence[(position + 1) % len(previous_sequence)]):
+                    if neighbor_label in label_to_index:
+                        affected.add(label_to_index[neighbor_label])
+            active_nodes = set(affected)
+            for node in affected:
+                active_nodes.update(int(neighbor) for neighbor in neighbors[node])
+            local_stats = None
+            if active_nodes and len(distance_matrix) >= 5:
+                improved_route, local_stats = improve_tour(
+                    distance_matrix, route_indices, neighbors, min(INCREMENTAL_TIME_LIMIT, time_limit),
+                    lambda: monitor.cancelled, active_nodes=sorted(active_nodes)
+                )
+                improved_cost = _route_fuel_cost(distance_matrix, improved_route, fuel_price, consumption, cost_scaling_factor)
+                if improved_cost < repaired_cost:
+                    route_indices = improved_route
+                    monitor.record(improved_cost)
+            final_cost = _route_fuel_cost(distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor)
+        solve_seconds = time.perf_counter() - solve_start
+        num_moves = (local_stats['two_opt_moves'] + local_stats['or_opt_moves']) if local_stats else 0
+        if local_stats:
+            status_messages.append(
+                f"Yerel iyileştirme {len(active_nodes)} noktalık bölgede: {num_moves} hamle, "
+                f"{(repaired_cost - final_cost) / cost_scaling_factor:.2f} TRY kazanç."
+            )
+        status_messages.append(f"Artımlı güncelleme tamamlandı ({solve_seconds:.2f} sn).")
+
+        history = monitor.history()
+        solver_stats = {
+            'method': 'incremental',
+            'cost_mode': COST_MODE_MATRIX,
+            'route_cache': 'off',
+            'solve_seconds': solve_seconds,
+            'solutions': num_moves,
+            'branches': 0,
+            'solutions_per_second': num_moves / solve_seconds if solve_seconds > 0 else 0.0,
+            'stop_reason': 'cancelled' if monitor.cancelled else 'local_optimum',
+            'status': 'ROUTE_FOUND',
+            'transit_callback_calls': None,
+            'last_improvement_seconds': history[-1][0] if history else None,
+            'history': history,
+            'stages': stages,
+            'incremental': {
+                'kept': len(kept),
+                'dropped': len(dropped_labels),
+                'added': len(added),
+                'dropped_labels': dropped_labels,
+                'added_labels': [location_labels[index] for index in added],
+                'affected_nodes': len(active_nodes),
+                'local_gain_try': (repaired_cost - final_cost) / cost_scaling_factor,
+            },
+        }
+        return route_indices, None, None, solver_stats, status_messages
+    except Exception as e:
+        return None, None, None, None, status_messages + [f"Hata: Artımlı güncellemede hata oluştu: {e}", traceback.format_exc()]
+
+
+def build_route_table(distance_matrix, route_indices, fuel_price, consumption, cost_scaling_factor, location_labels=None):
+    """
+    Rota adımları tablosunu oluşturur. Her adım için bir önceki adımdan gelen
+    yayın mesafesi ve yakıt maliyeti matristen vektörel olarak alınır; maliyetler
+    amaç değeriyle aynı yuvarlama kurallarını kullandığından toplamları birebir eşleşir.
+    """
+    route = np.asarray(route_indices, dtype=np.intp)
+    from_nodes, to_nodes = route[:-1], route[1:]
+    leg_distances = np.zeros(len(route), dtype=np.int64)
+    leg_distances[1:] = _arc_distances(distance_matrix, from_nodes, to_nodes)
+    leg_costs = _fuel_cost_values(leg_distances, fuel_price, consumption, cost_scaling_factor)
+    leg_costs[1:][from_nodes == to_nodes] = 0
+
+    route_df = pd.DataFrame({'Konum_Indeksi': route.astype(np.int64)})
+    route_df.index.name = 'Adim' # Türkçe: Adım
+    if location_labels is not None and len(location_labels) == len(distance_matrix):
+        route_df['Konum_Etiketi'] = np.asarray(location_labels, dtype=object)[route]
+    route_df['Mesafe_m'] = leg_distances
+    route_df['Yakit_Maliyeti_TRY'] = leg_costs / cost_scaling_factor
+    return route_df
+
+def process_and_save_results(solution, manager, routing, distance_matrix, cost_scaling_factor, fuel_price_used, consumption_used, output_base_filename, solver_stats=None, location_labels=None):
+    """
+    Sonuçları işler, özet oluşturur ve (özet, rota tablosu, dışa aktarım, mesajlar) döndürür.
+    solution bir OR-Tools çözüm nesnesi ya da (kümeleme modundaki gibi) doğrudan
+    konum indeksleri listesi olabilir; liste verilirse manager ve routing gerekmez.
+    location_labels verilirse rota tablosuna 'Konum_Etiketi' sütunu eklenir
+    (artımlı modda önceki rotanın eşleştirilmesi bu sütunla yapılır).
+    Dosyalar burada üretilmez; dönen RouteExport nesnesi her biçimi ilk
+    istendiğinde üretir ve saklar.
+    """
+    if not solution:
+        return None, None, None, ["Hata: Geçersiz çözüm nesnesi."]
+    route_mode = isinstance(solution, (list, tuple))
+    if not route_mode and (not manager or not routing):
+         return None, None, None, ["Hata: Geçersiz rota yöneticisi veya model nesnesi."]
+
+
+    try:
+        # Sonuçları al
+        if route_mode:
+            route_indices = [int(node) for node in solution]
+            total_cost = _route_fuel_cost(distance_matrix, route_indices, fuel_price_used, consumption_used, cost_scaling_factor)
+            start_node = route_indices[0]
+        else:
+            total_cost = solution.ObjectiveValue()
+            route_indices = _extract_route(solution, manager, routing)
+            start_node = manager.IndexToNode(routing.Start(0))
+        total_cost_try = total_cost / cost_scaling_factor
+
+        route_df = build_route_table(distance_matrix, route_indices, fuel_price_used, consumption_used, cost_scaling_factor, location_labels)
+
+        # Özet Bilgileri Hesapla ve Türkçe Başlıklar
+        num_locations = len(distance_matrix)
+        route_distance_meters = int(route_df['Mesafe_m'].sum())
+
+        summary_dict = {'Toplam Yakıt Maliyeti (TRY)': f"{total_cost_try:.2f}"}
+        # Alt sınır yalnızca bu rotanın matrisi için hesaplandıysa (ör. nokta birleştirilmediyse) geçerlidir
+        bound_stats = solver_stats.get('lower_bound') if solver_stats else None
+        if bound_stats and bound_stats['num_locations'] == num_locations:
+            summary_dict['Alt Sınır (TRY)'] = f"{bound_stats['bound_try']:.2f}"
+            summary_dict['Optimallik Açığı (%)'] = f"{optimality_gap_pct(total_cost, bound_stats['bound']):.2f}"
+        summary_dict.update({
+            'Toplam Mesafe (km)': f"{route_distance_meters / 1000.0:.2f}",
+            'Kullanılan Yakıt Fiyatı (TRY/L)': f"{fuel_price_used:.4f}",
+            'Araç Tüketimi (Litre/100km)': f"{consumption_used:.1f}", # Birimi netleştirdik
+            'Konum Sayısı': num_locations,
+            'Başlangıç/Bitiş Konum İndeksi': start_node, # Daha açıklayıcı
+            'Ziyaret Edilen Konum Sayısı (Depo Hariç)': len(route_indices) - 2 if len(route_indices) > 1 else 0 # Depo başlangıç ve bitişte var
+        })
+        if solver_stats:
+            summary_dict['Maliyet Hesaplama Modu'] = COST_MODE_LABELS.get(solver_stats.get('cost_mode'), solver_stats.get('cost_mode'))
+            summary_dict['Saniyede Keşfedilen Çözüm'] = f"{solver_stats.get('solutions_per_second', 0.0):.1f}"
+            summary_dict['Rota Önbelleği'] = ROUTE_CACHE_LABELS.get(solver_stats.get('route_cache'), '-')
+            if solver_stats.get('stop_reason'):
+                summary_dict['Durma Nedeni'] = STOP_REASON_LABELS.get(solver_stats['stop_reason'], solver_stats['stop_reason'])
+                summary_dict['Çözüm Süresi (sn)'] = f"{solver_stats.get('solve_seconds', 0.0):.1f}"
+            if solver_stats.get('fast_mode'):
+                summary_dict['Çözüm Yöntemi'] = "Hızlı mod (en yakın komşu + 2-opt/Or-opt)"
+            if solver_stats.get('sparse'):
+                sparse = solver_stats['sparse']
+                summary_dict['Çözüm Yöntemi'] = f"Seyrek aday grafı (k={sparse['neighbors']}, en yakın komşu + 2-opt/Or-opt)"
+                summary_dict['Aday Yol Sayısı'] = sparse['arcs']
+            if solver_stats.get('incremental'):
+                incremental = solver_stats['incremental']
+                summary_dict['Çözüm Yöntemi'] = "Artımlı güncelleme (önceki rotadan)"
+                summary_dict['Korunan / Çıkarılan / Eklenen Nokta'] = f"{incremental['kept']} / {incremental['dropped']} / {incremental['added']}"
+            if solver_stats.get('polish'):
+                summary_dict['Yerel İyileştirme Kazancı (TRY)'] = f"{solver_stats['polish']['gain_try']:.2f}"
+            if solver_stats.get('decomposition'):
+                decomposition = solver_stats['decomposition']
+                summary_dict['Çözüm Yöntemi'] = f"Önce kümele, sonra rotala ({decomposition['clusters']} küme)"
+                summary_dict['Sınır Onarımı Kazancı (TRY)'] = f"{decomposition['repair_gain_try']:.2f}"
+            if solver_stats.get('preprocessing'):
+                preprocessing = solver_stats['preprocessing']
+                summary_dict['Ön İşleme: Çözülen Konum Sayısı'] = (
+                    f"{preprocessing['num_locations']} → {preprocessing['num_reduced']} (%{_shrink_percent(preprocessing):.1f} küçüldü)"
+                )
+                summary_dict['Simetrik Matris'] = "Evet" if preprocessing['symmetric'] else "Hayır"
+                if preprocessing['repaired_pairs'] is not None:
+                    summary_dict['Onarılan Üçgen Eşitsizliği İhlali (çift)'] = preprocessing['repaired_pairs']
+            if solver_stats.get('portfolio'):
+                summary_dict['Kazanan Portföy Yapılandırması'] = solver_stats.get('portfolio_winner') or '-'
+                for worker_no, result in enumerate(solver_stats['portfolio'], start=1):
+                    objective_text = f"{result['objective_try']:.2f}" if result['objective_try'] is not None else "Çözüm yok"
+                    summary_dict[f"Portföy {worker_no}: {result['config']} (TRY)"] = objective_text
+        return summary_dict, route_df, RouteExport(route_df, summary_dict), ["Sonuçlar başarıyla işlendi."]
+
+    except Exception as e:
+         return None, None, None, [f"Hata: Sonuçlar işlenirken hata oluştu: {e}", traceback.format_exc()]
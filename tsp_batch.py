@@ -0,0 +1,255 @@
+"""
+Komut satırından (Streamlit olmadan) çok sayıda mesafe matrisini toplu çözer.
+
+Örnek (her gece cron ile tüm depoların yeniden optimizasyonu):
+    python tsp_batch.py matrisler/ --yakit motorin --tuketim 8.0 --sure 60 --isci 4 --cikti sonuclar.jsonl
+
+Yakıt fiyatları toplu iş başında bir kez alınır (kayıtlı fiyat varsa ağ beklenmez). Her örnek bittiği anda
+sonucu tek satırlık bir JSON kaydı olarak yazılır (JSONL).
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tsp_backend import (
+    TARGET_CITY_CODE, TARGET_DISTRICTS, COST_SCALING_FACTOR, COST_MODE_MATRIX, COST_MODE_CALLBACK,
+    LARGE_INSTANCE_THRESHOLD, DEFAULT_CLUSTER_SIZE,
+    get_opet_fuel_prices, read_distance_matrix, read_location_labels, run_tsp_solver, process_and_save_results,
+    SolveMonitor, read_candidate_graph, preprocess_distance_matrix, finish_preprocessed_solve,
+)
+from tsp_prices import PRICE_SOURCE_ENV, provider_from_spec
+from tsp_export import EXPORT_FORMATS
+from tsp_metrics import RunMetrics, append_metrics_log, write_prometheus_file
+
+SUPPORTED_EXTENSIONS = ('.csv', '.npy', '.npz', '.bin')
+DEFAULT_OUTPUT_FORMATS = ('csv', 'excel')
+
+
+def collect_matrix_files(patterns):
+    """Dizin, dosya ve glob desenlerinden çözülecek matris dosyalarının sıralı listesini üretir."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in sorted(os.listdir(pattern))]
+        else:
+            candidates = sorted(glob.glob(pattern, recursive=True))
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS) and path not in files:
+                files.append(path)
+    return files
+
+
+def solve_instance(matrix_path, fuel_price, consumption, time_limit, cost_mode, portfolio_size, output_dir,
+                   large_instance_threshold=LARGE_INSTANCE_THRESHOLD, cluster_size=DEFAULT_CLUSTER_SIZE,
+                   polish=True, fast_mode=False, output_formats=DEFAULT_OUTPUT_FORMATS, candidate_neighbors=0,
+                   merge_threshold=None, repair_triangle=False, target_gap_pct=0.0, use_lower_bound=True):
+    """
+    Tek bir matris dosyasını okur, çözer ve sonuç kaydını (sözlük) döndürür.
+    output_dir verilmişse rota dosyaları output_formats biçimlerinde oraya yazılır.
+    candidate_neighbors > 0 ise dosya bu kadar komşulu seyrek aday grafı olarak okunur.
+    Yoğun matrisler çözülmeden önce ön işlenir: merge_threshold (metre) verilirse
+    aynı konumdaki noktalar birleştirilir, repair_triangle ile üçgen eşitsizliği onarılır.
+    use_lower_bound açıksa alt sınır ve optimallik açığı hesaplanır; target_gap_pct > 0
+    ise rota alt sınıra bu yüzde kadar yaklaşınca arama durur.
+    """
+    start = time.perf_counter()
+    record = {'file': matrix_path, 'status': 'error'}
+    messages = []
+    run_metrics = RunMetrics('toplu', file=matrix_path)
+    try:
+        with run_metrics.stage('matrix_read'):
+            if candidate_neighbors > 0:
+                distance_matrix, matrix_msgs = read_candidate_graph(matrix_path, candidate_neighbors)
+            else:
+                distance_matrix, matrix_msgs = read_distance_matrix(matrix_path)
+        messages += matrix_msgs
+        if distance_matrix is None:
+            return record | {'messages': messages, 'elapsed_seconds': time.perf_counter() - start, 'metrics': run_metrics.record()}
+        run_metrics.fields['num_locations'] = len(distance_matrix)
+
+        preprocessed = None
+        solve_matrix = distance_matrix
+        if candidate_neighbors <= 0:
+            with run_metrics.stage('preprocessing'):
+                preprocessed, preprocess_msgs = preprocess_distance_matrix(distance_matrix, merge_threshold, repair_triangle)
+            messages += preprocess_msgs
+            if preprocessed is not None:
+                distance_matrix, solve_matrix = preprocessed.matrix, preprocessed.reduced_matrix
+                run_metrics.fields['num_solved_locations'] = preprocessed.num_reduced
+
+        monitor = SolveMonitor(cost_scaling_factor=COST_SCALING_FACTOR, target_gap_pct=target_gap_pct)
+        solver_result = run_tsp_solver(
+            solve_matrix, fuel_price, consumption, time_limit, COST_SCALING_FACTOR,
+            cost_mode, True, portfolio_size, monitor, large_instance_threshold, cluster_size,
+            polish, fast_mode, preprocessed.symmetric if preprocessed else False, use_lower_bound,
+            preprocessed.matrix if preprocessed else None
+        )
+        solution, manager, routing, solver_stats, solver_msgs = finish_preprocessed_solve(preprocessed, solver_result)
+        messages += solver_msgs
+        run_metrics.add_solver_stats(solver_stats)
+        if not solution:
+            return record | {'messages': messages, 'elapsed_seconds': time.perf_counter() - start, 'metrics': run_metrics.record()}
+
+        base_name = os.path.splitext(os.path.basename(matrix_path))[0]
+        # Etiketler rota çıktısına yazılır; böylece sonraki artımlı güncellemelerde kullanılabilir
+        if candidate_neighbors > 0:
+            location_labels, label_msgs = distance_matrix.labels, []
+        else:
+            location_labels, label_msgs = read_location_labels(matrix_path)
+        messages += label_msgs
+        with run_metrics.stage('result_processing'):
+            summary_dict, route_df, exports, process_msgs = process_and_save_results(
+                solution, manager, routing, distance_matrix, COST_SCALING_FACTOR,
+                fuel_price, consumption, base_name, solver_stats, location_labels
+            )
+        messages += process_msgs
+        if summary_dict is None:
+            return record | {'messages': messages, 'elapsed_seconds': time.perf_counter() - start, 'metrics': run_metrics.record()}
+
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            for export_format in output_formats:
+                with open(os.path.join(output_dir, exports.file_name(base_name, export_format)), 'wb') as f:
+                    f.write(exports.get(export_format))
+            run_metrics.add_stages(exports.stages)
+        run_metrics.fields['objective_try'] = float(summary_dict['Toplam Yakıt Maliyeti (TRY)'])
+        if 'Optimallik Açığı (%)' in summary_dict:
+            run_metrics.fields['optimality_gap_pct'] = float(summary_dict['Optimallik Açığı (%)'])
+
+        record.update({
+            'status': 'ok',
+            'total_cost_try': float(summary_dict['Toplam Yakıt Maliyeti (TRY)']),
+            'total_distance_km': float(summary_dict['Toplam Mesafe (km)']),
+            'lower_bound_try': float(summary_dict['Alt Sınır (TRY)']) if 'Alt Sınır (TRY)' in summary_dict else None,
+            'optimality_gap_pct': run_metrics.fields.get('optimality_gap_pct'),
+            'num_locations': summary_dict['Konum Sayısı'],
+            'route': [int(node) for node in route_df['Konum_Indeksi']],
+            'solver_stats': solver_stats,
+            'summary': summary_dict,
+        })
+    except Exception as e:
+        messages += [f"Hata: Beklenmedik hata: {e}", traceback.format_exc()]
+    record['messages'] = messages
+    record['elapsed_seconds'] = time.perf_counter() - start
+    record['metrics'] = run_metrics.record()
+    return record
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mesafe matrislerini Streamlit olmadan toplu olarak çözer ve her örnek için bir JSONL satırı yazar."
+    )
+    parser.add_argument('inputs', nargs='+', help="Matris dosyaları, dizinler veya glob desenleri (örn. 'matrisler/*.csv').")
+    parser.add_argument('--yakit', choices=['motorin', 'benzin'], default='motorin', help="Yakıt türü (varsayılan: motorin).")
+    parser.add_argument('--yakit-fiyati', type=float, default=None,
+                        help="Yakıt fiyatı (TRY/L). Verilirse fiyat kaynağı çağrılmaz (çevrimdışı çalışma).")
+    parser.add_argument('--fiyat-kaynagi', default=None,
+                        help="Fiyat kaynağı: 'opet', 'dosya:<yol>', 'url:<adres>' veya 'sabit:motorin=45,benzin=47' "
+                             f"(varsayılan: {PRICE_SOURCE_ENV} ortam değişkeni, yoksa 'opet').")
+    parser.add_argument('--tuketim', type=float, default=8.0, help="Araç tüketimi (Litre/100km, varsayılan: 8.0).")
+    parser.add_argument('--sure', type=int, default=60, help="Örnek başına çözücü süre sınırı (saniye, varsayılan: 60).")
+    parser.add_argument('--isci', type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="Aynı anda çözülecek örnek sayısı (varsayılan: CPU çekirdeği sayısının yarısı).")
+    parser.add_argument('--portfoy', type=int, default=1, help="Örnek başına paralel çözücü (portföy) sayısı (varsayılan: 1).")
+    parser.add_argument('--maliyet-modu', choices=[COST_MODE_MATRIX, COST_MODE_CALLBACK], default=COST_MODE_MATRIX,
+                        help="Maliyet hesaplama modu (varsayılan: matrix).")
+    parser.add_argument('--kume-esigi', type=int, default=LARGE_INSTANCE_THRESHOLD,
+                        help=f"Bu kadar ve daha fazla noktalı matrisler kümeleme moduyla çözülür (0: kapalı, varsayılan: {LARGE_INSTANCE_THRESHOLD}).")
+    parser.add_argument('--kume-boyutu', type=int, default=DEFAULT_CLUSTER_SIZE,
+                        help=f"Kümeleme modunda hedef küme büyüklüğü (varsayılan: {DEFAULT_CLUSTER_SIZE}).")
+    parser.add_argument('--hizli', action='store_true',
+                        help="OR-Tools yerine hızlı modu (en yakın komşu + 2-opt/Or-opt) kullan.")
+    parser.add_argument('--cilasiz', action='store_true', help="OR-Tools sonrası 2-opt/Or-opt cilalamasını kapat.")
+    parser.add_argument('--aday-komsu', type=int, default=0,
+                        help="Verilirse (>0) matris yalnızca her konumun bu kadar en yakın komşusunu içeren seyrek aday grafı olarak "
+                             "okunur ve rota bu yollar üzerinde aranır; 'kaynak,hedef,mesafe' CSV yol listeleri de okunur (0: kapalı, varsayılan).")
+    parser.add_argument('--birlestirme-esigi', type=int, default=None,
+                        help="Verilirse aralarındaki mesafe bu kadar metre veya daha az olan noktalar tek nokta olarak çözülür "
+                             "ve rota sonra tüm noktalara genişletilir (varsayılan: kapalı).")
+    parser.add_argument('--ucgen-onar', action='store_true',
+                        help="Çözümden önce üçgen eşitsizliği ihlallerini en kısa yol kapanışıyla onar.")
+    parser.add_argument('--hedef-acik', type=float, default=0.0,
+                        help="Rota yakıt maliyetinin alt sınırına bu yüzde kadar yaklaşınca arama süre sınırını beklemeden durur (0: kapalı, varsayılan).")
+    parser.add_argument('--alt-sinirsiz', action='store_true',
+                        help="Alt sınır ve optimallik açığını hesaplama (alt sınırın süresi çözüm süresinden düşülür; hızlı modda hiç hesaplanmaz).")
+    parser.add_argument('--cikti', default='-', help="JSONL çıktı dosyası ('-' ise standart çıktı, varsayılan).")
+    parser.add_argument('--cikti-dizini', default=None, help="Verilirse rota dosyaları bu dizine yazılır.")
+    parser.add_argument('--cikti-bicimleri', nargs='+', choices=list(EXPORT_FORMATS), default=list(DEFAULT_OUTPUT_FORMATS),
+                        help="--cikti-dizini'ne yazılacak rota dosyası biçimleri (varsayılan: csv excel).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    matrix_files = collect_matrix_files(args.inputs)
+    if not matrix_files:
+        print("Hata: Çözülecek matris dosyası bulunamadı.", file=sys.stderr)
+        return 2
+
+    # Yakıt fiyatı toplu iş başına bir kez alınır
+    fuel_price = args.yakit_fiyati
+    if fuel_price is None:
+        provider = None
+        if args.fiyat_kaynagi:
+            try:
+                provider = provider_from_spec(args.fiyat_kaynagi)
+            except ValueError as e:
+                print(f"Hata: {e}", file=sys.stderr)
+                return 2
+        fuel_prices, price_msgs = get_opet_fuel_prices(TARGET_CITY_CODE, TARGET_DISTRICTS, provider)
+        for msg in price_msgs:
+            print(msg, file=sys.stderr)
+        fuel_price = fuel_prices.get(args.yakit) if fuel_prices else None
+        if fuel_price is None:
+            print(f"Hata: '{args.yakit}' için yakıt fiyatı alınamadı. --yakit-fiyati ile elle verebilirsiniz.", file=sys.stderr)
+            return 2
+    print(f"{len(matrix_files)} matris çözülecek (yakıt fiyatı: {fuel_price:.4f} TRY/L, {args.isci} işçi).", file=sys.stderr)
+
+    output = sys.stdout if args.cikti == '-' else open(args.cikti, 'a', encoding='utf-8')
+    failed = 0
+    try:
+        # Streamlit olmadan da iş parçacığı güvenliği için 'spawn' kullanılır
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max(1, args.isci), mp_context=mp_context) as executor:
+            futures = {
+                executor.submit(
+                    solve_instance, path, fuel_price, args.tuketim, args.sure,
+                    args.maliyet_modu, args.portfoy, args.cikti_dizini, args.kume_esigi, args.kume_boyutu,
+                    not args.cilasiz, args.hizli, tuple(args.cikti_bicimleri), args.aday_komsu,
+                    args.birlestirme_esigi, args.ucgen_onar, args.hedef_acik, not args.alt_sinirsiz
+                ): path
+                for path in matrix_files
+            }
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {'file': futures[future], 'status': 'error', 'messages': [f"Hata: İşçi süreci başarısız: {e}"]}
+                if record['status'] != 'ok':
+                    failed += 1
+                # Her örnek biter bitmez bir satır yazılır
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                if record.get('metrics'):
+                    # Ölçüm günlüğü ve Prometheus dosyası yalnızca ana süreçten yazılır
+                    try:
+                        append_metrics_log(record['metrics'])
+                        write_prometheus_file(record['metrics'])
+                    except OSError as e:
+                        print(f"Uyarı: Ölçümler yazılamadı: {e}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"Tamamlandı: {len(matrix_files) - failed} başarılı, {failed} başarısız.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
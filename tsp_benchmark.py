@@ -0,0 +1,327 @@
+"""
+Çözücü hattının tekrarlanabilir performans ölçümü (benchmark).
+
+Ölçülen örnekler: paketle gelen Talas 240x240 matrisi ile 50-5.000 noktalı
+sentetik Öklid (simetrik) ve yol benzeri (asimetrik) matrisler. Her örnek
+için aşama bazında (CSV ayrıştırma, model kurma, çözüm, sonuç işleme, Excel
+çıktısı) süre ve tepe bellek, zamana göre amaç değeri eğrisi ve saniyede
+keşfedilen çözüm sayısı kaydedilir. Alt sınır (Held-Karp 1-ağaç) ayrı bir
+aşama olarak ölçülür ve amaç değerinin optimallik açığı kaydedilir.
+
+Aşama tepe belleği tsp_metrics.measure_stage ile ölçülür: Linux'ta yüksek su
+işareti her aşamadan önce sıfırlanır, böylece değer sürecin ömür boyu tepe
+değeri değil aşamanın kendi tepesidir (rss_peak_scope: 'stage').
+
+Kullanım:
+    python tsp_benchmark.py calistir --boyutlar 50 200 1000 --sure 10 --cikti sonuc.json
+    python tsp_benchmark.py karsilastir eski.json yeni.json --sure-esigi 15
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import ortools
+
+from tsp_backend import (
+    COST_SCALING_FACTOR, COST_MODE_MATRIX, COST_MODE_CALLBACK, DEFAULT_SOLVER_CONFIG, SolveMonitor,
+    clear_matrix_cache, read_distance_matrix, process_and_save_results, compute_lower_bound, optimality_gap_pct,
+    _create_routing_model, _create_search_parameters, _attach_search_hooks,
+)
+from tsp_metrics import measure_stage
+
+BUNDLED_MATRIX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Talas_Tekstil_Konteyner_240x240_Mesafe_Matrisi.csv")
+DEFAULT_SIZES = [50, 100, 200, 500, 1000, 2000, 5000]
+BENCHMARK_FUEL_PRICE = 45.0 # TRY/L, sonuçların çalıştırmalar arasında karşılaştırılabilmesi için sabit
+BENCHMARK_CONSUMPTION = 8.0 # Litre/100km
+AREA_SIZE_METERS = 20000 # Sentetik noktaların dağıldığı kare alanın kenarı
+MATRIX_CHUNK_ROWS = 256 # Sentetik matrisler bellek tepe değerini sınırlamak için satır blokları halinde üretilir
+STAGES = ['csv_parse', 'model_build', 'solve', 'result_processing', 'excel_export']
+
+
+# --- Sentetik Matrisler ---
+
+def generate_euclidean_matrix(num_points, seed):
+    """Kare bir alana rastgele dağılmış noktalar arasında simetrik Öklid mesafe matrisi (metre) üretir."""
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, AREA_SIZE_METERS, size=(num_points, 2))
+    matrix = np.empty((num_points, num_points), dtype=np.int32)
+    for start in range(0, num_points, MATRIX_CHUNK_ROWS):
+        stop = min(start + MATRIX_CHUNK_ROWS, num_points)
+        diff = points[start:stop, None, :] - points[None, :, :]
+        matrix[start:stop] = np.rint(np.hypot(diff[..., 0], diff[..., 1]))
+    return matrix
+
+def generate_road_like_matrix(num_points, seed):
+    """
+    Yol ağına benzeyen asimetrik mesafe matrisi üretir: Öklid ve Manhattan
+    mesafelerinin karışımı, çift başına dolambaç katsayısı ve tek yönlü
+    yollar için yöne bağlı gürültü içerir.
+    """
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, AREA_SIZE_METERS, size=(num_points, 2))
+    matrix = np.empty((num_points, num_points), dtype=np.int32)
+    for start in range(0, num_points, MATRIX_CHUNK_ROWS):
+        stop = min(start + MATRIX_CHUNK_ROWS, num_points)
+        diff = np.abs(points[start:stop, None, :] - points[None, :, :])
+        base = 0.6 * np.hypot(diff[..., 0], diff[..., 1]) + 0.4 * (diff[..., 0] + diff[..., 1])
+        detour = rng.uniform(1.05, 1.35, size=base.shape)
+        one_way = rng.uniform(1.0, 1.2, size=base.shape)
+        matrix[start:stop] = np.rint(base * detour * one_way)
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+def _write_matrix_csv(matrix, path):
+    """Matrisi arayüzün beklediği etiketli CSV biçiminde yazar."""
+    labels = [f"Point {i}" for i in range(len(matrix))]
+    pd.DataFrame(matrix, index=labels, columns=labels).to_csv(path)
+
+
+# --- Ölçüm ---
+
+def _measure(stages, name, func, trace_memory=True):
+    """
+    func'u çalıştırıp süresini ve tepe belleğini stages[name] içine yazar.
+    RSS tepe değeri measure_stage ile aşamaya özgü ölçülür. tracemalloc
+    Python tarafındaki (NumPy dahil) ayırmaları izler; Python geri
+    çağrılarını yavaşlattığı için çözüm aşamasında kapatılır.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with measure_stage(stages, name):
+            value = func()
+    finally:
+        python_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    stages[name]['python_peak_mb'] = python_peak / 1e6 if python_peak is not None else None
+    return value
+
+def run_instance(name, kind, matrix_path, time_limit, cost_mode):
+    """Tek bir örnek için tüm hattı çalıştırır ve ölçüm kaydını döndürür."""
+    stages = {}
+    record = {'instance': name, 'kind': kind, 'cost_mode': cost_mode, 'time_limit': time_limit, 'stages': stages}
+
+    clear_matrix_cache() # Ayrıştırma her çalıştırmada gerçekten ölçülsün
+    distance_matrix, matrix_msgs = _measure(stages, 'csv_parse', lambda: read_distance_matrix(matrix_path))
+    if distance_matrix is None:
+        record['error'] = " ".join(matrix_msgs)
+        return record
+    record['num_locations'] = len(distance_matrix)
+
+    def build_model():
+        manager, routing = _create_routing_model(distance_matrix, BENCHMARK_FUEL_PRICE, BENCHMARK_CONSUMPTION, COST_SCALING_FACTOR, cost_mode)
+        search_parameters = _create_search_parameters(DEFAULT_SOLVER_CONFIG, time_limit)
+        routing.CloseModelWithParameters(search_parameters)
+        return manager, routing, search_parameters
+    manager, routing, search_parameters = _measure(stages, 'model_build', build_model)
+
+    monitor = SolveMonitor(cost_scaling_factor=COST_SCALING_FACTOR)
+    _attach_search_hooks(routing, monitor.record, monitor.should_stop)
+    monitor.start()
+    solution = _measure(stages, 'solve', lambda: routing.SolveWithParameters(search_parameters), trace_memory=False)
+    if not solution:
+        record['error'] = f"Çözüm bulunamadı (durum: {routing.status()})"
+        return record
+
+    bound_stats, _ = _measure(stages, 'lower_bound', lambda: compute_lower_bound(
+        distance_matrix, BENCHMARK_FUEL_PRICE, BENCHMARK_CONSUMPTION, COST_SCALING_FACTOR
+    ), trace_memory=False)
+
+    solve_seconds = stages['solve']['seconds']
+    num_solutions = routing.solver().Solutions()
+    solver_stats = {
+        'cost_mode': cost_mode,
+        'solve_seconds': solve_seconds,
+        'solutions': num_solutions,
+        'solutions_per_second': num_solutions / solve_seconds if solve_seconds > 0 else 0.0,
+    }
+    summary_dict, route_df, exports, process_msgs = _measure(stages, 'result_processing', lambda: process_and_save_results(
+        solution, manager, routing, distance_matrix, COST_SCALING_FACTOR,
+        BENCHMARK_FUEL_PRICE, BENCHMARK_CONSUMPTION, name, solver_stats
+    ))
+    if summary_dict is None:
+        record['error'] = " ".join(process_msgs)
+        return record
+    _measure(stages, 'excel_export', exports.excel)
+
+    record.update({
+        'objective_try': solution.ObjectiveValue() / COST_SCALING_FACTOR,
+        'total_distance_km': float(summary_dict['Toplam Mesafe (km)']),
+        'solutions': num_solutions,
+        'branches': routing.solver().Branches(),
+        'solutions_per_second': solver_stats['solutions_per_second'],
+        'objective_curve': monitor.history(),
+        'lower_bound_try': bound_stats['bound_try'] if bound_stats else None,
+        'optimality_gap_pct': optimality_gap_pct(solution.ObjectiveValue(), bound_stats['bound']) if bound_stats else None,
+    })
+    return record
+
+def _environment_info():
+    """Sonuçların yorumlanması için ortam bilgisi."""
+    try:
+        git_commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        git_commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': git_commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'ortools': ortools.__version__,
+    }
+
+def run_benchmark(sizes, kinds, time_limit, seed, cost_mode, include_bundled=True, log=sys.stderr):
+    """Seçilen örneklerin tamamını çalıştırır ve rapor sözlüğünü döndürür."""
+    report = {'environment': _environment_info(), 'settings': {
+        'sizes': sizes, 'kinds': kinds, 'time_limit': time_limit, 'seed': seed, 'cost_mode': cost_mode,
+    }, 'results': []}
+    generators = {'euclidean': generate_euclidean_matrix, 'road': generate_road_like_matrix}
+
+    with tempfile.TemporaryDirectory(prefix="tsp_benchmark_") as work_dir:
+        instances = []
+        if include_bundled and os.path.exists(BUNDLED_MATRIX):
+            instances.append(('talas_240', 'bundled', BUNDLED_MATRIX))
+        for kind in kinds:
+            for size in sizes:
+                instances.append((f"{kind}_{size}", kind, None))
+
+        # Isınma: tembel içe aktarmalar (openpyxl vb.) ilk örneğin ölçümlerini şişirmesin
+        warmup_path = os.path.join(work_dir, "isinma.csv")
+        _write_matrix_csv(generate_euclidean_matrix(10, seed), warmup_path)
+        run_instance('isinma', 'euclidean', warmup_path, 1, cost_mode)
+
+        for name, kind, matrix_path in instances:
+            if matrix_path is None:
+                size = int(name.rsplit('_', 1)[1])
+                matrix_path = os.path.join(work_dir, f"{name}.csv")
+                # Matris üretimi ve CSV yazımı hazırlıktır, ölçüme dahil değildir
+                _write_matrix_csv(generators[kind](size, seed), matrix_path)
+            print(f"[{name}] çalıştırılıyor...", file=log)
+            record = run_instance(name, kind, matrix_path, time_limit, cost_mode)
+            report['results'].append(record)
+            if 'error' in record:
+                print(f"[{name}] Hata: {record['error']}", file=log)
+            else:
+                stage_text = ", ".join(f"{stage} {record['stages'][stage]['seconds']:.2f}s" for stage in STAGES)
+                gap_text = f", açık %{record['optimality_gap_pct']:.2f}" if record.get('optimality_gap_pct') is not None else ""
+                print(f"[{name}] amaç {record['objective_try']:.2f} TRY{gap_text}, {record['solutions_per_second']:.1f} çözüm/sn | {stage_text}", file=log)
+    return report
+
+
+# --- Karşılaştırma ---
+
+def compare_reports(baseline, current, time_threshold_pct=10.0, quality_threshold_pct=1.0, min_seconds=0.05,
+                    memory_threshold_pct=10.0, min_megabytes=5.0):
+    """
+    İki raporu örnek adına göre eşleştirip gerilemeleri listeler: aşama süresinde
+    eşikten fazla artış (ve en az min_seconds), aşama tepe belleğinde
+    memory_threshold_pct'den fazla artış (ve en az min_megabytes), saniyede
+    çözüm sayısında eşikten fazla düşüş ve amaç değerinde quality_threshold_pct'den
+    fazla kötüleşme. Tepe bellek yalnızca iki raporda da aşamaya özgü
+    ölçülmüşse karşılaştırılır; eski raporlardaki süreç tepe değerleri atlanır.
+    """
+    baseline_by_name = {record['instance']: record for record in baseline['results']}
+    rows = []
+    for record in current['results']:
+        old = baseline_by_name.get(record['instance'])
+        if old is None or 'error' in old or 'error' in record:
+            continue
+        for stage in STAGES:
+            old_seconds = old['stages'].get(stage, {}).get('seconds')
+            new_seconds = record['stages'].get(stage, {}).get('seconds')
+            if old_seconds is None or new_seconds is None:
+                continue
+            change_pct = (new_seconds - old_seconds) / old_seconds * 100.0 if old_seconds > 0 else 0.0
+            regression = change_pct > time_threshold_pct and new_seconds - old_seconds > min_seconds
+            rows.append((record['instance'], f"{stage} (sn)", old_seconds, new_seconds, change_pct, regression))
+
+        for stage in STAGES:
+            old_stage = old['stages'].get(stage, {})
+            new_stage = record['stages'].get(stage, {})
+            if old_stage.get('rss_peak_scope') != 'stage' or new_stage.get('rss_peak_scope') != 'stage':
+                continue
+            old_mb, new_mb = old_stage['rss_peak_mb'], new_stage['rss_peak_mb']
+            change_pct = (new_mb - old_mb) / old_mb * 100.0 if old_mb > 0 else 0.0
+            regression = change_pct > memory_threshold_pct and new_mb - old_mb > min_megabytes
+            rows.append((record['instance'], f"{stage} (MB)", old_mb, new_mb, change_pct, regression))
+
+        old_rate, new_rate = old['solutions_per_second'], record['solutions_per_second']
+        change_pct = (new_rate - old_rate) / old_rate * 100.0 if old_rate > 0 else 0.0
+        rows.append((record['instance'], "çözüm/sn", old_rate, new_rate, change_pct, change_pct < -time_threshold_pct))
+
+        old_objective, new_objective = old['objective_try'], record['objective_try']
+        change_pct = (new_objective - old_objective) / old_objective * 100.0 if old_objective > 0 else 0.0
+        rows.append((record['instance'], "amaç (TRY)", old_objective, new_objective, change_pct, change_pct > quality_threshold_pct))
+    return rows
+
+def _load_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TSP çözücü hattı için performans ölçümü ve karşılaştırması.")
+    subparsers = parser.add_subparsers(dest='komut', required=True)
+
+    run_parser = subparsers.add_parser('calistir', help="Ölçümleri çalıştırır ve JSON rapor yazar.")
+    run_parser.add_argument('--boyutlar', type=int, nargs='+', default=DEFAULT_SIZES,
+                            help=f"Sentetik matris boyutları (varsayılan: {' '.join(map(str, DEFAULT_SIZES))}).")
+    run_parser.add_argument('--turler', nargs='+', choices=['euclidean', 'road'], default=['euclidean', 'road'],
+                            help="Sentetik matris türleri (varsayılan: ikisi de).")
+    run_parser.add_argument('--sure', type=int, default=10, help="Örnek başına çözücü süre sınırı (saniye, varsayılan: 10).")
+    run_parser.add_argument('--tohum', type=int, default=42, help="Sentetik matrisler için rastgelelik tohumu (varsayılan: 42).")
+    run_parser.add_argument('--maliyet-modu', choices=[COST_MODE_MATRIX, COST_MODE_CALLBACK], default=COST_MODE_MATRIX)
+    run_parser.add_argument('--talas-haric', action='store_true', help="Paketle gelen Talas matrisini ölçüme katma.")
+    run_parser.add_argument('--cikti', default='benchmark_sonuclari.json', help="JSON rapor dosyası.")
+
+    compare_parser = subparsers.add_parser('karsilastir', help="İki raporu karşılaştırır; gerileme varsa 1 ile çıkar.")
+    compare_parser.add_argument('onceki', help="Referans (önceki) rapor.")
+    compare_parser.add_argument('yeni', help="Yeni rapor.")
+    compare_parser.add_argument('--sure-esigi', type=float, default=10.0, help="Süre/verim gerileme eşiği (yüzde, varsayılan: 10).")
+    compare_parser.add_argument('--kalite-esigi', type=float, default=1.0, help="Amaç değeri kötüleşme eşiği (yüzde, varsayılan: 1).")
+    compare_parser.add_argument('--min-sure', type=float, default=0.05,
+                                help="Bundan küçük mutlak süre artışları gürültü sayılır (saniye, varsayılan: 0.05).")
+    compare_parser.add_argument('--bellek-esigi', type=float, default=10.0, help="Aşama tepe belleği gerileme eşiği (yüzde, varsayılan: 10).")
+    compare_parser.add_argument('--min-bellek', type=float, default=5.0,
+                                help="Bundan küçük mutlak bellek artışları gürültü sayılır (MB, varsayılan: 5).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.komut == 'calistir':
+        report = run_benchmark(args.boyutlar, args.turler, args.sure, args.tohum, args.maliyet_modu, not args.talas_haric)
+        with open(args.cikti, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Rapor yazıldı: {args.cikti}", file=sys.stderr)
+        return 0
+
+    rows = compare_reports(
+        _load_report(args.onceki), _load_report(args.yeni), args.sure_esigi, args.kalite_esigi, args.min_sure,
+        args.bellek_esigi, args.min_bellek
+    )
+    regressions = [row for row in rows if row[5]]
+    for instance, metric, old_value, new_value, change_pct, regression in rows:
+        flag = "GERİLEME" if regression else ""
+        print(f"{instance:<16} {metric:<24} {old_value:>12.3f} -> {new_value:>12.3f} ({change_pct:+7.1f}%) {flag}")
+    print(f"\n{len(regressions)} gerileme bulundu.", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Yakıt maliyeti matrisi için hızlı alt sınır: çözülen rotanın optimumdan en
+fazla ne kadar uzak olduğunu (optimallik açığı) göstermek ve hedef açığa
+ulaşıldığında aramayı erken bitirmek için kullanılır.
+
+* Held-Karp 1-ağaç sınırı: depo dışındaki noktaların en küçük kapsayan ağacı
+  ve depodan en ucuz iki yol. Her tur bir 1-ağaçtır, bu yüzden 1-ağacın
+  maliyeti tur maliyetinin alt sınırıdır. Düğüm cezaları (pi) alt gradyan
+  yöntemiyle ayarlanarak sınır yükseltilir (derecesi 2'den büyük düğümler
+  pahalılaşır, yaprak düğümler ucuzlar).
+* Asimetrik matrislerde 1-ağaç min(d(i,j), d(j,i)) matrisi üzerinde kurulur;
+  ek olarak atama gevşetmesinin satır/sütun indirgeme sınırı hesaplanır ve
+  büyük olan kullanılır.
+
+Modül OR-Tools'a ve Streamlit'e bağlı değildir.
+"""
+import math
+import time
+
+import numpy as np
+
+LOWER_BOUND_MAX_NODES = 5000 # Daha büyük matrislerde alt sınır hesaplanmaz (1-ağaç adımı O(n^2))
+HELD_KARP_MAX_ITERATIONS = 1000 # Alt gradyan yinelemesi üst sınırı
+HELD_KARP_INITIAL_STEP = 2.0 # Adım katsayısının (lambda) başlangıç değeri
+HELD_KARP_MIN_STEP = 1e-3 # Adım katsayısı bunun altına düşünce durulur
+HELD_KARP_PATIENCE = 30 # Sınır bu kadar yinelemede iyileşmezse adım katsayısı yarıya iner
+
+
+def reduction_bound(cost_matrix):
+    """
+    Atama gevşetmesi için satır/sütun indirgeme sınırı: her satırın en küçük
+    elemanı çıkarıldıktan sonra her sütunun en küçük elemanı. Her konumdan bir
+    kez çıkılıp bir kez girildiği için tur maliyeti bu toplamdan küçük olamaz.
+    """
+    costs = np.array(cost_matrix, dtype=np.float64)
+    np.fill_diagonal(costs, np.inf)
+    row_minima = costs.min(axis=1)
+    costs -= row_minima[:, None]
+    column_minima = costs.min(axis=0)
+    return float(row_minima.sum() + column_minima.sum())
+
+def _one_tree(costs, penalties):
+    """
+    Cezalı maliyetlerle (c(i,j) + pi(i) + pi(j)) minimum 1-ağaç: 1..n-1
+    düğümlerinin Prim ağacı ve depodan (0) en ucuz iki yol. Satırlar yerinde
+    hesaplanır, n x n ek dizi ayrılmaz. (sınır değeri, düğüm dereceleri) döndürür.
+    """
+    num_nodes = len(costs)
+    # Ağaca katılan düğümlerin cezası sonsuz yapılır; böylece satır güncellemesi maske gerektirmez
+    blocked = penalties.copy()
+    blocked[:2] = np.inf # Depo ağaca katılmaz; ağaç 1. düğümden büyür
+    parent = np.ones(num_nodes, dtype=np.int64)
+    best = costs[1] + blocked
+    best += penalties[1]
+    row = np.empty(num_nodes)
+    closer = np.empty(num_nodes, dtype=bool)
+    total = 0.0
+    for _ in range(num_nodes - 2):
+        node = int(np.argmin(best))
+        total += best[node]
+        blocked[node] = np.inf
+        best[node] = np.inf
+        np.add(costs[node], blocked, out=row)
+        row += penalties[node]
+        np.less(row, best, out=closer)
+        np.putmask(parent, closer, node)
+        np.minimum(best, row, out=best)
+
+    degrees = np.bincount(parent[2:], minlength=num_nodes)
+    degrees[2:] += 1
+    depot_row = costs[0, 1:] + penalties[0] + penalties[1:]
+    cheapest = np.argpartition(depot_row, 1)[:2]
+    total += depot_row[cheapest].sum()
+    degrees[0] = 2
+    degrees[cheapest + 1] += 1
+    return total - 2.0 * penalties.sum(), degrees
+
+def _nearest_neighbor_cost(costs):
+    """Alt gradyan adımı için üst sınır: en yakın komşu turunun maliyeti."""
+    num_nodes = len(costs)
+    visited = np.zeros(num_nodes, dtype=bool)
+    visited[0] = True
+    current = 0
+    total = 0.0
+    for _ in range(num_nodes - 1):
+        row = np.where(visited, np.inf, costs[current])
+        following = int(np.argmin(row))
+        total += row[following]
+        visited[following] = True
+        current = following
+    return total + costs[current, 0]
+
+def held_karp_bound(cost_matrix, upper_bound=None, time_limit=None, max_iterations=HELD_KARP_MAX_ITERATIONS, stop_requested=None):
+    """
+    Held-Karp 1-ağaç sınırını alt gradyan yöntemiyle hesaplar. upper_bound
+    (bilinen bir turun maliyeti) verilmezse en yakın komşu turu kullanılır;
+    yalnızca adım büyüklüğünü belirler, sınırın geçerliliğini etkilemez.
+    (sınır, istatistikler) döndürür; sınır simetrik kapanış (min(d(i,j), d(j,i)))
+    üzerinden hesaplandığı için asimetrik matrislerde de geçerlidir.
+    """
+    start_time = time.perf_counter()
+    costs = np.array(cost_matrix, dtype=np.float64)
+    symmetric = bool(np.array_equal(costs, costs.T))
+    if not symmetric:
+        np.minimum(costs, costs.T, out=costs)
+    num_nodes = len(costs)
+    stats = {'iterations': 0, 'tour_found': False, 'symmetric': symmetric}
+    if num_nodes <= 2:
+        stats['seconds'] = time.perf_counter() - start_time
+        stats['tour_found'] = True
+        return float(costs[0, -1] + costs[-1, 0]) if num_nodes == 2 else 0.0, stats
+
+    if upper_bound is None:
+        upper_bound = _nearest_neighbor_cost(costs)
+    penalties = np.zeros(num_nodes)
+    best_bound = -np.inf
+    step = HELD_KARP_INITIAL_STEP
+    since_improvement = 0
+    for iteration in range(1, max_iterations + 1):
+        bound, degrees = _one_tree(costs, penalties)
+        stats['iterations'] = iteration
+        if bound > best_bound + 1e-9:
+            best_bound = bound
+            since_improvement = 0
+        else:
+            since_improvement += 1
+        subgradient = degrees - 2
+        if not subgradient.any():
+            stats['tour_found'] = True # 1-ağaç bir tur: sınır bu tur için kesin
+            break
+        if best_bound >= upper_bound:
+            break
+        if since_improvement >= HELD_KARP_PATIENCE:
+            step /= 2.0
+            since_improvement = 0
+            if step < HELD_KARP_MIN_STEP:
+                break
+        if time_limit is not None and time.perf_counter() - start_time >= time_limit:
+            break
+        if stop_requested is not None and stop_requested():
+            break
+        penalties += step * (upper_bound - bound) / float((subgradient * subgradient).sum()) * subgradient
+    stats['seconds'] = time.perf_counter() - start_time
+    return best_bound, stats
+
+def lower_bound(cost_matrix, upper_bound=None, time_limit=None, stop_requested=None):
+    """
+    Tamsayı maliyet matrisi için en iyi alt sınır: Held-Karp 1-ağaç ve (asimetrik
+    matrislerde) satır/sütun indirgeme sınırından büyük olanı. Maliyetler
+    tamsayı olduğundan sınır yukarı yuvarlanır. (sınır, istatistikler) döndürür.
+    """
+    bound, stats = held_karp_bound(cost_matrix, upper_bound, time_limit, stop_requested=stop_requested)
+    stats['method'] = 'held_karp'
+    if not stats['symmetric']:
+        assignment = reduction_bound(cost_matrix)
+        if assignment > bound:
+            bound = assignment
+            stats['method'] = 'assignment'
+    # Kayan nokta toplamındaki küçük hatalar sınırı bir birim yukarı taşımasın
+    stats['bound'] = int(math.ceil(bound - 1e-9 * max(1.0, abs(bound))))
+    return stats['bound'], stats
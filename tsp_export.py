@@ -0,0 +1,149 @@
+"""
+Rota sonuçlarının dışa aktarımı (CSV, Excel, Parquet, JSON).
+
+Dosyalar çözüm bittiğinde değil, yalnızca istendiğinde (ör. indirme düğmesine
+basıldığında) üretilir ve aynı çözüm için bir kez üretilip saklanır
+(RouteExport). Excel, openpyxl'in yalnızca-yazma (write_only) kipiyle satır
+satır yazılır; rota uzunluğundan bağımsız, sabit bellekle çalışır.
+"""
+import importlib.util
+import json
+import os
+import threading
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+
+from tsp_metrics import measure_stage
+
+ROUTE_SHEET_NAME = 'Rota Detayı'
+SUMMARY_SHEET_NAME = 'Özet Bilgiler'
+SUMMARY_COLUMNS = ['Ölçüt', 'Değer']
+PARQUET_SUMMARY_KEY = b'tsp_ozet' # Parquet şema üst verisinde özet bilgilerin anahtarı
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+# Biçim adı -> (dosya uzantısı, MIME türü)
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'json': ('json', 'application/json'),
+}
+
+
+def export_route_csv(route_df):
+    """Rota tablosunu CSV dosya içeriğine (bayt) çevirir."""
+    csv_buffer = BytesIO()
+    route_df.to_csv(csv_buffer, index=True, encoding='utf-8')
+    return csv_buffer.getvalue()
+
+def _dataframe_rows(df, index=True):
+    """DataFrame satırlarını Python değerleri olarak tek tek üretir (tüm tablo kopyalanmaz)."""
+    for row in df.itertuples(index=index, name=None):
+        yield [value.item() if hasattr(value, 'item') else value for value in row]
+
+def export_route_excel(route_df, summary_dict):
+    """
+    Rota tablosunu ve özet bilgileri iki sayfalı Excel dosya içeriğine (bayt)
+    çevirir. Sayfa düzeni pandas.to_excel çıktısıyla aynıdır (önceki rota
+    dosyaları okunmaya devam eder), ancak satırlar yalnızca-yazma kipinde akıtılır.
+    """
+    workbook = Workbook(write_only=True)
+    route_sheet = workbook.create_sheet(ROUTE_SHEET_NAME)
+    route_sheet.append([route_df.index.name or ''] + [str(column) for column in route_df.columns])
+    for row in _dataframe_rows(route_df):
+        route_sheet.append(row)
+
+    summary_sheet = workbook.create_sheet(SUMMARY_SHEET_NAME)
+    summary_sheet.append(SUMMARY_COLUMNS)
+    for key, value in summary_dict.items():
+        summary_sheet.append([key, value.item() if hasattr(value, 'item') else value])
+
+    excel_buffer = BytesIO()
+    workbook.save(excel_buffer)
+    return excel_buffer.getvalue()
+
+def export_route_parquet(route_df, summary_dict):
+    """Rota tablosunu Parquet içeriğine çevirir; özet bilgiler şema üst verisine JSON olarak yazılır."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(route_df, preserve_index=True)
+    metadata = dict(table.schema.metadata or {})
+    metadata[PARQUET_SUMMARY_KEY] = json.dumps(summary_dict, ensure_ascii=False, default=str).encode('utf-8')
+    parquet_buffer = BytesIO()
+    pq.write_table(table.replace_schema_metadata(metadata), parquet_buffer, compression='zstd')
+    return parquet_buffer.getvalue()
+
+def export_route_json(route_df, summary_dict):
+    """Özet ve rota tablosunu sütun bazlı, boşluksuz (kompakt) JSON içeriğine çevirir."""
+    route_table = route_df.reset_index()
+    content = {
+        'ozet': summary_dict,
+        'rota': {column: route_table[column].tolist() for column in route_table.columns},
+    }
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+def read_route_table(stream, file_name):
+    """Dışa aktarılmış rota dosyasının (CSV, Excel, Parquet veya JSON) rota tablosunu okur."""
+    lower_name = file_name.lower()
+    if lower_name.endswith('.xlsx'):
+        return pd.read_excel(stream, sheet_name=ROUTE_SHEET_NAME, dtype={'Konum_Etiketi': str})
+    if lower_name.endswith('.parquet'):
+        return pd.read_parquet(stream).reset_index()
+    if lower_name.endswith('.json'):
+        if isinstance(stream, (str, os.PathLike)):
+            with open(stream, 'rb') as f:
+                return pd.DataFrame(json.load(f)['rota'])
+        return pd.DataFrame(json.load(stream)['rota'])
+    return pd.read_csv(stream, dtype={'Konum_Etiketi': str})
+
+
+class RouteExport:
+    """
+    Bir çözümün dışa aktarım dosyalarını tembel (lazy) üretir ve saklar.
+    csv(), excel(), parquet() ve json() argümansızdır; st.download_button'a
+    doğrudan 'data' olarak verilebilir (yalnızca tıklanınca, ayrı bir iş
+    parçacığında çalışır). Aynı biçim ikinci kez istendiğinde saklanan içerik döner.
+    Her biçimin üretim süresi ve tepe belleği stages içinde ('excel_export' gibi) tutulur.
+    """
+
+    def __init__(self, route_df, summary_dict):
+        self.route_df = route_df
+        self.summary_dict = summary_dict
+        self.stages = {}
+        self._contents = {}
+        self._lock = threading.Lock()
+
+    def _get(self, export_format, builder):
+        with self._lock: # İki indirme aynı anda istenirse dosya bir kez üretilir
+            if export_format not in self._contents:
+                with measure_stage(self.stages, f"{export_format}_export"):
+                    self._contents[export_format] = builder()
+            return self._contents[export_format]
+
+    def csv(self):
+        return self._get('csv', lambda: export_route_csv(self.route_df))
+
+    def excel(self):
+        return self._get('excel', lambda: export_route_excel(self.route_df, self.summary_dict))
+
+    def parquet(self):
+        return self._get('parquet', lambda: export_route_parquet(self.route_df, self.summary_dict))
+
+    def json(self):
+        return self._get('json', lambda: export_route_json(self.route_df, self.summary_dict))
+
+    def get(self, export_format):
+        """Biçim adına ('csv', 'excel', 'parquet', 'json') göre içeriği döndürür."""
+        return getattr(self, export_format)()
+
+    @staticmethod
+    def file_name(base_name, export_format):
+        """İndirilecek dosyanın adı (ör. 'TSP_Rota_Sonucu_rota_maliyet.xlsx')."""
+        return f"{base_name}_rota_maliyet.{EXPORT_FORMATS[export_format][0]}"
+
+    @staticmethod
+    def mime(export_format):
+        return EXPORT_FORMATS[export_format][1]
@@ -0,0 +1,310 @@
+"""
+Tamsayı maliyet (veya mesafe) matrisi üzerinde NumPy tabanlı yerel arama.
+
+* 2-opt: komşu listeleriyle sınırlanmış kenar değişimi; asimetrik matrislerde
+  ters çevrilen bölümün maliyeti önek toplamlarıyla sabit sürede hesaplanır.
+* Or-opt: 1-3 noktalık bölümlerin (gerekirse ters çevrilerek) başka bir
+  kenarın arasına taşınması.
+* Bakma bitleri (don't-look bits): yalnızca çevresi değişen noktalar yeniden
+  denenir.
+
+Her noktanın aday hamleleri tek seferde vektörel değerlendirilir. Modül
+OR-Tools'a bağlı değildir; hem tek başına "hızlı mod" olarak hem de
+OR-Tools'un bulduğu rotayı cilalamak için kullanılır. Matris yerine seyrek
+aday grafı (tsp_sparse.CandidateGraph) da verilebilir; bu durumda hamleler
+yalnızca graftaki yollarla sınırlı kalır.
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+from tsp_sparse import CandidateGraph
+
+DEFAULT_NEIGHBORS = 10 # Nokta başına denenecek en yakın komşu sayısı
+MAX_SEGMENT_LENGTH = 3 # Or-opt ile taşınan en uzun bölüm
+NEIGHBOR_CHUNK_ROWS = 512 # Komşu listeleri bellek tepe değerini sınırlamak için satır blokları halinde hesaplanır
+TIME_CHECK_INTERVAL = 64 # Süre ve durdurma kontrolü bu kadar adımda bir yapılır
+
+
+def _as_cost_matrix(matrix):
+    """Matrisi NumPy dizisine çevirir; seyrek aday grafı olduğu gibi (vektörel indekslenerek) kullanılır."""
+    return matrix if isinstance(matrix, CandidateGraph) else np.asarray(matrix)
+
+def tour_length(matrix, route_indices):
+    """Rotanın (konum indeksleri listesi) toplam maliyetini vektörel hesaplar."""
+    route = np.asarray(route_indices, dtype=np.intp)
+    if len(route) < 2:
+        return 0
+    return int(_as_cost_matrix(matrix)[route[:-1], route[1:]].sum(dtype=np.int64))
+
+def build_neighbor_lists(matrix, num_neighbors=DEFAULT_NEIGHBORS, symmetric=False):
+    """
+    Her nokta için gidiş-dönüş ortalamasına göre en yakın num_neighbors noktayı
+    yakından uzağa sıralı olarak döndürür (n x k dizi). Seyrek aday grafında
+    komşular graftaki yollardır (nokta başına değişken sayıda). symmetric
+    ise dönüş yönü (matrisin sütunları) ayrıca okunmaz.
+    """
+    if isinstance(matrix, CandidateGraph):
+        return matrix.neighbor_lists()
+    matrix = np.asarray(matrix)
+    num_nodes = len(matrix)
+    k = min(num_neighbors, num_nodes - 1)
+    neighbors = np.empty((num_nodes, k), dtype=np.intp)
+    if k <= 0:
+        return neighbors
+    for start in range(0, num_nodes, NEIGHBOR_CHUNK_ROWS):
+        stop = min(start + NEIGHBOR_CHUNK_ROWS, num_nodes)
+        block = matrix[start:stop].astype(np.float64)
+        if not symmetric:
+            block += matrix[:, start:stop].T
+        block[np.arange(stop - start), np.arange(start, stop)] = np.inf # Kendisi komşu sayılmaz
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(block, nearest, axis=1), axis=1, kind='stable')
+        neighbors[start:stop] = np.take_along_axis(nearest, order, axis=1)
+    return neighbors
+
+def nearest_neighbor_tour(matrix, start=0):
+    """En yakın komşu sezgiseliyle start'tan başlayıp start'ta biten bir rota kurar."""
+    matrix = np.asarray(matrix)
+    num_nodes = len(matrix)
+    visited = np.zeros(num_nodes, dtype=bool)
+    route = [start]
+    visited[start] = True
+    current = start
+    for _ in range(num_nodes - 1):
+        row = np.where(visited, np.iinfo(np.int64).max, matrix[current].astype(np.int64))
+        current = int(np.argmin(row))
+        visited[current] = True
+        route.append(current)
+    route.append(start)
+    return route
+
+
+class _TourState:
+    """
+    Kapalı turun dizi gösterimi: sıra, konum dizini ve ileri/geri yay önek
+    toplamları. Simetrik matrislerde geri yön toplamı ileri yönle aynıdır.
+    """
+
+    def __init__(self, matrix, tour, symmetric=False):
+        self.matrix = matrix
+        self.symmetric = symmetric
+        self.tour = np.asarray(tour, dtype=np.intp)
+        self.num_nodes = len(self.tour)
+        self.position = np.empty(self.num_nodes, dtype=np.intp)
+        self._refresh()
+
+    def _refresh(self):
+        tour = self.tour
+        self.position[tour] = np.arange(self.num_nodes)
+        # forward[k]: tour[0..k] boyunca ileri yönlü maliyet; backward[k]: aynı yolun ters yönlü maliyeti
+        self.forward = np.concatenate(([0], np.cumsum(self.matrix[tour[:-1], tour[1:]], dtype=np.int64)))
+        if self.symmetric:
+            self.backward = self.forward
+        else:
+            self.backward = np.concatenate(([0], np.cumsum(self.matrix[tour[1:], tour[:-1]], dtype=np.int64)))
+
+    def best_two_opt(self, node, candidates):
+        """
+        node ile aday komşuları arasında kenar kuran 2-opt hamlelerinin en iyisini
+        döndürür: (kazanç < 0, x, y) ya da None. Hamle tour[x+1..y] bölümünü ters çevirir.
+        """
+        n = self.num_nodes
+        tour, matrix = self.tour, self.matrix
+        i = self.position[node]
+        p = self.position[candidates]
+        # node -> aday kenarı (i, p) ile, aday -> node kenarı (i-1, p-1) ile kurulur
+        xs = np.concatenate((np.full(len(p), i), np.full(len(p), (i - 1) % n)))
+        ys = np.concatenate((p, (p - 1) % n))
+        lo, hi = np.minimum(xs, ys), np.maximum(xs, ys)
+        valid = hi - lo >= 2
+        if not valid.any():
+            return None
+        lo, hi = lo[valid], hi[valid]
+        a, b = tour[lo], tour[lo + 1]
+        c, d = tour[hi], tour[(hi + 1) % n]
+        delta = (matrix[a, c] + matrix[b, d] - matrix[a, b] - matrix[c, d]).astype(np.int64)
+        delta += (self.backward[hi] - self.backward[lo + 1]) - (self.forward[hi] - self.forward[lo + 1])
+        best = int(np.argmin(delta))
+        if delta[best] >= 0:
+            return None
+        return int(delta[best]), int(lo[best]), int(hi[best])
+
+    def apply_two_opt(self, x, y):
+        """tour[x+1..y] bölümünü ters çevirir; kenarları değişen noktaları döndürür."""
+        n = self.num_nodes
+        touched = [self.tour[x], self.tour[x + 1], self.tour[y], self.tour[(y + 1) % n]]
+        self.tour[x + 1:y + 1] = self.tour[x + 1:y + 1][::-1]
+        self._refresh()
+        return touched
+
+    def best_or_opt(self, node, neighbors, max_segment_length):
+        """
+        node ile başlayan 1..max_segment_length uzunluktaki bölümü, uçlarının
+        komşularına bitişik bir kenara (düz veya ters) taşıyan en iyi hamleyi
+        döndürür: (kazanç < 0, i, uzunluk, u, ters_mi) ya da None.
+        """
+        n = self.num_nodes
+        tour, matrix, position = self.tour, self.matrix, self.position
+        i = position[node]
+        best = None
+        for length in range(1, max_segment_length + 1):
+            last = i + length - 1
+            if last >= n or length >= n - 2:
+                break
+            first_node, last_node = tour[i], tour[last]
+            prev_node, next_node = tour[(i - 1) % n], tour[(last + 1) % n]
+            removed = matrix[(prev_node, last_node, prev_node), (first_node, next_node, next_node)].astype(np.int64)
+            removal_gain = int(removed[0] + removed[1] - removed[2])
+            segment_forward = int(self.forward[last] - self.forward[i])
+            segment_backward = int(self.backward[last] - self.backward[i])
+
+            # Ekleme kenarı (u, u'nun ardılı): u bölüm uçlarının komşusu ya da komşularının öncülü
+            near = np.concatenate((neighbors[first_node], neighbors[last_node]))
+            u_positions = np.unique(np.concatenate((position[near], (position[near] - 1) % n)))
+            offset = (u_positions - i) % n
+            u_positions = u_positions[(offset >= length) & (offset != n - 1)] # Bölüm içi ve öncül hariç
+            if len(u_positions) == 0:
+                continue
+            u = tour[u_positions]
+            v = tour[(u_positions + 1) % n]
+            # Tüm ekleme kenarlarının yolları tek seferde okunur: (u,v), (u,ilk), (son,v), (u,son), (ilk,v)
+            arcs = matrix[
+                np.stack((u, u, np.full_like(u, last_node), u, np.full_like(u, first_node))),
+                np.stack((v, np.full_like(u, first_node), v, np.full_like(u, last_node), v)),
+            ].astype(np.int64)
+            base = arcs[0]
+            forward_delta = arcs[1] + arcs[2] - base
+            reverse_delta = arcs[3] + arcs[4] - base + (segment_backward - segment_forward)
+            for reverse, delta in ((False, forward_delta), (True, reverse_delta)):
+                candidate = int(np.argmin(delta))
+                gain = int(delta[candidate]) - removal_gain
+                if gain < 0 and (best is None or gain < best[0]):
+                    best = (gain, int(i), length, int(u[candidate]), reverse)
+        return best
+
+    def apply_or_opt(self, i, length, u, reverse):
+        """tour[i..i+length-1] bölümünü u'nun arkasına taşır; kenarları değişen noktaları döndürür."""
+        n = self.num_nodes
+        segment = self.tour[i:i + length].copy()
+        touched = [self.tour[(i - 1) % n], self.tour[(i + length) % n], u, segment[0], segment[-1]]
+        if reverse:
+            segment = segment[::-1]
+        rest = np.concatenate((self.tour[:i], self.tour[i + length:]))
+        insert_at = int(np.flatnonzero(rest == u)[0]) + 1
+        touched.append(rest[insert_at % len(rest)])
+        self.tour = np.concatenate((rest[:insert_at], segment, rest[insert_at:]))
+        self._refresh()
+        return touched
+
+    def route(self, depot):
+        """Turu depodan başlayıp depoda biten konum indeksleri listesine çevirir."""
+        shifted = np.roll(self.tour, -int(self.position[depot]))
+        return [int(node) for node in shifted] + [int(depot)]
+
+
+def improve_tour(matrix, route_indices, neighbors=None, time_limit=None, stop_requested=None, max_segment_length=MAX_SEGMENT_LENGTH, active_nodes=None, symmetric=False):
+    """
+    Depo başta ve sonda olacak şekilde verilen rotayı 2-opt ve Or-opt ile yerel
+    optimuma (veya süre sınırına) kadar iyileştirir. İyileştirilmiş rotayı ve
+    istatistikleri (hamle sayıları, başlangıç/son maliyet, süre) döndürür.
+    stop_requested verilirse True döndürdüğünde arama durur. active_nodes
+    verilirse arama yalnızca bu noktalardan başlar (diğerlerinin bakma biti
+    açıktır); iyileşme oldukça çevreye yayılır. symmetric (matris simetrikse)
+    ters çevrilen bölümlerin maliyeti ayrıca hesaplanmaz.
+    """
+    start_time = time.perf_counter()
+    matrix = _as_cost_matrix(matrix)
+    route_indices = [int(node) for node in route_indices]
+    initial_length = tour_length(matrix, route_indices)
+    stats = {
+        'initial_length': initial_length,
+        'final_length': initial_length,
+        'two_opt_moves': 0,
+        'or_opt_moves': 0,
+        'seconds': 0.0,
+        'local_optimum': True,
+    }
+    tour = route_indices[:-1] if len(route_indices) > 1 and route_indices[-1] == route_indices[0] else route_indices
+    if len(tour) < 5:
+        return route_indices, stats # Üç kenar değiştirilecek kadar nokta yok
+    if neighbors is None:
+        neighbors = build_neighbor_lists(matrix, symmetric=symmetric)
+
+    state = _TourState(matrix, tour, symmetric)
+    if active_nodes is None:
+        queue = deque(state.tour.tolist())
+    else:
+        queue = deque(dict.fromkeys(int(node) for node in active_nodes))
+    queued = np.zeros(len(matrix), dtype=bool) # Sıradaki noktalar; sırada olmayanların bakma biti açık
+    queued[list(queue)] = True
+    steps = 0
+    while queue:
+        steps += 1
+        if steps % TIME_CHECK_INTERVAL == 0:
+            if (time_limit is not None and time.perf_counter() - start_time >= time_limit) or \
+                    (stop_requested is not None and stop_requested()):
+                stats['local_optimum'] = False
+                break
+        node = queue.popleft()
+        queued[node] = False
+
+        touched = None
+        move = state.best_two_opt(node, neighbors[node])
+        if move is not None:
+            touched = state.apply_two_opt(move[1], move[2])
+            stats['two_opt_moves'] += 1
+        else:
+            move = state.best_or_opt(node, neighbors, max_segment_length)
+            if move is not None:
+                touched = state.apply_or_opt(*move[1:])
+                stats['or_opt_moves'] += 1
+        if touched is not None:
+            for touched_node in touched + [node]:
+                if not queued[touched_node]:
+                    queued[touched_node] = True
+                    queue.append(touched_node)
+
+    improved_route = state.route(route_indices[0])
+    stats['final_length'] = tour_length(matrix, improved_route)
+    stats['seconds'] = time.perf_counter() - start_time
+    return improved_route, stats
+
+def cheapest_insertion(matrix, route_indices, new_nodes):
+    """
+    new_nodes'u depo başta ve sonda olan rotaya en ucuz ekleme sezgiseliyle
+    yerleştirir: her adımda tüm bekleyen noktaların tüm kenarlara ekleme
+    maliyeti vektörel hesaplanır ve en ucuzu uygulanır.
+    """
+    matrix = np.asarray(matrix)
+    route = [int(node) for node in route_indices]
+    pending = np.array([int(node) for node in new_nodes], dtype=np.intp)
+    while len(pending):
+        tour = np.asarray(route, dtype=np.intp)
+        from_nodes, to_nodes = tour[:-1], tour[1:]
+        # insertion[e, k]: k. bekleyen noktanın e. kenara eklenme maliyeti
+        insertion = matrix[np.ix_(from_nodes, pending)].astype(np.int64)
+        insertion += matrix[np.ix_(pending, to_nodes)].T
+        insertion -= matrix[from_nodes, to_nodes][:, None]
+        edge, candidate = np.unravel_index(int(np.argmin(insertion)), insertion.shape)
+        route.insert(int(edge) + 1, int(pending[candidate]))
+        pending = np.delete(pending, candidate)
+    return route
+
+def solve_fast(matrix, depot=0, time_limit=None, stop_requested=None, symmetric=False):
+    """
+    Hızlı mod: en yakın komşu rotası kurulur, ardından 2-opt/Or-opt ile iyileştirilir.
+    Seyrek aday grafında rota graf üzerinde kurulur; atlama yolları eklenmiş graf
+    üzerinde aranır ve atlama sayısı istatistiklere 'jump_arcs' olarak yazılır.
+    """
+    matrix = _as_cost_matrix(matrix)
+    if len(matrix) == 1:
+        return [depot, depot], {'initial_length': 0, 'final_length': 0, 'two_opt_moves': 0, 'or_opt_moves': 0, 'seconds': 0.0, 'local_optimum': True}
+    if isinstance(matrix, CandidateGraph):
+        initial_route, matrix, jump_arcs = matrix.nearest_neighbor_tour(depot)
+        route, stats = improve_tour(matrix, initial_route, build_neighbor_lists(matrix), time_limit, stop_requested)
+        stats['jump_arcs'] = jump_arcs
+        return route, stats
+    neighbors = build_neighbor_lists(matrix, symmetric=symmetric)
+    return improve_tour(matrix, nearest_neighbor_tour(matrix, depot), neighbors, time_limit, stop_requested, symmetric=symmetric)
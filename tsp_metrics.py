@@ -0,0 +1,259 @@
+"""
+Çalıştırma ölçümleri (enstrümantasyon).
+
+Her çalıştırma için aşama bazında süre ve tepe bellek (RSS), çözücü
+istatistikleri (maliyet geri çağrısı sayısı, çözüm ve dal sayısı, son durum,
+son iyileşme zamanı) tek bir kayıtta toplanır. Kayıt JSON satırı (JSONL)
+olarak günlüğe eklenir ve node_exporter'ın textfile toplayıcısının okuyacağı
+Prometheus metin biçiminde bir dosyaya yazılır.
+
+Aşama tepe belleği Linux'ta /proc/self/clear_refs ile yüksek su işareti
+(VmHWM) sıfırlanarak aşamaya özgü ölçülür; diğer sistemlerde sürecin o ana
+kadarki tepe değeri kullanılır. Sıfırlama süreç genelidir: aynı anda birden
+fazla çalıştırma ölçülüyorsa değerler yaklaşıktır. Alt süreçlerin (portföy,
+kümeleme işçileri) belleği dahil değildir.
+"""
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tsp_cache")
+METRICS_LOG_ENV = "TSP_METRIK_GUNLUGU" # JSONL günlük dosyası
+PROMETHEUS_FILE_ENV = "TSP_PROMETHEUS_DOSYASI" # node_exporter textfile dizinindeki .prom dosyası
+DEFAULT_METRICS_LOG = os.path.join(CACHE_DIR, "metrics.jsonl")
+DEFAULT_PROMETHEUS_FILE = os.path.join(CACHE_DIR, "tsp_metrics.prom")
+METRIC_PREFIX = "tsp"
+
+STAGE_LABELS = {
+    'matrix_read': "Matris okuma",
+    'preprocessing': "Ön işleme",
+    'fuel_prices': "Yakıt fiyatları",
+    'lower_bound': "Alt sınır",
+    'model_build': "Model kurma",
+    'clustering': "Kümeleme",
+    'search': "Arama",
+    'polish': "Yerel iyileştirme",
+    'result_processing': "Sonuç işleme",
+    'csv_export': "CSV çıktısı",
+    'excel_export': "Excel çıktısı",
+    'parquet_export': "Parquet çıktısı",
+    'json_export': "JSON çıktısı",
+}
+
+_stage_stack = threading.local()
+
+
+# --- Bellek ---
+
+def _read_status_kb(field):
+    """/proc/self/status içindeki bir alanı (kB) okur; yoksa None."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+def _reset_peak_rss():
+    """Sürecin RSS yüksek su işaretini sıfırlar; başarılıysa True (yalnızca Linux)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def current_rss_mb():
+    """Sürecin şu anki yerleşik bellek kullanımı (MB); ölçülemezse None."""
+    rss_kb = _read_status_kb('VmRSS')
+    return rss_kb / 1e3 if rss_kb is not None else None
+
+def peak_rss_mb():
+    """Yüksek su işaretine göre tepe yerleşik bellek (MB)."""
+    hwm_kb = _read_status_kb('VmHWM')
+    if hwm_kb is not None:
+        return hwm_kb / 1e3
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux'ta KB, macOS'ta bayt cinsindendir
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+# --- Aşama Ölçümü ---
+
+@contextmanager
+def measure_stage(stages, name):
+    """
+    Bloğun süresini ve tepe belleğini stages[name] içine yazar. İç içe
+    kullanılabilir; iç aşamanın tepe değeri dış aşamaya da yansıtılır.
+    Aynı ad tekrar ölçülürse süreler toplanır, tepe değerlerin büyüğü alınır.
+    """
+    stack = getattr(_stage_stack, 'peaks', None)
+    if stack is None:
+        stack = _stage_stack.peaks = []
+    if stack:
+        stack[-1] = max(stack[-1], peak_rss_mb()) # Sıfırlamadan önce dış aşamanın tepe değeri korunur
+    per_stage = _reset_peak_rss()
+    stack.append(current_rss_mb() or 0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stage_peak = max(stack.pop(), peak_rss_mb())
+        if stack:
+            stack[-1] = max(stack[-1], stage_peak)
+        previous = stages.get(name)
+        if previous:
+            seconds += previous['seconds']
+            stage_peak = max(stage_peak, previous['rss_peak_mb'])
+        stages[name] = {
+            'seconds': seconds,
+            'rss_peak_mb': stage_peak,
+            'rss_peak_scope': 'stage' if per_stage else 'process',
+        }
+
+
+class RunMetrics:
+    """
+    Bir çalıştırmanın ölçümlerini toplar. Aşamalar stage() ile ölçülür,
+    çözücü istatistikleri add_solver_stats() ile eklenir; sonuç record() ile
+    sözlük, append_jsonl() ve write_prometheus() ile dosya olarak alınır.
+    """
+
+    def __init__(self, source, **fields):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.source = source # 'arayuz', 'toplu' gibi
+        self.fields = fields # Kayda eklenecek ek alanlar (num_locations, objective_try gibi)
+        self.started_at = time.time()
+        self.stages = {}
+        self.solver = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Aşamayı ölçen bağlam yöneticisi: with metrics.stage('matrix_read'): ..."""
+        return measure_stage(self.stages, name)
+
+    def add_stages(self, stages):
+        """Başka yerde (ör. çözücü içinde) ölçülmüş aşamaları ekler."""
+        with self._lock:
+            for name, stage in (stages or {}).items():
+                self.stages[name] = dict(stage)
+
+    def add_solver_stats(self, solver_stats):
+        """run_tsp_solver istatistiklerinden ölçümleri ve çözücü aşamalarını alır."""
+        if not solver_stats:
+            return
+        self.add_stages(solver_stats.get('stages'))
+        self.solver.update({
+            'method': solver_stats.get('method'),
+            'cost_mode': solver_stats.get('cost_mode'),
+            'transit_callback_calls': solver_stats.get('transit_callback_calls'),
+            'solutions': solver_stats.get('solutions'),
+            'branches': solver_stats.get('branches'),
+            'status': solver_stats.get('status'),
+            'stop_reason': solver_stats.get('stop_reason'),
+            'solve_seconds': solver_stats.get('solve_seconds'),
+            'last_improvement_seconds': solver_stats.get('last_improvement_seconds'),
+            'lower_bound_try': (solver_stats.get('lower_bound') or {}).get('bound_try'),
+        })
+
+    def record(self, **extra):
+        """Günlüğe yazılacak ölçüm kaydı."""
+        with self._lock:
+            return {
+                'run_id': self.run_id,
+                'source': self.source,
+                'timestamp': self.started_at,
+                **self.fields,
+                'stages': {name: dict(stage) for name, stage in self.stages.items()},
+                'solver': dict(self.solver),
+                **extra,
+            }
+
+    def append_jsonl(self, path=None, **extra):
+        """Kaydı JSONL günlüğüne ekler ve dosya yolunu döndürür."""
+        return append_metrics_log(self.record(**extra), path)
+
+    def write_prometheus(self, path=None, **extra):
+        """Kaydı Prometheus metin dosyasına yazar ve dosya yolunu döndürür."""
+        return write_prometheus_file(self.record(**extra), path)
+
+
+# --- Dosyalar ---
+
+def append_metrics_log(record, path=None):
+    """Ölçüm kaydını JSONL günlüğüne bir satır olarak ekler."""
+    path = path or os.environ.get(METRICS_LOG_ENV) or DEFAULT_METRICS_LOG
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    return path
+
+def write_prometheus_file(record, path=None):
+    """
+    Son çalıştırmanın ölçümlerini Prometheus metin biçiminde yazar. Dosya
+    önce geçici adla yazılıp yeniden adlandırılır; node_exporter yarım dosya okumaz.
+    """
+    path = path or os.environ.get(PROMETHEUS_FILE_ENV) or DEFAULT_PROMETHEUS_FILE
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(format_prometheus(record))
+    os.replace(temp_path, path)
+    return path
+
+
+# --- Prometheus Metin Biçimi ---
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+def format_prometheus(record):
+    """Ölçüm kaydını Prometheus metin biçimine (gauge'lar) çevirir; değeri olmayan ölçümler atlanır."""
+    base_labels = {'source': record['source']}
+    solver = record.get('solver', {})
+    if solver.get('method'):
+        base_labels['method'] = solver['method']
+    lines = []
+
+    def gauge(name, help_text, samples):
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for labels, value in samples:
+            lines.append(f"{metric}{_format_labels({**base_labels, **labels})} {float(value)!r}")
+
+    stages = record.get('stages', {})
+    gauge("stage_duration_seconds", "Son çalıştırmada aşama süresi (saniye).",
+          [({'stage': name}, stage['seconds']) for name, stage in stages.items()])
+    gauge("stage_peak_rss_bytes", "Son çalıştırmada aşama tepe yerleşik belleği (bayt).",
+          [({'stage': name}, stage['rss_peak_mb'] * 1e6) for name, stage in stages.items()])
+    gauge("transit_callback_calls", "Python maliyet geri çağrısı çağrı sayısı (maliyet matrisi modunda yazılmaz).",
+          [({}, solver.get('transit_callback_calls'))])
+    gauge("solver_solutions", "Son çalıştırmada bulunan çözüm sayısı.", [({}, solver.get('solutions'))])
+    gauge("solver_branches", "Son çalıştırmada keşfedilen dal sayısı.", [({}, solver.get('branches'))])
+    gauge("solver_last_improvement_seconds", "Arama başlangıcından son iyileşen çözüme kadar geçen süre (saniye).",
+          [({}, solver.get('last_improvement_seconds'))])
+    gauge("solver_status_info", "Son çalıştırmanın çözücü durumu ve durma nedeni (değer her zaman 1).",
+          [({'status': solver.get('status') or 'UNKNOWN', 'stop_reason': solver.get('stop_reason') or ''}, 1)])
+    gauge("objective_try", "Son rotanın yakıt maliyeti (TRY).", [({}, record.get('objective_try'))])
+    gauge("lower_bound_try", "Son rotanın yakıt maliyeti için alt sınır (TRY).", [({}, solver.get('lower_bound_try'))])
+    gauge("optimality_gap_percent", "Son rotanın alt sınıra göre optimallik açığı (%).", [({}, record.get('optimality_gap_pct'))])
+    gauge("num_locations", "Son çalıştırmadaki konum sayısı.", [({}, record.get('num_locations'))])
+    gauge("last_run_timestamp_seconds", "Son çalıştırmanın başlangıç zamanı (Unix saniyesi).", [({}, record.get('timestamp'))])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,177 @@
+"""
+Mesafe matrisi ön işleme: çözücüden önce problemi küçültür ve temizler.
+
+* Aynı konumdaki noktalar: aralarındaki mesafe (her iki yönde) eşiğin
+  altında olan noktalar (ör. aynı sahadaki birkaç konteyner) tek bir süper
+  düğümde birleştirilir. Çözüm küçültülmüş matris üzerinde yapılır, rota
+  sonra grubun tüm noktalarına genişletilir. Birleştirme varsayılan olarak
+  kapalıdır; eşik verilince açılır.
+* Simetri tespiti: simetrik matrislerde yerel arama ters yön maliyetlerini
+  ayrıca okumaz (tsp_local_search'teki symmetric seçeneği).
+* İsteğe bağlı üçgen eşitsizliği onarımı: en kısa yol kapanışı
+  (Floyd-Warshall). d(i,j) > d(i,k) + d(k,j) ise araç k üzerinden
+  gidebileceği için yolun mesafesi k üzerinden gidilen mesafeye indirilir.
+
+Modül OR-Tools'a ve Streamlit'e bağlı değildir.
+"""
+import time
+
+import numpy as np
+
+DEFAULT_MERGE_THRESHOLD = 10 # Birleştirme açıldığında eşiğin başlangıç değeri (metre); bu mesafe ve altındaki noktalar aynı konumda sayılır
+TRIANGLE_REPAIR_MAX_NODES = 1500 # En kısa yol kapanışı O(n^3); daha büyük matrislerde uygulanmaz
+PREPROCESS_BLOCK_ROWS = 1024 # Simetri ve yakınlık taramaları bu kadar satırlık bloklarla yapılır
+
+
+class PreprocessedMatrix:
+    """
+    Ön işlemenin sonucu. matrix tüm noktaları içeren (gerekirse onarılmış)
+    matristir; rota maliyeti bununla hesaplanır. reduced_matrix çözücüye
+    verilen küçültülmüş matristir: i. satırı groups[i][0] noktasını (grubun
+    temsilcisi) temsil eder. Depo (0) her zaman küçültülmüş matrisin 0. noktasıdır.
+    """
+
+    def __init__(self, matrix, reduced_matrix, groups, symmetric, stats):
+        self.matrix = matrix
+        self.reduced_matrix = reduced_matrix
+        self.groups = groups # Süper düğüm başına, temsilciyle başlayan ziyaret sırası
+        self.symmetric = symmetric
+        self.stats = stats
+
+    @property
+    def num_locations(self):
+        return len(self.matrix)
+
+    @property
+    def num_reduced(self):
+        return len(self.reduced_matrix)
+
+    def expand_route(self, reduced_route):
+        """Küçültülmüş matristeki rotayı (depo başta ve sonda) tüm noktaları içeren rotaya genişletir."""
+        route = []
+        for node in reduced_route[:-1]:
+            route.extend(int(member) for member in self.groups[int(node)])
+        route.append(route[0])
+        return route
+
+
+def _max_asymmetry(matrix):
+    """(en büyük |d(i,j) - d(j,i)|, asimetrik çift sayısı); matris bloklar halinde taranır."""
+    max_difference = 0
+    asymmetric_pairs = 0
+    for start in range(0, len(matrix), PREPROCESS_BLOCK_ROWS):
+        stop = min(start + PREPROCESS_BLOCK_ROWS, len(matrix))
+        difference = np.abs(matrix[start:stop].astype(np.int64) - matrix[:, start:stop].T)
+        max_difference = max(max_difference, int(difference.max(initial=0)))
+        asymmetric_pairs += int(np.count_nonzero(difference))
+    return max_difference, asymmetric_pairs // 2
+
+def shortest_path_closure(matrix):
+    """
+    Floyd-Warshall ile en kısa yol kapanışı. Her k için tüm matris tek
+    vektörel işlemle, önceden ayrılmış ara dizi üzerinde güncellenir (iki
+    mesafenin toplamı taşmıyorsa int32 ile). (onarılmış int32 matris, kısalan yol sayısı) döndürür.
+    """
+    dtype = np.int32 if int(np.max(matrix, initial=0)) <= np.iinfo(np.int32).max // 2 else np.int64
+    closure = np.array(matrix, dtype=dtype)
+    through_k = np.empty_like(closure)
+    for k in range(len(closure)):
+        # k. satır bu adımda değişmez (d(k,k) = 0), bu yüzden yerinde güncelleme güvenlidir
+        np.add(closure[:, k, None], closure[None, k, :], out=through_k)
+        np.minimum(closure, through_k, out=closure)
+    shortened = int(np.count_nonzero(closure < matrix))
+    return closure.astype(np.int32, copy=False), shortened
+
+def _co_located_groups(matrix, threshold):
+    """
+    Eşik altındaki noktaları gruplar. Yakın çiftler vektörel olarak bulunur;
+    gruplar indeks sırasıyla, henüz gruplanmamış her noktadan (temsilci)
+    büyütülür. Aday, grubun tüm üyelerine her iki yönde eşik içindeyse gruba
+    girer; böylece zincirleme birleşme olmaz ve grup çapı eşiği aşmaz.
+    Depo ilk nokta olduğu için her zaman kendi grubunun temsilcisidir.
+    """
+    num_nodes = len(matrix)
+    row_parts = []
+    col_parts = []
+    for start in range(0, num_nodes, PREPROCESS_BLOCK_ROWS):
+        stop = min(start + PREPROCESS_BLOCK_ROWS, num_nodes)
+        farther = np.maximum(matrix[start:stop], matrix[:, start:stop].T)
+        rows, cols = np.nonzero(farther <= threshold)
+        rows += start
+        upper = rows < cols # Her çift bir kez; köşegen hariç
+        row_parts.append(rows[upper])
+        col_parts.append(cols[upper])
+    # np.nonzero satır sırasıyla döndüğü için çiftler satıra göre sıralıdır (CSR komşu listeleri)
+    rows = np.concatenate(row_parts)
+    cols = np.concatenate(col_parts)
+    offsets = np.searchsorted(rows, np.arange(num_nodes + 1))
+
+    grouped = np.zeros(num_nodes, dtype=bool)
+    groups = []
+    for node in range(num_nodes):
+        if grouped[node]:
+            continue
+        members = [node]
+        # Daha küçük indeksli komşular zaten temsilci olarak işlendi; yalnızca büyükler aday
+        for other in cols[offsets[node]:offsets[node + 1]].tolist():
+            if grouped[other]:
+                continue
+            if max(matrix[other, members].max(), matrix[members, other].max()) <= threshold:
+                members.append(other)
+        grouped[members] = True
+        groups.append(_order_members(matrix, members))
+    return groups
+
+def _order_members(matrix, members):
+    """Grup içi ziyaret sırası: temsilciden başlayan en yakın komşu sırası."""
+    if len(members) <= 2:
+        return np.asarray(members, dtype=np.int64)
+    ordered = [members[0]]
+    pending = list(members[1:])
+    while pending:
+        distances = matrix[ordered[-1], pending]
+        ordered.append(pending.pop(int(np.argmin(distances))))
+    return np.asarray(ordered, dtype=np.int64)
+
+def preprocess_matrix(distance_matrix, merge_threshold=None, repair_triangle=False):
+    """
+    Matrisi ön işler ve PreprocessedMatrix döndürür. merge_threshold None ise
+    (varsayılan) noktalar birleştirilmez; repair_triangle açıksa birleştirmeden önce en
+    kısa yol kapanışı uygulanır (TRIANGLE_REPAIR_MAX_NODES'a kadar).
+    """
+    start_time = time.perf_counter()
+    matrix = distance_matrix
+    stats = {
+        'num_locations': len(matrix),
+        'merge_threshold': merge_threshold,
+        'repaired_pairs': None,
+        'repair_skipped': False,
+    }
+    if repair_triangle:
+        if len(matrix) <= TRIANGLE_REPAIR_MAX_NODES:
+            matrix, stats['repaired_pairs'] = shortest_path_closure(matrix)
+            matrix.flags.writeable = False
+        else:
+            stats['repair_skipped'] = True
+
+    if merge_threshold is not None and len(matrix) > 1:
+        groups = _co_located_groups(matrix, merge_threshold)
+    else:
+        groups = [np.array([node], dtype=np.int64) for node in range(len(matrix))]
+    if len(groups) < len(matrix):
+        representatives = np.array([group[0] for group in groups], dtype=np.int64)
+        reduced_matrix = np.ascontiguousarray(matrix[np.ix_(representatives, representatives)])
+    else:
+        reduced_matrix = matrix
+
+    max_difference, asymmetric_pairs = _max_asymmetry(reduced_matrix)
+    stats.update({
+        'num_reduced': len(reduced_matrix),
+        'merged_locations': len(matrix) - len(reduced_matrix),
+        'largest_group': max(len(group) for group in groups) if groups else 0,
+        'symmetric': max_difference == 0,
+        'max_asymmetry': max_difference,
+        'asymmetric_pairs': asymmetric_pairs,
+        'seconds': time.perf_counter() - start_time,
+    })
+    return PreprocessedMatrix(matrix, reduced_matrix, groups, max_difference == 0, stats)
@@ -0,0 +1,333 @@
+"""
+Yakıt fiyatı sağlayıcı katmanı.
+
+* Sağlayıcılar (FuelPriceProvider): Opet API'si (havuzlu requests.Session ile),
+  Opet yanıtı biçiminde yerel JSON dosyası ve sabit fiyatlı saplama (stub).
+  Testlerde ve çevrimdışı çalışmada Opet yerine bunlar kullanılabilir.
+* PriceStore: il kodu, ilçe ve ürün bazında fiyatları zaman damgasıyla diskte
+  saklar; süreçler ve yeniden başlatmalar arasında paylaşılır.
+* get_fuel_prices: son bilinen fiyatı hemen döndürür, eskimişse arka planda
+  yeniler (stale-while-revalidate). Ağ yalnızca hiç kayıt yokken beklenir.
+"""
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+OPET_API_URL = "https://api.opet.com.tr/api/fuelprices/prices"
+OPET_HEADERS = {
+    'Accept': 'application/json, text/plain, */*',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+HTTP_TIMEOUT = (3.05, 10) # (bağlantı, okuma) saniye
+HTTP_RETRIES = 2
+PRICE_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tsp_cache", "prices.json")
+PRICE_MAX_AGE_SECONDS = 3600 # Bundan eski fiyatlar hemen kullanılır ama arka planda yenilenir
+PRICE_WARN_AGE_SECONDS = 3 * 24 * 3600 # Bundan eski fiyatlar için kullanıcı uyarılır
+PRICE_SOURCE_ENV = "TSP_FIYAT_KAYNAGI" # Sağlayıcı seçimi: opet | dosya:<yol> | url:<adres> | sabit:motorin=45.1,benzin=47.2
+
+# Ürün adları (API'den geldiği gibi) ve öncelik sırası
+BENZIN_PRODUCTS = ("Kurşunsuz Benzin 95",)
+MOTORIN_PRODUCTS = ("Motorin EcoForce", "Motorin UltraForce")
+
+
+# --- Sağlayıcılar ---
+
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    """Bağlantı havuzlu ve yeniden denemeli, süreç genelinde paylaşılan HTTP oturumu."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=HTTP_RETRIES, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+            session = requests.Session()
+            session.headers.update(OPET_HEADERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def _records_from_opet_payload(data):
+    """Opet yanıtını (ilçe listesi) düz (ilçe, ürün, fiyat) kayıtlarına çevirir."""
+    if not isinstance(data, list) or not data:
+        raise ValueError(f"API yanıtı beklenen formatta değil (ilçe listesi bekleniyordu). Yanıt: {str(data)[:200]}...")
+    records = []
+    for district_data in data:
+        if not isinstance(district_data, dict): continue
+        price_list = district_data.get('prices')
+        if not isinstance(price_list, list): continue
+        for fuel_item in price_list:
+            if not isinstance(fuel_item, dict) or 'productName' not in fuel_item or 'amount' not in fuel_item: continue
+            try:
+                price = float(fuel_item['amount'])
+            except (ValueError, TypeError):
+                continue
+            records.append({'district': district_data.get('districtName', ''), 'product': fuel_item['productName'], 'price': price})
+    return records
+
+class FuelPriceProvider:
+    """
+    Sağlayıcı arayüzü: fetch(city_code) -> (kayıtlar veya None, mesajlar).
+    Kayıtlar {'district', 'product', 'price'} sözlükleridir ve kaynağın
+    sırasını korur (ilçe önceliği bu sıraya göre belirlenir).
+    """
+    name = "provider"
+
+    def fetch(self, city_code):
+        raise NotImplementedError
+
+class OpetPriceProvider(FuelPriceProvider):
+    """Opet fiyat API'si (veya aynı biçimde yanıt veren bir saplama sunucusu)."""
+    name = "opet"
+
+    def __init__(self, api_url=OPET_API_URL, timeout=HTTP_TIMEOUT):
+        self.api_url = api_url
+        self.timeout = timeout
+        if api_url != OPET_API_URL:
+            self.name = f"url({api_url})" # Saplama sunucusunun fiyatları gerçek Opet kayıtlarına karışmasın
+
+    def fetch(self, city_code):
+        try:
+            response = _get_session().get(self.api_url, params={"provinceCode": city_code}, timeout=self.timeout)
+            response.raise_for_status()
+            return _records_from_opet_payload(response.json()), []
+        except requests.exceptions.RequestException as e:
+            return None, [f"Hata: Opet API'sine bağlanılamadı: {e}"]
+        except json.JSONDecodeError:
+            return None, ["Hata: Opet API yanıtı JSON formatında değil."]
+        except ValueError as e:
+            return None, [f"Hata: {e}"]
+
+class LocalFilePriceProvider(FuelPriceProvider):
+    """Opet yanıtı biçimindeki yerel JSON dosyası (il kodundan bağımsız)."""
+    name = "dosya"
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self, city_code):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return _records_from_opet_payload(json.load(f)), []
+        except (OSError, ValueError) as e:
+            return None, [f"Hata: Fiyat dosyası okunamadı ({self.path}): {e}"]
+
+class StaticPriceProvider(FuelPriceProvider):
+    """Sabit fiyatlar döndüren saplama; testler ve çevrimdışı çalışma için."""
+    name = "sabit"
+
+    def __init__(self, prices, districts=("TALAS",)):
+        self.prices = prices
+        self.districts = districts
+
+    def fetch(self, city_code):
+        product_names = {'benzin': BENZIN_PRODUCTS[0], 'motorin': MOTORIN_PRODUCTS[0]}
+        return [
+            {'district': district, 'product': product_names.get(fuel, fuel), 'price': float(price)}
+            for district in self.districts for fuel, price in self.prices.items()
+        ], []
+
+def provider_from_spec(spec):
+    """
+    Metin tanımından sağlayıcı oluşturur: 'opet', 'dosya:<yol>', 'url:<adres>'
+    veya 'sabit:motorin=45.1,benzin=47.2'. Boş tanım Opet'i seçer.
+    """
+    spec = (spec or "opet").strip()
+    kind, _, value = spec.partition(':')
+    kind = kind.lower()
+    if kind == "opet":
+        return OpetPriceProvider()
+    if kind == "dosya" and value:
+        return LocalFilePriceProvider(value)
+    if kind == "url" and value:
+        return OpetPriceProvider(api_url=value)
+    if kind == "sabit" and value:
+        prices = {}
+        for item in value.split(','):
+            fuel, _, price = item.partition('=')
+            prices[fuel.strip().lower()] = float(price)
+        return StaticPriceProvider(prices)
+    raise ValueError(f"Bilinmeyen fiyat kaynağı: {spec}")
+
+def default_provider():
+    """Ortam değişkeninde (TSP_FIYAT_KAYNAGI) tanımlı, yoksa Opet sağlayıcısı."""
+    return provider_from_spec(os.environ.get(PRICE_SOURCE_ENV))
+
+
+# --- Kalıcı Fiyat Deposu ---
+
+class PriceStore:
+    """
+    Fiyat kayıtlarını sağlayıcı ve il kodu bazında, her (ilçe, ürün) için zaman
+    damgasıyla JSON dosyasında saklar. Dosya değiştiyse (ör. başka bir süreç yeniledi)
+    bir sonraki okumada yeniden yüklenir; yazımlar atomiktir.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or PRICE_STORE_PATH
+        self._lock = threading.Lock()
+        self._data = {}
+        self._loaded_mtime = None
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+            self._loaded_mtime = mtime
+        except (OSError, ValueError):
+            pass # Bozuk dosya yok sayılır; bir sonraki yazımda düzelir
+
+    def get(self, city_code, provider_name):
+        """İl kodu için kayıtları ve en son alınma zamanını döndürür: (kayıtlar, zaman) veya (None, None)."""
+        with self._lock:
+            self._reload()
+            entry = self._data.get(f"{provider_name}:{city_code}")
+        if not entry or not entry.get('records'):
+            return None, None
+        return entry['records'], entry['fetched_at']
+
+    def put(self, city_code, records, provider_name):
+        """Yeni kayıtları zaman damgasıyla yazar; gelmeyen (ilçe, ürün) çiftlerinin son bilinen değeri korunur."""
+        now = time.time()
+        with self._lock:
+            self._reload()
+            entry_key = f"{provider_name}:{city_code}"
+            previous = self._data.get(entry_key, {}).get('records', [])
+            merged = [dict(record, fetched_at=now, provider=provider_name) for record in records]
+            fresh_keys = {(record['district'], record['product']) for record in records}
+            merged += [record for record in previous if (record['district'], record['product']) not in fresh_keys]
+            self._data[entry_key] = {'fetched_at': now, 'provider': provider_name, 'records': merged}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=1)
+            os.replace(temp_path, self.path)
+            self._loaded_mtime = os.path.getmtime(self.path)
+
+_default_store = None
+_refreshing = set() # Arka planda yenilenmekte olan il kodları
+_refresh_lock = threading.Lock()
+
+def _get_default_store():
+    global _default_store
+    with _refresh_lock:
+        if _default_store is None:
+            _default_store = PriceStore()
+        return _default_store
+
+def refresh_prices(city_code, provider, store):
+    """Sağlayıcıdan fiyatları alıp depoya yazar; (kayıtlar veya None, mesajlar) döndürür."""
+    records, messages = provider.fetch(city_code)
+    if records:
+        try:
+            store.put(city_code, records, provider.name)
+        except OSError as e:
+            messages = messages + [f"Uyarı: Fiyatlar diske yazılamadı: {e}"]
+    return records, messages
+
+def _refresh_in_background(city_code, provider, store):
+    """Aynı il için aynı anda tek bir arka plan yenilemesi başlatır."""
+    key = (provider.name, str(city_code), store.path)
+    with _refresh_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+
+    def worker():
+        try:
+            refresh_prices(city_code, provider, store)
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=worker, daemon=True, name=f"fiyat-yenile-{city_code}").start()
+    return True
+
+
+# --- Fiyat Seçimi ---
+
+def select_fuel_prices(records, target_districts):
+    """
+    Kayıtlardan hedef ilçelerdeki benzin ve motorin fiyatlarını seçer. İlçeler
+    kaynaktaki sırayla taranır; motorinde EcoForce, UltraForce'a tercih edilir.
+    """
+    status_messages = []
+    prices = {}
+    districts_in_order = list(dict.fromkeys(record['district'] for record in records))
+    for district in districts_in_order:
+        if district.upper() not in target_districts: continue
+        status_messages.append(f"'{district}' hedef ilçesi kontrol ediliyor...")
+        district_prices = {record['product']: record['price'] for record in records if record['district'] == district}
+        if 'benzin' not in prices:
+            for product in BENZIN_PRODUCTS:
+                if product in district_prices:
+                    prices['benzin'] = district_prices[product]
+                    status_messages.append(f"  > Bulunan Benzin Fiyatı ({district}): {prices['benzin']:.2f} TRY/L")
+                    break
+        if 'motorin' not in prices:
+            for product in MOTORIN_PRODUCTS:
+                if product in district_prices:
+                    prices['motorin'] = district_prices[product]
+                    status_messages.append(f"  > Bulunan Motorin Fiyatı ({district}): {prices['motorin']:.2f} TRY/L ({product})")
+                    break
+        if 'benzin' in prices and 'motorin' in prices:
+            status_messages.append(f"'{district}' hedef ilçesinden gerekli fiyatlar başarıyla alındı.")
+            break
+    return prices, status_messages
+
+def _describe_age(seconds):
+    if seconds < 120:
+        return f"{seconds:.0f} sn"
+    if seconds < 2 * 3600:
+        return f"{seconds / 60:.0f} dk"
+    if seconds < 2 * 86400:
+        return f"{seconds / 3600:.0f} saat"
+    return f"{seconds / 86400:.0f} gün"
+
+def get_fuel_prices(city_code, target_districts, provider=None, store=None, max_age=PRICE_MAX_AGE_SECONDS):
+    """
+    Hedef ilçelerin benzin/motorin fiyatlarını döndürür: (fiyatlar veya None, mesajlar).
+    Depoda kayıt varsa hemen onu kullanır; kayıt max_age'den eskiyse arka planda
+    yenileme başlatır. Ağ isteği yalnızca depoda hiç kayıt yoksa beklenir.
+    """
+    provider = provider or default_provider()
+    store = store or _get_default_store()
+    status_messages = []
+    target_districts_str = ", ".join(target_districts)
+
+    records, fetched_at = store.get(city_code, provider.name)
+    if records is None:
+        status_messages.append(f"Kayıtlı fiyat yok; fiyatlar sağlayıcıdan ({provider.name}) alınıyor...")
+        records, fetch_messages = refresh_prices(city_code, provider, store)
+        status_messages += fetch_messages
+        if records is None:
+            return None, status_messages
+        fetched_at = time.time()
+    else:
+        age = time.time() - fetched_at
+        status_messages.append(f"Son bilinen fiyatlar kullanılıyor ({_describe_age(age)} önce alındı).")
+        if age > max_age and _refresh_in_background(city_code, provider, store):
+            status_messages.append(f"Fiyatlar arka planda yenileniyor ({provider.name}); sonraki çalıştırmada güncel değerler kullanılacak.")
+        if age > PRICE_WARN_AGE_SECONDS:
+            status_messages.append(f"Uyarı: Kayıtlı fiyatlar {_describe_age(age)} önce alındı; sağlayıcıya ulaşılamıyor olabilir.")
+
+    prices, selection_messages = select_fuel_prices(records, target_districts)
+    status_messages += selection_messages
+    if 'benzin' not in prices or 'motorin' not in prices:
+        error_msg = f"Hata: Hedeflenen ilçelerde ({target_districts_str}) Benzin veya Motorin fiyatlarından biri veya ikisi de bulunamadı."
+        error_msg += f" Bulunanlar: {prices}"
+        return None, status_messages + [error_msg]
+    return prices, status_messages
@@ -0,0 +1,974 @@
+"""
+Yerel çözüm servisi: aynı makinedeki birden çok kullanıcının (ör. dağıtım
+sorumluları) çözüm isteklerini tek bir kuyrukta toplayan küçük HTTP servisi.
+
+* İşler kuyruğa alınır ve yapılandırılabilir sayıda işçiyle çalıştırılır.
+  Boşalan işçiye en az çalışan işi olan, eşitlikte en uzun süredir işi
+  başlatılmamış istemcinin en eski işi verilir; böylece bir kullanıcının
+  toplu gönderimi diğerlerini bekletmez.
+* Her iş ayrı bir süreçte çalışır. İş başına süre sınırı servis üst
+  sınırına indirilir; iş CPU süresi sınırını veya duvar saati sınırını
+  aşarsa sonlandırılır. CPU süresi portföy ve kümeleme işçileri dahil iş
+  sürecinin tüm alt süreçleri için toplanır (Linux'ta /proc üzerinden);
+  diğer sistemlerde sınır yalnızca süreç başına (RLIMIT_CPU) uygulanır.
+* Aynı içerik (matris, önceki rota ve parametreler) için kuyrukta bekleyen
+  veya çalışan bir iş varsa yeni iş açılmaz, mevcut işin kimliği döner.
+  İş, onu bekleyen tüm istemciler iptal edince iptal edilir.
+* İstemciler durumu sorgulayabilir veya Server-Sent Events akışı olarak
+  izleyebilir. Sonuç; özet, rota tablosu, çözücü istatistikleri ve
+  aşama mesajlarını içerir.
+
+Uç noktalar:
+    POST   /jobs              İş gönderir (JSON; dosya içerikleri base64)
+    GET    /jobs/<id>         Durum, ilerleme ve bittiyse sonuç (?result=0 ile sonuçsuz)
+    GET    /jobs/<id>/events  Durum değişikliklerini SSE akışı olarak gönderir
+    DELETE /jobs/<id>         İşi iptal eder (çalışıyorsa o ana kadarki en iyi rota sonuç olur)
+    GET    /health            İşçi, kuyruk ve çalışan iş sayıları
+
+Örnek:
+    python tsp_service.py --isci 2 --azami-sure 300 --port 8765
+
+Streamlit arayüzü, TSP_COZUM_SERVISI=http://127.0.0.1:8765 ortam değişkeni
+(veya kenar çubuğundaki servis adresi) verildiğinde bu servise iş gönderen
+ince bir istemci olarak çalışır. Servis yalnızca standart kütüphaneyi,
+istemci ise requests paketini kullanır.
+"""
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import signal
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+import requests
+
+from tsp_backend import (
+    COST_SCALING_FACTOR, COST_MODE_MATRIX, COST_MODE_CALLBACK, LARGE_INSTANCE_THRESHOLD, DEFAULT_CLUSTER_SIZE,
+    SolveMonitor, read_distance_matrix, read_location_labels, read_previous_route, read_candidate_graph,
+    run_tsp_solver, reoptimize_route, process_and_save_results, preprocess_distance_matrix, finish_preprocessed_solve,
+    solver_parallelism,
+)
+from tsp_export import RouteExport
+from tsp_metrics import RunMetrics, append_metrics_log, write_prometheus_file
+
+SERVICE_URL_ENV = "TSP_COZUM_SERVISI" # Arayüzün bağlanacağı servis adresi (ör. http://127.0.0.1:8765)
+DEFAULT_SERVICE_HOST = "127.0.0.1" # Varsayılan olarak yalnızca yerel bağlantılar kabul edilir
+DEFAULT_SERVICE_PORT = 8765
+DEFAULT_SERVICE_WORKERS = max(1, (os.cpu_count() or 1) // 2) # Aynı anda çalışan iş sayısı
+DEFAULT_MAX_TIME_LIMIT = 600 # İş başına çözücü süre sınırının üst sınırı (saniye)
+JOB_CPU_FACTOR = 2.0 # Otomatik CPU sınırı: süre sınırı x bu katsayı x paralel süreç sayısı + JOB_TIME_MARGIN
+JOB_TIME_MARGIN = 120 # Okuma, ön işleme, alt sınır ve sonuç işleme için ek süre (saniye)
+JOB_CANCEL_GRACE = 15 # İptal edilen iş bu kadar saniyede bitmezse süreç sonlandırılır
+CPU_CHECK_INTERVAL = 1.0 # İş süreç ağacının CPU süresinin denetlenme aralığı (saniye)
+JOB_RESULT_TTL = 3600 # Biten işler bu kadar saniye saklanır
+MAX_FINISHED_JOBS = 200 # Saklanan en fazla biten iş sayısı
+MAX_REQUEST_BYTES = 256 * 1024 * 1024 # En büyük istek gövdesi (base64 kodlu matris dahil)
+PROGRESS_POLL_INTERVAL = 0.25 # İş sürecinin ilerleme bildirme aralığı (saniye)
+EVENT_HEARTBEAT_SECONDS = 15 # SSE bağlantısını açık tutmak için boş yorum satırı aralığı
+SERVICE_REQUEST_TIMEOUT = 30 # İstemcinin HTTP istek zaman aşımı (saniye)
+REMOTE_POLL_RETRIES = 10 # Arayüz, servise art arda bu kadar ulaşamazsa işi başarısız sayar
+
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+ACTIVE_JOB_STATES = (JOB_QUEUED, JOB_RUNNING)
+JOB_STATE_LABELS = {
+    JOB_QUEUED: "Kuyrukta",
+    JOB_RUNNING: "Çalışıyor",
+    JOB_DONE: "Tamamlandı",
+    JOB_FAILED: "Başarısız",
+    JOB_CANCELLED: "İptal edildi",
+}
+
+# İş parametreleri ve varsayılanları (anlamları tsp_batch.solve_instance ile aynıdır)
+JOB_PARAMETERS = {
+    'fuel_price': None, # Zorunlu (TRY/L); fiyat istemci tarafında belirlenir
+    'consumption': 8.0,
+    'time_limit': 60,
+    'cost_mode': COST_MODE_MATRIX,
+    'use_route_cache': True,
+    'portfolio_size': 1,
+    'large_instance_threshold': LARGE_INSTANCE_THRESHOLD,
+    'cluster_size': DEFAULT_CLUSTER_SIZE,
+    'polish': True,
+    'fast_mode': False,
+    'candidate_neighbors': 0,
+    'merge_threshold': None,
+    'repair_triangle': False,
+    'use_lower_bound': True,
+    'target_gap_pct': 0.0,
+    'stall_seconds': 0,
+    'min_improvement_pct': 0.0,
+    'output_name': "TSP_Rota_Sonucu",
+}
+_NUMERIC_PARAMETERS = ('fuel_price', 'consumption', 'time_limit', 'portfolio_size', 'large_instance_threshold', 'cluster_size',
+                       'candidate_neighbors', 'merge_threshold', 'target_gap_pct', 'stall_seconds', 'min_improvement_pct')
+_FLAG_PARAMETERS = ('use_route_cache', 'polish', 'fast_mode', 'repair_triangle', 'use_lower_bound')
+
+
+# --- İş tanımı ---
+
+def validate_job_params(params, max_time_limit=DEFAULT_MAX_TIME_LIMIT):
+    """
+    Gönderilen parametreleri varsayılanlarla tamamlar ve denetler.
+    (parametreler|None, mesajlar) döndürür; süre sınırı max_time_limit'e indirilir.
+    """
+    if not isinstance(params, dict):
+        return None, ["Hata: 'params' bir JSON nesnesi olmalıdır."]
+    unknown = sorted(set(params) - set(JOB_PARAMETERS))
+    if unknown:
+        return None, [f"Hata: Bilinmeyen parametre: {', '.join(unknown)}"]
+    clean = {**JOB_PARAMETERS, **params}
+    if clean['fuel_price'] is None:
+        return None, ["Hata: 'fuel_price' (TRY/L) zorunludur; yakıt fiyatı istemci tarafında belirlenir."]
+    messages = []
+    for name in _NUMERIC_PARAMETERS:
+        value = clean[name]
+        if value is None and name == 'merge_threshold':
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            return None, [f"Hata: '{name}' negatif olmayan bir sayı olmalıdır."]
+    for name in _FLAG_PARAMETERS:
+        if not isinstance(clean[name], bool):
+            return None, [f"Hata: '{name}' true veya false olmalıdır."]
+    if clean['fuel_price'] <= 0:
+        return None, ["Hata: 'fuel_price' (TRY/L) sıfırdan büyük olmalıdır."]
+    if clean['time_limit'] < 1:
+        return None, ["Hata: 'time_limit' en az 1 saniye olmalıdır."]
+    if clean['cost_mode'] not in (COST_MODE_MATRIX, COST_MODE_CALLBACK):
+        return None, [f"Hata: 'cost_mode' '{COST_MODE_MATRIX}' veya '{COST_MODE_CALLBACK}' olmalıdır."]
+    if not isinstance(clean['output_name'], str) or not clean['output_name'].strip():
+        return None, ["Hata: 'output_name' boş olmayan bir metin olmalıdır."]
+    if clean['time_limit'] > max_time_limit:
+        messages.append(f"Uyarı: Süre sınırı {clean['time_limit']} sn yerine servisin üst sınırı olan {max_time_limit} sn olarak uygulandı.")
+        clean['time_limit'] = max_time_limit
+    for name in ('time_limit', 'portfolio_size', 'large_instance_threshold', 'cluster_size', 'candidate_neighbors', 'stall_seconds'):
+        clean[name] = int(clean[name])
+    if clean['merge_threshold'] is not None:
+        clean['merge_threshold'] = int(clean['merge_threshold'])
+    return clean, messages
+
+def _decode_file(payload, field):
+    """{'name': ..., 'content': base64} alanını (ad, bayt) olarak çözer; geçersizse ValueError."""
+    if not isinstance(payload, dict) or not isinstance(payload.get('name'), str) or not isinstance(payload.get('content'), str):
+        raise ValueError(f"'{field}' alanı 'name' ve base64 'content' içeren bir nesne olmalıdır.")
+    try:
+        return payload['name'], base64.b64decode(payload['content'], validate=True)
+    except ValueError:
+        raise ValueError(f"'{field}' içeriği geçerli base64 değil.") from None
+
+def job_content_key(matrix_name, matrix_bytes, previous_route, params):
+    """
+    Aynı işi tanıyan içerik özeti: dosya uzantısı, matris ve önceki rota
+    baytları ile kanonik JSON parametreler. İstemci kimliği dahil değildir.
+    """
+    digest = hashlib.sha256()
+    digest.update(os.path.splitext(matrix_name)[1].lower().encode())
+    digest.update(hashlib.sha256(matrix_bytes).digest())
+    if previous_route is not None:
+        digest.update(os.path.splitext(previous_route[0])[1].lower().encode())
+        digest.update(hashlib.sha256(previous_route[1]).digest())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def _named_buffer(name, content):
+    """Okuyucuların yüklenen dosya gibi kabul ettiği, adı olan bellek içi dosya."""
+    buffer = BytesIO(content)
+    buffer.name = name
+    return buffer
+
+
+# --- İş süreci ---
+
+def _run_job(spec, monitor, on_parallelism=None):
+    """
+    Bir işi arayüzdeki akışla çözer: okuma, ön işleme, çözüm (veya artımlı
+    güncelleme) ve sonuç işleme. Aşama mesajlarını, özeti, rota tablosunu ve
+    ölçüm kaydını içeren sonuç sözlüğü döndürür. on_parallelism verilirse
+    matris okunduktan sonra çözücünün kullanacağı süreç sayısıyla çağrılır.
+    """
+    params = spec['params']
+    messages = {'matrix': [], 'preprocess': [], 'solver': [], 'process': []}
+    result = {'status': 'error', 'messages': messages, 'solver_stats': None}
+    run_metrics = RunMetrics('servis', client=spec['client'], job_id=spec['job_id'])
+    try:
+        matrix_file = _named_buffer(*spec['matrix'])
+        with run_metrics.stage('matrix_read'):
+            if params['candidate_neighbors'] > 0:
+                distance_matrix, matrix_msgs = read_candidate_graph(matrix_file, params['candidate_neighbors'])
+            else:
+                distance_matrix, matrix_msgs = read_distance_matrix(matrix_file)
+        messages['matrix'] += matrix_msgs
+        if distance_matrix is None:
+            return result
+        if params['candidate_neighbors'] > 0:
+            location_labels = distance_matrix.labels
+        else:
+            location_labels, label_msgs = read_location_labels(matrix_file)
+            messages['matrix'] += label_msgs
+
+        previous_route_labels = None
+        if spec['previous_route'] is not None:
+            previous_route_labels, previous_route_msgs = read_previous_route(_named_buffer(*spec['previous_route']))
+            messages['matrix'] += previous_route_msgs
+            if previous_route_labels is None:
+                return result
+
+        # Artımlı mod noktaları etiketle eşleştirdiği için orada birleştirme yapılmaz
+        preprocessed = None
+        if params['candidate_neighbors'] <= 0:
+            with run_metrics.stage('preprocessing'):
+                preprocessed, preprocess_msgs = preprocess_distance_matrix(
+                    distance_matrix,
+                    params['merge_threshold'] if previous_route_labels is None else None,
+                    params['repair_triangle']
+                )
+            messages['preprocess'] += preprocess_msgs
+        full_matrix = preprocessed.matrix if preprocessed else distance_matrix
+        solve_matrix = preprocessed.reduced_matrix if preprocessed else distance_matrix
+        run_metrics.fields.update({
+            'num_locations': len(full_matrix),
+            'num_solved_locations': len(solve_matrix),
+            'time_limit': params['time_limit'],
+        })
+
+        if previous_route_labels is not None:
+            solver_result = reoptimize_route(
+                previous_route_labels, full_matrix, location_labels, params['fuel_price'], params['consumption'],
+                params['time_limit'], COST_SCALING_FACTOR, monitor
+            )
+        else:
+            if on_parallelism is not None:
+                # Kümeleme modunun uygulanıp uygulanmayacağı ancak nokta sayısı bilinince belli olur
+                on_parallelism(solver_parallelism(
+                    solve_matrix, params['portfolio_size'], params['large_instance_threshold'], params['fast_mode']
+                ))
+            solver_result = finish_preprocessed_solve(preprocessed, run_tsp_solver(
+                solve_matrix, params['fuel_price'], params['consumption'], params['time_limit'], COST_SCALING_FACTOR,
+                params['cost_mode'], params['use_route_cache'], params['portfolio_size'], monitor,
+                params['large_instance_threshold'], params['cluster_size'], params['polish'], params['fast_mode'],
+                preprocessed.symmetric if preprocessed else False, params['use_lower_bound'],
+                preprocessed.matrix if preprocessed else None
+            ))
+        solution, manager, routing, solver_stats, solver_msgs = solver_result
+        messages['solver'] += solver_msgs
+        result['solver_stats'] = solver_stats
+        run_metrics.add_solver_stats(solver_stats)
+        if not solution:
+            return result
+
+        with run_metrics.stage('result_processing'):
+            summary_dict, route_df, _, process_msgs = process_and_save_results(
+                solution, manager, routing, full_matrix, COST_SCALING_FACTOR, params['fuel_price'],
+                params['consumption'], params['output_name'], solver_stats, location_labels
+            )
+        messages['process'] += process_msgs
+        if summary_dict is None:
+            return result
+        run_metrics.fields['objective_try'] = float(summary_dict['Toplam Yakıt Maliyeti (TRY)'])
+        if 'Optimallik Açığı (%)' in summary_dict:
+            run_metrics.fields['optimality_gap_pct'] = float(summary_dict['Optimallik Açığı (%)'])
+        result.update({
+            'status': 'ok',
+            'summary': summary_dict,
+            'route': route_df.reset_index().to_dict(orient='list'), # 'Adim' sütunu dizin olarak geri kurulur
+        })
+    except Exception as e:
+        messages['solver'] += [f"Hata: Beklenmedik hata: {e}", traceback.format_exc()]
+    finally:
+        result['metrics'] = run_metrics.record()
+    return result
+
+def _read_proc_stat(pid):
+    """/proc/<pid>/stat'tan (üst süreç, CPU saniyesi) okur; süreç yoksa veya Linux dışında None."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Süreç adı boşluk içerebilir; alanlar son parantezden sonra başlar
+    fields = stat[stat.rfind(')') + 2:].split()
+    # utime, stime ve beklenmiş (bitmiş) alt süreçlerin cutime, cstime değerleri
+    ticks = sum(int(value) for value in fields[11:15])
+    return int(fields[1]), ticks / os.sysconf('SC_CLK_TCK')
+
+def _process_tree(pid):
+    """pid ve yaşayan tüm alt süreçleri için {pid: CPU saniyesi}; /proc yoksa None."""
+    try:
+        entries = [int(entry) for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return None
+    children = {}
+    cpu = {}
+    for entry in entries:
+        stat = _read_proc_stat(entry)
+        if stat is not None:
+            children.setdefault(stat[0], []).append(entry)
+            cpu[entry] = stat[1]
+    if pid not in cpu:
+        return None
+    tree = {}
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        tree[current] = cpu[current]
+        pending.extend(children.get(current, []))
+    return tree
+
+def _kill_process_tree(process, tree):
+    """İş sürecini ve alt süreçlerini (portföy, kümeleme işçileri) sonlandırır."""
+    for pid in tree or ():
+        if pid != process.pid:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass # Süreç bu arada bitmiş olabilir
+    process.terminate()
+
+def _job_parallelism(params):
+    """
+    İş başlarken bilinen paralel çözücü süreci sayısı (portföy büyüklüğü).
+    Kümeleme modu uygulanacaksa iş süreci matrisi okuduktan sonra gerçek
+    sayıyı bildirir ve CPU sınırı buna göre yeniden hesaplanır.
+    """
+    if params['fast_mode']:
+        return 1
+    return min(max(params['portfolio_size'], 1), os.cpu_count() or 1)
+
+def _job_process(spec, progress_queue, cancel_event, cpu_seconds):
+    """
+    İş sürecinin giriş noktası. Süreç başına CPU süresi sınırını (RLIMIT_CPU;
+    alt süreçlerin toplamı servis tarafından denetlenir) uygular, ilerlemeyi
+    progress_queue ile bildirir ve cancel_event ayarlanınca aramayı durdurur.
+    """
+    if cpu_seconds:
+        _, hard_limit = resource.getrlimit(resource.RLIMIT_CPU)
+        # Yumuşak sınırda SIGXCPU gelir; birkaç saniye sonraki sert sınır süreci ayrıca öldürür
+        hard = cpu_seconds + 5 if hard_limit == resource.RLIM_INFINITY else min(hard_limit, cpu_seconds + 5)
+        resource.setrlimit(resource.RLIMIT_CPU, (min(cpu_seconds, hard), hard))
+    params = spec['params']
+    monitor = SolveMonitor(params['stall_seconds'], params['min_improvement_pct'], COST_SCALING_FACTOR, params['target_gap_pct'])
+    finished = threading.Event()
+    sent = [0] # Gönderilen geçmiş kaydı sayısı; her bildirimde yalnızca yeni iyileşmeler gönderilir
+
+    def report_progress():
+        if cancel_event.is_set():
+            monitor.cancel()
+        history = monitor.history()
+        progress_queue.put(('progress', monitor.elapsed(), history[sent[0]:], monitor.gap_pct()))
+        sent[0] = len(history)
+
+    def report_until_finished():
+        while not finished.wait(PROGRESS_POLL_INTERVAL):
+            report_progress()
+
+    reporter = threading.Thread(target=report_until_finished, daemon=True)
+    reporter.start()
+    try:
+        result = _run_job(spec, monitor, lambda workers: progress_queue.put(('parallelism', workers)))
+    finally:
+        finished.set()
+        reporter.join()
+    report_progress()
+    progress_queue.put(('result', result))
+
+
+# --- Servis ---
+
+class ServiceJob:
+    """Servisteki bir iş: durum, ilerleme ve sonuç. Alanlar servisin kilidiyle korunur."""
+
+    def __init__(self, job_id, sequence, client, content_key, spec, messages):
+        self.id = job_id
+        self.sequence = sequence # Kuyruk sırası
+        self.client = client
+        self.content_key = content_key
+        self.spec = spec
+        self.messages = messages # Servis mesajları (ör. süre sınırı indirimi)
+        self.state = JOB_QUEUED
+        self.waiters = 1 # İşi bekleyen gönderim sayısı (yinelenen gönderimler dahil)
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.elapsed = 0.0
+        self.history = []
+        self.gap_pct = None
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.version = 0 # Her durum veya ilerleme değişikliğinde artar (SSE için)
+        self.process = None
+        self.cancel_event = None
+
+    @property
+    def time_limit(self):
+        return self.spec['params']['time_limit']
+
+    def status(self, queue_position=None, include_result=True):
+        """JSON'a dönüştürülecek durum sözlüğü."""
+        status = {
+            'job_id': self.id,
+            'state': self.state,
+            'state_label': JOB_STATE_LABELS[self.state],
+            'client': self.client,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'queue_position': queue_position,
+            'time_limit': self.time_limit,
+            'elapsed': self.elapsed,
+            'history': self.history,
+            'gap_pct': self.gap_pct,
+            'cancel_requested': self.cancel_requested,
+            'messages': self.messages,
+            'error': self.error,
+            'version': self.version,
+        }
+        if include_result:
+            status['result'] = self.result
+        return status
+
+
+class SolveService:
+    """
+    İş kuyruğu ve işçi havuzu. İşler gönderim sırasıyla, istemciler arasında
+    adil biçimde ayrı süreçlerde çalıştırılır; her iş süre ve CPU sınırıyla
+    sınırlıdır. CPU sınırı iş sürecinin alt süreçleri dahil toplam süreye
+    uygulanır. cpu_limit 0 ise iş başına CPU sınırı süre sınırından hesaplanır.
+    """
+
+    def __init__(self, workers=DEFAULT_SERVICE_WORKERS, max_time_limit=DEFAULT_MAX_TIME_LIMIT, cpu_limit=0,
+                 result_ttl=JOB_RESULT_TTL, write_metrics=True):
+        self.workers = max(1, workers)
+        self.max_time_limit = max_time_limit
+        self.cpu_limit = cpu_limit
+        self.result_ttl = result_ttl
+        self.write_metrics = write_metrics
+        self._jobs = {}
+        self._queued = [] # Gönderim sırasıyla bekleyen işler
+        self._running = set()
+        self._last_started = {} # İstemci -> son işinin başlatılma sırası (istemciler arası sıralı dağıtım için)
+        self._starts = itertools.count()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._closing = False
+        # Streamlit veya HTTP iş parçacıklarıyla güvenli olması için 'spawn' kullanılır
+        self._mp_context = multiprocessing.get_context('spawn')
+        self._scheduler = threading.Thread(target=self._schedule, name="tsp-service-scheduler", daemon=True)
+        self._scheduler.start()
+
+    def job_limits(self, time_limit, parallelism=1):
+        """
+        İş başına (CPU saniyesi, duvar saati saniyesi) sınırları. CPU sınırı
+        alt süreçler dahil toplamdır; otomatik sınır paralel süreç sayısıyla ölçeklenir.
+        """
+        cpu_seconds = self.cpu_limit or int(time_limit * JOB_CPU_FACTOR * parallelism + JOB_TIME_MARGIN)
+        return cpu_seconds, time_limit + JOB_TIME_MARGIN
+
+    def submit(self, payload):
+        """
+        İstek gövdesinden iş oluşturur veya aynı içerikli etkin işe bağlanır.
+        (iş|None, yinelenen mi, mesajlar) döndürür.
+        """
+        if not isinstance(payload, dict):
+            return None, False, ["Hata: İstek gövdesi bir JSON nesnesi olmalıdır."]
+        try:
+            matrix = _decode_file(payload.get('matrix'), 'matrix')
+            previous_route = _decode_file(payload['previous_route'], 'previous_route') if payload.get('previous_route') else None
+        except ValueError as e:
+            return None, False, [f"Hata: {e}"]
+        params, messages = validate_job_params(payload.get('params', {}), self.max_time_limit)
+        if params is None:
+            return None, False, messages
+        client = str(payload.get('client') or 'anonim')
+        content_key = job_content_key(matrix[0], matrix[1], previous_route, params)
+
+        with self._condition:
+            if self._closing:
+                return None, False, ["Hata: Servis kapanıyor."]
+            for job in self._jobs.values():
+                if job.content_key == content_key and job.state in ACTIVE_JOB_STATES and not job.cancel_requested:
+                    job.waiters += 1
+                    return job, True, messages + [f"Aynı iş zaten {JOB_STATE_LABELS[job.state].lower()}; mevcut işe bağlanıldı."]
+            job_id = uuid.uuid4().hex[:12]
+            spec = {'job_id': job_id, 'client': client, 'matrix': matrix, 'previous_route': previous_route, 'params': params}
+            job = ServiceJob(job_id, next(self._sequence), client, content_key, spec, messages)
+            self._jobs[job_id] = job
+            self._queued.append(job)
+            self._condition.notify_all()
+        return job, False, messages
+
+    def get(self, job_id):
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id, include_result=True):
+        """İşin durum sözlüğü; iş yoksa None."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            position = self._queued.index(job) + 1 if job.state == JOB_QUEUED else None
+            return job.status(position, include_result)
+
+    def cancel(self, job_id):
+        """
+        İşi bekleyen bir gönderimi iptal eder; bekleyen kalmadıysa iş iptal
+        edilir. Kuyruktaki iş hemen kaldırılır, çalışan işte arama durdurulur
+        ve o ana kadarki en iyi rota sonuç olur. İş yoksa None döndürür.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.state in ACTIVE_JOB_STATES:
+                job.waiters = max(0, job.waiters - 1)
+                if job.waiters == 0:
+                    job.cancel_requested = True
+                    if job.state == JOB_QUEUED:
+                        self._queued.remove(job)
+                        self._finish(job, JOB_CANCELLED)
+                    else:
+                        job.cancel_event.set()
+                    job.version += 1
+                    self._condition.notify_all()
+            position = self._queued.index(job) + 1 if job.state == JOB_QUEUED else None
+            return job.status(position, include_result=False)
+
+    def health(self):
+        with self._condition:
+            return {
+                'status': 'ok',
+                'workers': self.workers,
+                'queued': len(self._queued),
+                'running': len(self._running),
+                'jobs': len(self._jobs),
+                'max_time_limit': self.max_time_limit,
+            }
+
+    def wait_for_change(self, job_id, version, timeout):
+        """İşin sürümü version'dan farklı olana kadar (en fazla timeout saniye) bekler; yeni durum sözlüğünü döndürür."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id].version != version or self._closing, timeout
+            )
+        return self.status(job_id, include_result=False)
+
+    def close(self):
+        """Yeni işleri reddeder ve çalışan iş süreçlerini sonlandırır."""
+        with self._condition:
+            self._closing = True
+            running = list(self._running)
+            self._condition.notify_all()
+        for job in running:
+            if job.process is not None and job.process.is_alive():
+                job.process.terminate()
+
+    # --- Zamanlama ---
+
+    def _finish(self, job, state, error=None):
+        """İşi bitmiş olarak işaretler (kilit tutulurken çağrılır)."""
+        job.state = state
+        job.error = error
+        job.finished_at = time.time()
+        job.version += 1
+        job.spec = {'params': job.spec['params']} # Dosya içerikleri artık gerekmez
+
+    def _next_job(self):
+        """
+        Sıradaki iş: en az çalışan işi olan, eşitlikte en uzun süredir işi
+        başlatılmamış istemcinin en eski işi (istemciler arasında sıralı dağıtım).
+        """
+        running_per_client = Counter(job.client for job in self._running)
+        return min(self._queued, key=lambda job: (running_per_client[job.client], self._last_started.get(job.client, -1), job.sequence))
+
+    def _schedule(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closing or (self._queued and len(self._running) < self.workers), timeout=60)
+                if self._closing:
+                    return
+                self._prune()
+                if not self._queued or len(self._running) >= self.workers:
+                    continue
+                job = self._next_job()
+                self._last_started[job.client] = next(self._starts)
+                self._queued.remove(job)
+                self._running.add(job)
+                job.state = JOB_RUNNING
+                job.cancel_event = self._mp_context.Event()
+                job.started_at = time.time()
+                job.version += 1
+                self._condition.notify_all()
+            threading.Thread(target=self._run, args=(job,), name=f"tsp-job-{job.id}", daemon=True).start()
+
+    def _prune(self):
+        """Süresi dolan veya sayı sınırını aşan biten işleri siler (kilit tutulurken çağrılır)."""
+        now = time.time()
+        finished = sorted((job for job in self._jobs.values() if job.finished_at is not None), key=lambda job: job.finished_at)
+        excess = len(finished) - MAX_FINISHED_JOBS
+        for index, job in enumerate(finished):
+            if index < excess or now - job.finished_at > self.result_ttl:
+                del self._jobs[job.id]
+
+    def _run(self, job):
+        """İşi ayrı süreçte çalıştırır, ilerlemeyi aktarır ve sınırları uygular."""
+        cpu_seconds, wall_seconds = self.job_limits(job.time_limit, _job_parallelism(job.spec['params']))
+        progress_queue = self._mp_context.Queue()
+        # Portföy ve kümeleme kendi alt süreçlerini açtığı için iş süreci daemon değildir
+        process = self._mp_context.Process(target=_job_process, args=(job.spec, progress_queue, job.cancel_event, cpu_seconds))
+        job.process = process
+        started = time.monotonic()
+        next_cpu_check = started + CPU_CHECK_INTERVAL
+        tree = None
+        cancelled_at = None
+        result = None
+        killed_reason = None
+        try:
+            process.start()
+            while result is None:
+                alive = process.is_alive()
+                try:
+                    # Süreç bittiyse kuyrukta kalan son mesajlar (sonuç dahil) okunur
+                    message = progress_queue.get(timeout=PROGRESS_POLL_INTERVAL if alive else 1.0)
+                except queue.Empty:
+                    message = None
+                if message is not None:
+                    with self._condition:
+                        if message[0] == 'result':
+                            result = message[1]
+                        elif message[0] == 'parallelism':
+                            cpu_seconds = self.job_limits(job.time_limit, message[1])[0]
+                        else:
+                            _, job.elapsed, new_history, job.gap_pct = message
+                            job.history.extend(list(entry) for entry in new_history)
+                        job.version += 1
+                        self._condition.notify_all()
+                    continue
+                if not alive:
+                    break
+                if job.cancel_event.is_set() and cancelled_at is None:
+                    cancelled_at = time.monotonic()
+                if cancelled_at is not None and time.monotonic() - cancelled_at > JOB_CANCEL_GRACE:
+                    killed_reason = f"İptal edilen iş {JOB_CANCEL_GRACE} sn içinde durmadı ve sonlandırıldı."
+                elif time.monotonic() - started > wall_seconds:
+                    killed_reason = f"İş süre sınırını ({wall_seconds:.0f} sn) aştı ve sonlandırıldı."
+                if time.monotonic() >= next_cpu_check:
+                    # RLIMIT_CPU süreç başınadır; portföy ve kümeleme işçileri burada toplanır
+                    next_cpu_check = time.monotonic() + CPU_CHECK_INTERVAL
+                    tree = _process_tree(process.pid)
+                    if tree is not None and sum(tree.values()) > cpu_seconds and not killed_reason:
+                        killed_reason = f"İş CPU süresi sınırını ({cpu_seconds} sn, alt süreçler dahil) aştı ve sonlandırıldı."
+                if killed_reason:
+                    _kill_process_tree(process, tree if tree is not None else _process_tree(process.pid))
+                    break
+            process.join(timeout=JOB_CANCEL_GRACE)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        except Exception as e:
+            killed_reason = f"İş süreci başlatılamadı: {e}"
+        finally:
+            progress_queue.close()
+
+        with self._condition:
+            self._running.discard(job)
+            if result is not None:
+                job.result = result
+                # İptal edilen iş o ana kadarki en iyi rotayla tamamlanabilir
+                if result['status'] == 'ok':
+                    state = JOB_DONE
+                else:
+                    state = JOB_CANCELLED if job.cancel_requested else JOB_FAILED
+                self._finish(job, state)
+            elif killed_reason:
+                self._finish(job, JOB_CANCELLED if job.cancel_requested else JOB_FAILED, f"Hata: {killed_reason}")
+            elif process.exitcode == -signal.SIGXCPU or process.exitcode == -signal.SIGKILL:
+                self._finish(job, JOB_FAILED, f"Hata: İş CPU süresi sınırını ({cpu_seconds} sn) aştı ve sonlandırıldı.")
+            else:
+                self._finish(job, JOB_FAILED, f"Hata: İş süreci beklenmedik şekilde sonlandı (çıkış kodu: {process.exitcode}).")
+            self._condition.notify_all()
+        if result is not None and result.get('metrics') and self.write_metrics:
+            # Ölçüm günlüğü ve Prometheus dosyası yalnızca servis sürecinden yazılır
+            try:
+                append_metrics_log(result['metrics'])
+                write_prometheus_file(result['metrics'])
+            except OSError as e:
+                print(f"Uyarı: Ölçümler yazılamadı: {e}", file=sys.stderr)
+
+
+# --- HTTP ---
+
+def _json_bytes(payload):
+    # numpy sayıları gibi JSON'a doğrudan yazılamayan değerler metne çevrilir
+    return json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """SolveService için JSON HTTP uç noktaları; servis nesnesi self.server.service'tedir."""
+
+    server_version = "TSPCozumServisi/1.0"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status_code, payload):
+        body = _json_bytes(payload)
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status_code, message):
+        self._send_json(status_code, {'error': message})
+
+    def _route(self):
+        """(yol parçaları, sorgu parametreleri)"""
+        parts = urlsplit(self.path)
+        return [part for part in parts.path.split('/') if part], parse_qs(parts.query)
+
+    def do_GET(self):
+        parts, query = self._route()
+        service = self.server.service
+        if parts == ['health']:
+            self._send_json(200, service.health())
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            status = service.status(parts[1], include_result=query.get('result', ['1'])[0] != '0')
+            if status is None:
+                self._send_error(404, "Hata: İş bulunamadı.")
+            else:
+                self._send_json(200, status)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events':
+            self._stream_events(parts[1])
+        else:
+            self._send_error(404, "Hata: Bilinmeyen adres.")
+
+    def do_POST(self):
+        parts, _ = self._route()
+        if parts != ['jobs']:
+            self._send_error(404, "Hata: Bilinmeyen adres.")
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            self._send_error(413, f"Hata: İstek çok büyük (en fazla {MAX_REQUEST_BYTES // (1024 * 1024)} MB).")
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'null')
+        except ValueError:
+            self._send_error(400, "Hata: İstek gövdesi geçerli JSON değil.")
+            return
+        job, deduplicated, messages = self.server.service.submit(payload)
+        if job is None:
+            self._send_json(400, {'error': messages[0], 'messages': messages})
+            return
+        self._send_json(202, {'job_id': job.id, 'state': job.state, 'deduplicated': deduplicated, 'messages': messages})
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._send_error(404, "Hata: Bilinmeyen adres.")
+            return
+        status = self.server.service.cancel(parts[1])
+        if status is None:
+            self._send_error(404, "Hata: İş bulunamadı.")
+        else:
+            self._send_json(200, status)
+
+    def _stream_events(self, job_id):
+        """İşin durumunu her değişiklikte 'status' olayı olarak gönderir; iş bitince akış kapanır."""
+        service = self.server.service
+        status = service.status(job_id, include_result=False)
+        if status is None:
+            self._send_error(404, "Hata: İş bulunamadı.")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            while status is not None:
+                self.wfile.write(b"event: status\ndata: " + _json_bytes(status) + b"\n\n")
+                self.wfile.flush()
+                if status['state'] not in ACTIVE_JOB_STATES:
+                    return
+                version = status['version']
+                while True:
+                    status = service.wait_for_change(job_id, version, EVENT_HEARTBEAT_SECONDS)
+                    if status is None or status['version'] != version:
+                        break
+                    self.wfile.write(b": canli\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return # İstemci bağlantıyı kapattı
+
+
+def create_server(service, host=DEFAULT_SERVICE_HOST, port=DEFAULT_SERVICE_PORT, quiet=False):
+    """Servisi sunan (henüz başlatılmamış) HTTP sunucusunu oluşturur."""
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+# --- İstemci ---
+
+class SolveServiceClient:
+    """Çözüm servisi için requests tabanlı istemci. Her çağrı (yanıt|None, mesajlar) döndürür."""
+
+    def __init__(self, base_url, client_name=None, timeout=SERVICE_REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.client_name = client_name
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            return None, [f"Hata: Çözüm servisine ulaşılamadı ({self.base_url}): {e}"]
+        try:
+            payload = response.json()
+        except ValueError:
+            return None, [f"Hata: Çözüm servisi geçersiz yanıt döndürdü (HTTP {response.status_code})."]
+        if response.status_code >= 400:
+            return None, payload.get('messages') or [payload.get('error') or f"Hata: HTTP {response.status_code}"]
+        return payload, payload.get('messages', [])
+
+    def submit(self, matrix_name, matrix_bytes, params, previous_route=None):
+        """Matris dosyasını (ve varsa (ad, bayt) önceki rotayı) parametrelerle gönderir."""
+        payload = {
+            'client': self.client_name,
+            'matrix': {'name': matrix_name, 'content': base64.b64encode(matrix_bytes).decode('ascii')},
+            'params': params,
+        }
+        if previous_route is not None:
+            payload['previous_route'] = {'name': previous_route[0], 'content': base64.b64encode(previous_route[1]).decode('ascii')}
+        return self._request('POST', '/jobs', json=payload)
+
+    def status(self, job_id, include_result=True):
+        return self._request('GET', f"/jobs/{job_id}" + ("" if include_result else "?result=0"))
+
+    def cancel(self, job_id):
+        return self._request('DELETE', f"/jobs/{job_id}")
+
+    def health(self):
+        return self._request('GET', "/health")
+
+
+class RemoteJob:
+    """
+    Servisteki bir işin arayüz tarafı. SolveMonitor gibi history, elapsed,
+    gap_pct ve cancel sunar; is_alive çağrıldıkça durum servisten sorgulanır.
+    Böylece arayüzün canlı ilerleme kodu yerel ve uzak çözümde aynı kalır.
+    """
+
+    def __init__(self, client, job_id):
+        self.client = client
+        self.job_id = job_id
+        self.state = JOB_QUEUED
+        self.queue_position = None
+        self.error = None
+        self._status = {}
+        self._failures = 0
+
+    def refresh(self):
+        """Durumu servisten yeniler; servise art arda ulaşılamazsa işi başarısız sayar."""
+        status, msgs = self.client.status(self.job_id, include_result=False)
+        if status is None:
+            self._failures += 1
+            if self._failures >= REMOTE_POLL_RETRIES:
+                self.state, self.error = JOB_FAILED, msgs[0]
+            return
+        self._failures = 0
+        self._status = status
+        self.state = status['state']
+        self.queue_position = status['queue_position']
+        self.error = status['error']
+
+    def is_alive(self):
+        self.refresh()
+        return self.state in ACTIVE_JOB_STATES
+
+    def history(self):
+        return [tuple(entry) for entry in self._status.get('history', [])]
+
+    def elapsed(self):
+        return self._status.get('elapsed', 0.0)
+
+    def gap_pct(self):
+        return self._status.get('gap_pct')
+
+    def cancel(self):
+        self.client.cancel(self.job_id)
+
+    def fetch_result(self):
+        """Biten işin sonuç sözlüğünü ve servis mesajlarını döndürür: (sonuç|None, mesajlar)."""
+        status, msgs = self.client.status(self.job_id)
+        if status is None:
+            return None, msgs
+        msgs = status['messages'] + ([status['error']] if status['error'] else [])
+        return status.get('result'), msgs
+
+
+def result_tables(result):
+    """Servis sonucundan (özet sözlüğü, rota tablosu, RouteExport) üretir; dosyalar istemcide üretilir."""
+    route_df = pd.DataFrame(result['route']).set_index('Adim')
+    return result['summary'], route_df, RouteExport(route_df, result['summary'])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mesafe matrisi çözüm isteklerini kuyruğa alan ve işçi havuzuyla çalıştıran yerel HTTP servisi."
+    )
+    parser.add_argument('--adres', default=DEFAULT_SERVICE_HOST,
+                        help=f"Dinlenecek adres (varsayılan: {DEFAULT_SERVICE_HOST}; ağa açmak için 0.0.0.0).")
+    parser.add_argument('--port', type=int, default=DEFAULT_SERVICE_PORT, help=f"Dinlenecek port (varsayılan: {DEFAULT_SERVICE_PORT}).")
+    parser.add_argument('--isci', type=int, default=DEFAULT_SERVICE_WORKERS,
+                        help="Aynı anda çalıştırılacak iş sayısı (varsayılan: CPU çekirdeği sayısının yarısı).")
+    parser.add_argument('--azami-sure', type=int, default=DEFAULT_MAX_TIME_LIMIT,
+                        help=f"İş başına çözücü süre sınırının üst sınırı (saniye, varsayılan: {DEFAULT_MAX_TIME_LIMIT}).")
+    parser.add_argument('--cpu-siniri', type=int, default=0,
+                        help=f"İş başına CPU süresi sınırı (saniye, alt süreçler dahil). 0 ise süre sınırı x {JOB_CPU_FACTOR:g} x paralel süreç sayısı + {JOB_TIME_MARGIN} sn (varsayılan).")
+    parser.add_argument('--sonuc-suresi', type=int, default=JOB_RESULT_TTL,
+                        help=f"Biten işlerin sonuçlarının saklanma süresi (saniye, varsayılan: {JOB_RESULT_TTL}).")
+    parser.add_argument('--sessiz', action='store_true', help="HTTP isteklerini günlüğe yazma.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = SolveService(args.isci, args.azami_sure, args.cpu_siniri, args.sonuc_suresi)
+    try:
+        server = create_server(service, args.adres, args.port, args.sessiz)
+    except OSError as e:
+        print(f"Hata: {args.adres}:{args.port} dinlenemedi: {e}", file=sys.stderr)
+        return 2
+    print(f"Çözüm servisi http://{args.adres}:{args.port} adresinde çalışıyor ({service.workers} işçi, "
+          f"iş başına en fazla {args.azami_sure} sn).", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""
+Seyrek aday grafı: her konumdan yalnızca en yakın k komşuya giden yollar.
+
+Çok büyük (ör. 10.000+ nokta) veya yalnızca kısmen bilinen mesafe
+matrislerinde N x N matris yerine her konumun en yakın k komşusuna giden
+yollar CSR (sıkıştırılmış satır) biçiminde tutulur; bellek ve hazırlık
+süresi N ile doğrusal büyür. Yoğun matris kaynakları satır blokları halinde
+okunur, matrisin tamamı hiçbir zaman belleğe alınmaz.
+
+* Graf yön bakımından simetrik kapatılır (i -> j aday ise j -> i de adaydır);
+  birbirine bağlı olmayan parçalar en kısa köprü yollarıyla birleştirilir.
+* Grafta olmayan (i, j) çiftleri yerel aramada tek bir ara konum üzerinden
+  en kısa yolla (iki adımlı tamamlama) fiyatlanır; böyle bir yol da yoksa
+  çift kullanılmaz (MISSING_ARC_COST). Rotanın daha uzak bir çifte ihtiyaç
+  duyduğu yerlerde (en yakın komşu rotasının takıldığı noktalar, rapor)
+  mesafe graf üzerindeki en kısa yol olarak tembel hesaplanır ve kaynak
+  başına önbellekte tutulur.
+
+Graf NumPy dizisi gibi vektörel indekslenebilir (graph[rows, cols]); bu
+sayede tsp_local_search'teki 2-opt/Or-opt motoru doğrudan graf üzerinde çalışır.
+"""
+import heapq
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_CANDIDATE_NEIGHBORS = 16 # Konum başına saklanan en yakın komşu sayısı (k)
+CANDIDATE_BLOCK_ROWS = 256 # Yoğun kaynaklar bu kadar satırlık bloklar halinde okunur
+MISSING_ARC_COST = 1 << 40 # Grafta olmayan yolların yerel aramadaki maliyeti (hiçbir gerçek rotaya yaklaşmaz)
+SHORTEST_PATH_CACHE_SOURCES = 256 # En kısa yol önbelleğinde tutulan kaynak sayısı (LRU)
+
+
+def _connected_components(num_nodes, sources, targets):
+    """Yönsüz bağlantılı parça etiketlerini (parçanın en küçük düğümü) döndürür."""
+    component = np.arange(num_nodes, dtype=np.int64)
+    if len(sources) == 0:
+        return component
+    while True:
+        previous = component.copy()
+        # Etiketler yaylar boyunca her iki yöne yayılır, ardından işaretçi atlamasıyla kısaltılır
+        np.minimum.at(component, sources, component[targets])
+        np.minimum.at(component, targets, component[sources])
+        component = component[component]
+        if np.array_equal(component, previous):
+            return component
+
+
+class CandidateGraph:
+    """
+    Aday yollar CSR biçiminde: indptr (n+1), indices ve data. Her satırın
+    komşuları yakından uzağa sıralıdır. Vektörel arama için yollar ayrıca
+    (kaynak * n + hedef) anahtarına göre sıralı tutulur.
+    """
+
+    def __init__(self, num_nodes, sources, targets, distances, num_neighbors, labels=None, _path_cache=None):
+        self.num_nodes = int(num_nodes)
+        self.num_neighbors = int(num_neighbors)
+        self.labels = labels
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        distances = np.asarray(distances, dtype=np.int64)
+        keep = sources != targets
+        keys = sources[keep] * self.num_nodes + targets[keep]
+        distances = distances[keep]
+        # Aynı yol birden fazla kez verilmişse en kısası tutulur
+        order = np.lexsort((distances, keys))
+        self._keys, first = np.unique(keys[order], return_index=True)
+        self._costs = distances[order][first].astype(np.int32)
+
+        rows = self._keys // self.num_nodes
+        cols = self._keys % self.num_nodes
+        row_order = np.lexsort((self._costs, rows))
+        self.indices = cols[row_order].astype(np.int32)
+        self.data = self._costs[row_order]
+        self.indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.num_nodes), out=self.indptr[1:])
+
+        # İki adımlı tamamlamada ara konum olarak her satırın en yakın k komşusu denenir (dolgulu n x k dizi)
+        row_lengths = np.diff(self.indptr)
+        width = int(min(row_lengths.max(initial=0), self.num_neighbors))
+        offsets = np.arange(width)
+        valid = offsets < row_lengths[:, None]
+        positions = np.where(valid, self.indptr[:-1, None] + offsets, 0)
+        self._hop_targets = np.where(valid, self.indices[positions] if len(self.indices) else 0, 0).astype(np.int64)
+        self._hop_costs = np.where(valid, self.data[positions] if len(self.data) else 0, MISSING_ARC_COST).astype(np.int64)
+
+        # Kaynak -> tamamlanmış en kısa yol araması; türetilen graflarla paylaşılır (mesafeler değişmez)
+        self._path_cache = _path_cache if _path_cache is not None else OrderedDict()
+        self._path_lock = threading.Lock()
+
+    # --- Kurucular ---
+
+    @classmethod
+    def from_row_blocks(cls, num_nodes, row_blocks, num_neighbors=DEFAULT_CANDIDATE_NEIGHBORS, labels=None):
+        """
+        Yoğun bir mesafe matrisinden graf kurar. row_blocks() her çağrıldığında
+        (başlangıç satırı, satır bloğu) çiftlerini baştan üretmelidir; kaynak
+        birkaç kez taranır (k-en yakın, gerekirse köprüler, simetrik kapatma).
+        """
+        num_nodes = int(num_nodes)
+        k = min(int(num_neighbors), num_nodes - 1)
+        sources, targets, distances = [], [], []
+        if k > 0:
+            for start, block in _checked_blocks(row_blocks, num_nodes):
+                values = block.astype(np.int64)
+                block_rows = np.arange(len(values))
+                values[block_rows, block_rows + start] = np.iinfo(np.int64).max # Kendisi komşu sayılmaz
+                nearest = np.argpartition(values, k - 1, axis=1)[:, :k]
+                sources.append(np.repeat(block_rows + start, k))
+                targets.append(nearest.ravel())
+                distances.append(np.take_along_axis(values, nearest, axis=1).ravel())
+        sources = np.concatenate(sources) if sources else np.empty(0, dtype=np.int64)
+        targets = np.concatenate(targets) if targets else np.empty(0, dtype=np.int64)
+        distances = np.concatenate(distances) if distances else np.empty(0, dtype=np.int64)
+
+        # Bağlantısız parçalar (ör. birbirinden uzak iki mahalle) her turda en kısa çıkış yoluyla birleştirilir (Borůvka)
+        component = _connected_components(num_nodes, sources, targets)
+        while len(np.unique(component)) > 1:
+            best_distance = np.full(num_nodes, np.iinfo(np.int64).max, dtype=np.int64)
+            best_target = np.zeros(num_nodes, dtype=np.int64)
+            for start, block in _checked_blocks(row_blocks, num_nodes):
+                values = block.astype(np.int64)
+                block_rows = np.arange(len(values))
+                values[component[block_rows + start][:, None] == component[None, :]] = np.iinfo(np.int64).max
+                best_target[start:start + len(values)] = np.argmin(values, axis=1)
+                best_distance[start:start + len(values)] = values[block_rows, best_target[start:start + len(values)]]
+            order = np.lexsort((best_distance, component))
+            first = order[np.unique(component[order], return_index=True)[1]]
+            sources = np.concatenate((sources, first))
+            targets = np.concatenate((targets, best_target[first]))
+            distances = np.concatenate((distances, best_distance[first]))
+            component = _connected_components(num_nodes, sources, targets)
+
+        # Simetrik kapatma: tersi eksik yolların ters yön mesafeleri kaynaktan okunur
+        keys = sources * num_nodes + targets
+        reverse_keys = targets * num_nodes + sources
+        missing = np.unique(reverse_keys[~np.isin(reverse_keys, keys)])
+        if len(missing):
+            missing_rows, missing_cols = missing // num_nodes, missing % num_nodes
+            missing_distances = np.empty(len(missing), dtype=np.int64)
+            for start, block in _checked_blocks(row_blocks, num_nodes):
+                lo, hi = np.searchsorted(missing_rows, [start, start + len(block)])
+                missing_distances[lo:hi] = block[missing_rows[lo:hi] - start, missing_cols[lo:hi]]
+            sources = np.concatenate((sources, missing_rows))
+            targets = np.concatenate((targets, missing_cols))
+            distances = np.concatenate((distances, missing_distances))
+        return cls(num_nodes, sources, targets, distances, num_neighbors, labels)
+
+    @classmethod
+    def from_edges(cls, num_nodes, sources, targets, distances, num_neighbors=DEFAULT_CANDIDATE_NEIGHBORS, labels=None):
+        """
+        Kısmen bilinen mesafelerden (kaynak, hedef, mesafe yolları) graf kurar.
+        Her kaynağın en kısa k yolu ve bunların listede bulunan ters yönleri
+        tutulur; ayıklama grafı parçalarsa parçalar bilinen en kısa yollarla
+        yeniden bağlanır. Bilinen mesafeler tüm konumları bağlamıyorsa ValueError.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        distances = np.asarray(distances, dtype=np.int64)
+        keep = sources != targets
+        sources, targets, distances = sources[keep], targets[keep], distances[keep]
+        order = np.lexsort((distances, sources))
+        sources, targets, distances = sources[order], targets[order], distances[order]
+        group_start = np.searchsorted(sources, sources, side='left')
+        nearest = np.arange(len(sources)) - group_start < num_neighbors
+        keys = sources * num_nodes + targets
+        kept_reverse = targets[nearest] * num_nodes + sources[nearest]
+        selected = nearest | np.isin(keys, kept_reverse)
+
+        component = _connected_components(num_nodes, sources[selected], targets[selected])
+        while len(np.unique(component)) > 1:
+            crossing = np.flatnonzero(component[sources] != component[targets])
+            if len(crossing) == 0:
+                raise ValueError(f"bilinen mesafeler konumları birbirine bağlamıyor ({len(np.unique(component))} ayrı parça)")
+            # Her parçadan çıkan en kısa bilinen yol (ve biliniyorsa tersi) eklenir
+            order = crossing[np.lexsort((distances[crossing], component[sources[crossing]]))]
+            bridges = order[np.unique(component[sources[order]], return_index=True)[1]]
+            selected[bridges] = True
+            selected |= np.isin(keys, targets[bridges] * num_nodes + sources[bridges])
+            component = _connected_components(num_nodes, sources[selected], targets[selected])
+        return cls(num_nodes, sources[selected], targets[selected], distances[selected], num_neighbors, labels)
+
+    def with_arcs(self, sources, targets, distances):
+        """Ek yollarla (ör. en kısa yol köprüleri) yeni bir graf döndürür; bu graf değişmez."""
+        rows = self._keys // self.num_nodes
+        cols = self._keys % self.num_nodes
+        return CandidateGraph(
+            self.num_nodes,
+            np.concatenate((rows, np.asarray(sources, dtype=np.int64))),
+            np.concatenate((cols, np.asarray(targets, dtype=np.int64))),
+            np.concatenate((self._costs, np.asarray(distances, dtype=np.int64))),
+            self.num_neighbors, self.labels, self._path_cache,
+        )
+
+    # --- Dizi Arayüzü ---
+
+    def __len__(self):
+        return self.num_nodes
+
+    @property
+    def shape(self):
+        return (self.num_nodes, self.num_nodes)
+
+    @property
+    def num_arcs(self):
+        return len(self._keys)
+
+    @property
+    def nbytes(self):
+        """CSR dizileri, arama anahtarları ve iki adımlı tamamlama dizilerinin kapladığı bellek (bayt)."""
+        return sum(array.nbytes for array in (
+            self.indptr, self.indices, self.data, self._keys, self._costs, self._hop_targets, self._hop_costs
+        ))
+
+    def _arc_lookup(self, rows, cols):
+        """Yalnızca graftaki yollar: (mesafeler, bulundu_mu)."""
+        query = rows * self.num_nodes + cols
+        if not len(self._keys):
+            return np.full(query.shape, MISSING_ARC_COST, dtype=np.int64), np.zeros(query.shape, dtype=bool)
+        position = np.minimum(np.searchsorted(self._keys, query), len(self._keys) - 1)
+        found = self._keys[position] == query
+        return np.where(found, self._costs[position].astype(np.int64), MISSING_ARC_COST), found
+
+    def __getitem__(self, key):
+        """
+        graph[rows, cols]: NumPy yayınlama (broadcasting) kurallarıyla yol
+        mesafeleri (int64). Köşegen 0'dır. Grafta olmayan çiftler için tek bir
+        ara konum üzerinden en kısa yol (iki adımlı tamamlama) kullanılır; o da
+        yoksa MISSING_ARC_COST döner. Değerler yalnızca grafa bağlıdır, bu yüzden
+        yerel aramada tutarlıdır.
+        """
+        rows, cols = key
+        rows, cols = np.broadcast_arrays(np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))
+        result, found = self._arc_lookup(rows, cols)
+        missing = ~found & (rows != cols)
+        if missing.any() and self._hop_targets.shape[1]:
+            missing_rows, missing_cols = rows[missing], cols[missing]
+            middle = self._hop_targets[missing_rows]
+            second, _ = self._arc_lookup(middle, missing_cols[:, None])
+            via_middle = np.where(second < MISSING_ARC_COST, self._hop_costs[missing_rows] + second, MISSING_ARC_COST)
+            result[missing] = np.minimum(via_middle.min(axis=1), MISSING_ARC_COST)
+        result[rows == cols] = 0
+        return result
+
+    def has_arcs(self, rows, cols):
+        """Çiftlerin doğrudan yol olarak grafta (veya köşegende) olup olmadığı."""
+        rows, cols = np.broadcast_arrays(np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))
+        return self._arc_lookup(rows, cols)[1] | (rows == cols)
+
+    def neighbor_lists(self):
+        """Her konumun aday komşuları, yakından uzağa sıralı (CSR satır görünümleri; kopya yok)."""
+        indptr = self.indptr
+        return [self.indices[indptr[node]:indptr[node + 1]] for node in range(self.num_nodes)]
+
+    # --- En Kısa Yol Tamamlama ---
+
+    def _row(self, node):
+        lo, hi = self.indptr[node], self.indptr[node + 1]
+        return zip(self.indices[lo:hi].tolist(), self.data[lo:hi].tolist())
+
+    def shortest_path_distance(self, source, target):
+        """
+        source'tan target'a graf üzerindeki en kısa yol mesafesi; ulaşılamıyorsa None.
+        Arama kaynak başına önbelleklenir ve yalnızca gerektiği kadar ilerletilir
+        (aynı kaynaktan sonraki sorgular kalınan yerden devam eder).
+        """
+        source, target = int(source), int(target)
+        if source == target:
+            return 0
+        with self._path_lock:
+            search = self._path_cache.get(source)
+            if search is None:
+                search = self._path_cache[source] = {'settled': {}, 'heap': [(0, source)], 'tentative': {source: 0}}
+                while len(self._path_cache) > SHORTEST_PATH_CACHE_SOURCES:
+                    self._path_cache.popitem(last=False)
+            else:
+                self._path_cache.move_to_end(source)
+            settled, heap, tentative = search['settled'], search['heap'], search['tentative']
+            while target not in settled and heap:
+                distance, node = heapq.heappop(heap)
+                if node in settled:
+                    continue
+                settled[node] = distance
+                for neighbor, arc_distance in self._row(node):
+                    candidate = distance + arc_distance
+                    if neighbor not in settled and candidate < tentative.get(neighbor, candidate + 1):
+                        tentative[neighbor] = candidate
+                        heapq.heappush(heap, (candidate, neighbor))
+            return settled.get(target)
+
+    def _nearest_unvisited(self, source, visited):
+        """source'tan en kısa yolla ulaşılan ilk ziyaret edilmemiş konum ve mesafesi."""
+        settled = set()
+        heap = [(0, int(source))]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            if not visited[node]:
+                return node, distance
+            settled.add(node)
+            for neighbor, arc_distance in self._row(node):
+                if neighbor not in settled:
+                    heapq.heappush(heap, (distance + arc_distance, neighbor))
+        raise ValueError(f"{source} numaralı konumdan ziyaret edilmemiş konumlara aday graf üzerinden ulaşılamıyor")
+
+    def arc_distances(self, from_nodes, to_nodes):
+        """Yol mesafeleri; grafta olmayan çiftler için en kısa yol tamamlaması kullanılır."""
+        from_nodes = np.asarray(from_nodes, dtype=np.int64)
+        to_nodes = np.asarray(to_nodes, dtype=np.int64)
+        distances, found = self._arc_lookup(from_nodes, to_nodes)
+        distances[from_nodes == to_nodes] = 0
+        for position in np.flatnonzero(~found & (from_nodes != to_nodes)):
+            distance = self.shortest_path_distance(from_nodes[position], to_nodes[position])
+            if distance is None:
+                raise ValueError(f"{from_nodes[position]} -> {to_nodes[position]} yolu aday graf üzerinden tamamlanamıyor")
+            distances[position] = distance
+        return distances
+
+    # --- Başlangıç Rotası ---
+
+    def nearest_neighbor_tour(self, start=0):
+        """
+        Aday yollar üzerinde en yakın komşu rotası kurar; tüm aday komşular
+        ziyaret edilmişse en kısa yolla en yakın ziyaret edilmemiş konuma atlanır.
+        (rota, atlama yollarını da içeren graf, atlama sayısı) döndürür.
+        Atlama yolları (ve ters yönleri) grafa en kısa yol mesafeleriyle eklenir;
+        böylece yerel arama rotadaki her yolun maliyetini bilir.
+        """
+        visited = np.zeros(self.num_nodes, dtype=bool)
+        visited[start] = True
+        route = [int(start)]
+        current = int(start)
+        jumps = []
+        indptr, indices = self.indptr, self.indices
+        for _ in range(self.num_nodes - 1):
+            row = indices[indptr[current]:indptr[current + 1]]
+            free = row[~visited[row]]
+            if len(free):
+                current = int(free[0])
+            else:
+                following, distance = self._nearest_unvisited(current, visited)
+                jumps.append((current, following, distance))
+                current = following
+            visited[current] = True
+            route.append(current)
+        route.append(int(start))
+        if not self.has_arcs(current, start):
+            distance = self.shortest_path_distance(current, start)
+            if distance is None:
+                raise ValueError(f"{current} numaralı konumdan depoya aday graf üzerinden dönülemiyor")
+            jumps.append((current, int(start), distance))
+        if not jumps:
+            return route, self, 0
+
+        extra = list(jumps)
+        for source, target, _ in jumps:
+            if not self.has_arcs(target, source):
+                distance = self.shortest_path_distance(target, source)
+                if distance is not None:
+                    extra.append((target, source, distance))
+        sources, targets, distances = zip(*extra)
+        return route, self.with_arcs(sources, targets, distances), len(jumps)
+
+
+def _checked_blocks(row_blocks, num_nodes):
+    """Satır bloklarının kare matrise uyduğunu denetleyerek iletir."""
+    next_row = 0
+    for start, block in row_blocks():
+        block = np.asarray(block)
+        if block.ndim != 2 or block.shape[1] != num_nodes or start != next_row:
+            raise ValueError("satır blokları kare bir matris oluşturmuyor")
+        next_row = start + len(block)
+        yield start, block
+    if next_row != num_nodes:
+        raise ValueError(f"matris {num_nodes} satır yerine {next_row} satır içeriyor")